@@ -1,6 +1,7 @@
 # core/admin.py
 from django.contrib import admin
-from .models import Referral, Assignment
+from django.utils import timezone
+from .models import Referral, Assignment, OutboundEmail, Job, QueueClaim
 
 @admin.register(Referral)
 class ReferralAdmin(admin.ModelAdmin):
@@ -36,10 +37,10 @@ class ReferralAdmin(admin.ModelAdmin):
 @admin.register(Assignment)
 class AssignmentAdmin(admin.ModelAdmin):
     list_display = (
-        'yellow_member', 'sponsored_member', 'assigned_at', 'completed',
+        'yellow_member', 'sponsored_member', 'assigned_at', 'completed', 'active',
         'yellow_member_phone', 'sponsored_member_phone'
     )
-    list_filter = ('completed', 'assigned_at')
+    list_filter = ('completed', 'active', 'assigned_at')
     search_fields = (
         'yellow_member__phone', 'sponsored_member__phone',
         'yellow_member__user__first_name', 'yellow_member__user__last_name',
@@ -59,3 +60,34 @@ class AssignmentAdmin(admin.ModelAdmin):
         return super().get_queryset(request).select_related(
             'yellow_member__user', 'sponsored_member__user'
         )
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'kind', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('status', 'kind', 'created_at')
+    search_fields = ('subject', 'recipients')
+    readonly_fields = ('created_at', 'sent_at', 'last_error')
+    date_hierarchy = 'created_at'
+    actions = ['retry_now']
+
+    def retry_now(self, request, queryset):
+        updated = queryset.exclude(status='sent').exclude(status='digested').update(
+            status='pending', attempts=0, next_attempt_at=timezone.now()
+        )
+        self.message_user(request, f'{updated} emails queued for another attempt.')
+    retry_now.short_description = 'Retry selected emails now'
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'progress', 'total', 'created_by', 'created_at', 'finished_at')
+    list_filter = ('status', 'kind', 'created_at')
+    readonly_fields = ('created_at', 'started_at', 'heartbeat_at', 'finished_at', 'result', 'error')
+    date_hierarchy = 'created_at'
+
+@admin.register(QueueClaim)
+class QueueClaimAdmin(admin.ModelAdmin):
+    list_display = ('queue', 'profile', 'claimed_by', 'status', 'claimed_at', 'lease_expires_at', 'finished_at')
+    list_filter = ('queue', 'status', 'claimed_at')
+    search_fields = ('profile__phone', 'claimed_by__username')
+    raw_id_fields = ('profile', 'claimed_by')
+    date_hierarchy = 'claimed_at'
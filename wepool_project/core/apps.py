@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
 
 
 class CoreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "core"
+
+    def ready(self):
+        # Background job handlers register themselves from <app>/jobs.py
+        autodiscover_modules("jobs")
+        from . import checks  # noqa: F401
@@ -0,0 +1,279 @@
+# core/benchmarks.py
+import io
+import random
+import statistics
+import time
+from collections import deque
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from dashboard.matching import match_members
+from users.models import Profile
+from users.qualifications import run_qualification_rules
+from users.search import reindex_profiles
+from .downline import recursive_downline
+from .models import Referral
+from .snapshots import build_matrix_snapshot
+from .utils import MATRIX_DEPTH, get_downline, recompute_referral_counters
+
+FIRST_NAMES = ['Thabo', 'Lerato', 'Sipho', 'Naledi', 'Pieter', 'Aisha', 'Johan', 'Zanele', 'Kagiso', 'Mia']
+LAST_NAMES = ['Nkosi', 'Dlamini', 'van Wyk', 'Mokoena', 'Naidoo', 'Botha', 'Khumalo', 'Smith', "O'Neil", 'Pillay']
+STATUS_WEIGHTS = {'pending': 6, 'yellow': 2, 'green': 1, 'qualified': 1}
+
+def seed_membership(count, max_depth=6, fanout=3, seed=None, batch_size=1000):
+    """Create count members arranged in referral trees, returning the referral count
+
+    Members are attached breadth first: each takes a free slot under the
+    oldest member that still has one (members get 0 to 2 * fanout slots),
+    and starts a new tree when none is left or max_depth is reached. The
+    closure table, counters and search documents are rebuilt afterwards,
+    since bulk inserts skip the signals that normally maintain them.
+    """
+    rng = random.Random(seed)
+    offset = User.objects.count()
+    tag = f'member{offset}'
+    now = timezone.now()
+
+    User.objects.bulk_create(
+        [
+            User(
+                username=f'{tag}_{i}',
+                email=f'{tag}_{i}@example.com',
+                first_name=rng.choice(FIRST_NAMES),
+                last_name=rng.choice(LAST_NAMES),
+                last_login=now - timedelta(days=rng.randrange(60)) if rng.random() < 0.4 else None
+            )
+            for i in range(count)
+        ],
+        batch_size=batch_size
+    )
+    # MySQL doesn't return primary keys from bulk inserts, so read them back
+    user_ids = dict(
+        User.objects.filter(username__startswith=f'{tag}_').values_list('username', 'id')
+    )
+
+    Profile.objects.bulk_create(
+        [
+            Profile(
+                user_id=user_ids[f'{tag}_{i}'],
+                phone=f'8{offset + i:09d}',
+                member_type=rng.choice(['paying', 'sponsored']),
+                status=rng.choices(list(STATUS_WEIGHTS), list(STATUS_WEIGHTS.values()))[0],
+                verified_email=rng.random() < 0.8,
+                paid_for_self=rng.random() < 0.3,
+                paid_for_sponsored=rng.random() < 0.3
+            )
+            for i in range(count)
+        ],
+        batch_size=batch_size
+    )
+    profiles = list(
+        Profile.objects.filter(user_id__in=user_ids.values()).only('id', 'phone').order_by('id')
+    )
+
+    referrals = []
+    frontier = deque()
+    for profile in profiles:
+        depth = 0
+        while frontier and not frontier[0][2]:
+            frontier.popleft()
+        if frontier:
+            parent = frontier[0]
+            parent[2] -= 1
+            depth = parent[1] + 1
+            profile.referrer_phone = parent[0].phone
+            referrals.append(Referral(referrer_id=parent[0].id, referred_id=profile.id))
+        if depth < max_depth:
+            frontier.append([profile, depth, rng.randint(0, 2 * fanout)])
+
+    Referral.objects.bulk_create(referrals, batch_size=batch_size)
+    Profile.objects.bulk_update(profiles, ['referrer_phone'], batch_size=batch_size)
+
+    call_command('rebuild_referral_closure', stdout=io.StringIO())
+    recompute_referral_counters(batch_size=batch_size)
+    reindex_profiles(batch_size=batch_size)
+    cache.clear()
+    return len(referrals)
+
+# Benchmarks by name: (setup(env) -> callable to time, query budget). Budgets
+# count every query of a request, including the session and user lookups.
+BENCHMARKS = {}
+
+def register_benchmark(name, query_budget):
+    """Register setup(env), which returns the callable a benchmark times"""
+    def decorator(setup):
+        BENCHMARKS[name] = (setup, query_budget)
+        return setup
+    return decorator
+
+class BenchmarkEnv:
+    """Logged-in clients and the busiest member, shared by every benchmark"""
+
+    def __init__(self):
+        staff, created = User.objects.get_or_create(
+            username='benchmark_staff', defaults={'is_staff': True, 'is_superuser': True}
+        )
+        if created:
+            Profile.objects.filter(user=staff).update(phone='benchmark_staff')
+        self.staff_client = Client()
+        self.staff_client.force_login(staff)
+
+        self.member = Profile.objects.select_related('user').order_by(
+            '-downline_level_4_count', '-referral_count', 'id'
+        ).exclude(user=staff).first()
+        if self.member is None:
+            raise ValueError('No members to benchmark; seed some with seed_membership')
+        self.member_client = Client()
+        self.member_client.force_login(self.member.user)
+
+def _consume(response):
+    if response.status_code != 200:
+        raise AssertionError(f'{response.request["PATH_INFO"]} returned {response.status_code}')
+    if response.streaming:
+        return sum(len(chunk) for chunk in response.streaming_content)
+    return len(response.content)
+
+@register_benchmark('referral_matrix', query_budget=1)
+def referral_matrix(env):
+    return lambda: build_matrix_snapshot(env.member.id)
+
+def _downline_by_level(profile_id, max_depth):
+    """Level-by-level walk of the referral table, one query per level"""
+    rows = []
+    level = [profile_id]
+    for depth in range(1, max_depth + 1):
+        if not level:
+            break
+        members = list(
+            Referral.objects.filter(referrer_id__in=level).order_by('referred_id').values_list(
+                'referred_id', 'referred__member_type', 'referred__status'
+            )
+        )
+        rows.extend((member_id, depth, member_type, status) for member_id, member_type, status in members)
+        level = [member_id for member_id, _, _ in members]
+    return rows
+
+# The same matrix-deep downline read three ways: a recursive CTE over the
+# referral table, the closure table and one query per level
+@register_benchmark('downline_cte', query_budget=1)
+def downline_cte(env):
+    return lambda: recursive_downline(env.member.id, max_depth=MATRIX_DEPTH)
+
+@register_benchmark('downline_closure', query_budget=1)
+def downline_closure(env):
+    return lambda: list(
+        get_downline(env.member, max_depth=MATRIX_DEPTH).order_by('depth', 'descendant_id').values_list(
+            'descendant_id', 'depth', 'descendant__member_type', 'descendant__status'
+        )
+    )
+
+@register_benchmark('downline_levels', query_budget=MATRIX_DEPTH)
+def downline_levels(env):
+    return lambda: _downline_by_level(env.member.id, MATRIX_DEPTH)
+
+@register_benchmark('user_dashboard', query_budget=5)
+def user_dashboard(env):
+    url = reverse('user_dashboard')
+    return lambda: _consume(env.member_client.get(url))
+
+@register_benchmark('get_referral_data', query_budget=4)
+def get_referral_data(env):
+    url = reverse('get_referral_data')
+    return lambda: _consume(env.member_client.get(url, {'breakdown': '1'}))
+
+@register_benchmark('check_referrer', query_budget=1)
+def check_referrer(env):
+    url = reverse('check_referrer')
+    return lambda: _consume(env.member_client.get(url, {'phone': env.member.phone}))
+
+@register_benchmark('view_all_users', query_budget=6)
+def view_all_users(env):
+    url = reverse('view_all_users')
+    return lambda: _consume(env.staff_client.get(url, {'status': 'pending'}))
+
+@register_benchmark('dashboard_stats', query_budget=5)
+def dashboard_stats(env):
+    url = reverse('dashboard_stats')
+    return lambda: _consume(env.staff_client.get(url))
+
+@register_benchmark('export_data', query_budget=10)
+def export_data(env):
+    url = reverse('export_data')
+    return lambda: _consume(env.staff_client.post(url, {'export_type': 'csv'}))
+
+@register_benchmark('check_qualifications', query_budget=3)
+def check_qualifications(env):
+    return lambda: run_qualification_rules(dry_run=True)
+
+@register_benchmark('match_members', query_budget=3)
+def match_members_preview(env):
+    return lambda: match_members('proximity', preview=True)
+
+@register_benchmark('assign_members', query_budget=15)
+def assign_members(env):
+    def run():
+        # Assign every pair, then roll back so each iteration starts over
+        # (the budget includes the four transaction and savepoint statements)
+        with transaction.atomic():
+            match_members('fifo')
+            transaction.set_rollback(True)
+    return run
+
+def _percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[max(0, -(-len(ordered) * percent // 100) - 1)]
+
+# Query budgets count a view's own queries; a database cache would add its
+# round trips to every count, so benchmarks run on a process-local cache
+BENCHMARK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmarks',
+    }
+}
+
+def run_benchmarks(names=None, iterations=10):
+    """Time each benchmark, returning one result dict per benchmark
+
+    The cache is cleared first, so the first iteration of each benchmark
+    is a cold run; the query budget is checked against the worst iteration.
+    """
+    with override_settings(CACHES=BENCHMARK_CACHES):
+        return _run_benchmarks(names, iterations)
+
+def _run_benchmarks(names, iterations):
+    cache.clear()
+    env = BenchmarkEnv()
+    results = []
+    for name in names or BENCHMARKS:
+        setup, budget = BENCHMARKS[name]
+        run = setup(env)
+        timings = []
+        queries = []
+        for _ in range(iterations):
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                run()
+                timings.append((time.perf_counter() - start) * 1000)
+            queries.append(len(captured))
+
+        median = statistics.median(timings)
+        results.append({
+            'name': name,
+            'iterations': iterations,
+            'cold_ms': round(timings[0], 2),
+            'median_ms': round(median, 2),
+            'p95_ms': round(_percentile(timings, 95), 2),
+            'max_ms': round(max(timings), 2),
+            'per_second': round(1000 / median, 2) if median else None,
+            'queries': max(queries),
+            'query_budget': budget,
+            'within_budget': max(queries) <= budget,
+        })
+    return results
@@ -0,0 +1,132 @@
+# core/cache.py
+import functools
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+NAMESPACE_PREFIX = 'ns'
+LOCK_PREFIX = 'lock'
+LOCK_POLL_INTERVAL = 0.05
+
+def _namespace_key(namespace):
+    return f'{NAMESPACE_PREFIX}:{namespace}'
+
+def namespace_version(namespace):
+    """Current version of a namespace, starting one if none is cached"""
+    key = _namespace_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        # A millisecond clock start means a version lost to eviction comes
+        # back above every value it had before, so old entries stay unused
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+def bump_namespace(*namespaces):
+    """Retire every key made in the given namespaces"""
+    for namespace in set(namespaces):
+        try:
+            cache.incr(_namespace_key(namespace))
+        except ValueError:
+            # No version cached: the next read starts a fresh one
+            pass
+
+def make_key(namespace, *parts):
+    """A cache key inside the current version of a namespace"""
+    return ':'.join([namespace, f'v{namespace_version(namespace)}', *map(str, parts)])
+
+def _compute_and_set(key, compute, timeout):
+    value = compute()
+    if value is not None:
+        cache.set(key, (value, time.time() + timeout), timeout + settings.CACHE_STALE_GRACE)
+    return value
+
+def get_or_set(key, compute, timeout):
+    """Cached value for key, computing it with compute() when missing or expired
+
+    Entries outlive ``timeout`` by CACHE_STALE_GRACE seconds. Once an entry
+    expires, one caller takes a short lock and recomputes it while the
+    others keep getting the stale value; when there is no entry at all the
+    others wait up to CACHE_LOCK_TIMEOUT for the lock holder's result,
+    computing it themselves as soon as the lock is gone without one.
+    A None result is returned but not cached.
+    """
+    lock_key = f'{LOCK_PREFIX}:{key}'
+    lock_timeout = settings.CACHE_LOCK_TIMEOUT
+    entry = cache.get(key)
+
+    if entry is not None:
+        value, fresh_until = entry
+        if time.time() < fresh_until or not cache.add(lock_key, 1, lock_timeout):
+            return value
+    elif not cache.add(lock_key, 1, lock_timeout):
+        locked = False
+        deadline = time.monotonic() + lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry[0]
+            # The lock holder finished without caching anything (a None
+            # result or an error): take the lock over and compute
+            if cache.add(lock_key, 1, lock_timeout):
+                locked = True
+                break
+        if not locked:
+            # The lock holder never finished; compute without the lock,
+            # leaving it to expire rather than deleting a lock this caller
+            # does not hold
+            return _compute_and_set(key, compute, timeout)
+
+    try:
+        return _compute_and_set(key, compute, timeout)
+    finally:
+        cache.delete(lock_key)
+
+def cache_view(namespace, timeout, per_user=False, query_params=None):
+    """Cache successful GET responses of a view inside a namespace
+
+    ``namespace`` may be a callable taking the request, for caches that
+    belong to one user or object. The key covers the path, the query
+    string (or just ``query_params`` when given) and, with ``per_user``,
+    the user.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+
+            if query_params is None:
+                query = sorted(request.GET.lists())
+            else:
+                query = [(name, request.GET.getlist(name)) for name in query_params]
+            parts = [request.path, query]
+            if per_user:
+                parts.append(request.user.pk)
+            digest = hashlib.md5(repr(parts).encode()).hexdigest()
+            name = namespace(request) if callable(namespace) else namespace
+
+            responses = []
+
+            def render():
+                response = view(request, *args, **kwargs)
+                responses.append(response)
+                if response.status_code != 200 or response.streaming:
+                    return None
+                return (response.content, dict(response.items()))
+
+            cached = get_or_set(make_key(name, 'view', digest), render, timeout)
+            if responses:
+                # This request rendered the view itself
+                return responses[0]
+
+            content, headers = cached
+            response = HttpResponse(content)
+            for header, value in headers.items():
+                response[header] = value
+            return response
+        return wrapper
+    return decorator
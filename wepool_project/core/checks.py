@@ -0,0 +1,39 @@
+# core/checks.py
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Tags, Warning, register
+
+# Backends whose incr() is a single atomic operation on the server
+ATOMIC_INCR_BACKENDS = (
+    'django.core.cache.backends.redis.RedisCache',
+    'django.core.cache.backends.memcached.PyMemcacheCache',
+    'django.core.cache.backends.memcached.PyLibMCCache',
+)
+
+def cache_is_per_process(alias='default'):
+    """True when the cache lives in this process only (locmem)"""
+    return isinstance(caches[alias], LocMemCache)
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """Warn when features that rely on a cache shared between processes can't"""
+    warnings = []
+    if cache_is_per_process():
+        warnings.append(Warning(
+            'The default cache is per process (locmem).',
+            hint=(
+                'Namespace invalidation, matrix snapshots, referrer lookups and live '
+                'dashboard counters are then not shared between web workers, jobs and '
+                'management commands. Set CACHE_BACKEND to db, file or redis.'
+            ),
+            id='core.W001',
+        ))
+    if (getattr(settings, 'DASHBOARD_STATS_LIVE_COUNTERS', False) and
+            settings.CACHES['default']['BACKEND'] not in ATOMIC_INCR_BACKENDS):
+        warnings.append(Warning(
+            'Live dashboard counters are on, but the cache backend has no atomic incr().',
+            hint='Concurrent updates can be lost until the next reseed; use redis or memcached.',
+            id='core.W002',
+        ))
+    return warnings
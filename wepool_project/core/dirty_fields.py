@@ -0,0 +1,80 @@
+# core/dirty_fields.py
+
+class DirtyFieldsMixin:
+    """Track the values a model instance was loaded with and save only what changed
+
+    A plain save() of a loaded instance becomes save(update_fields=<dirty
+    fields>), and is skipped entirely (signals included) when nothing
+    changed. Fields named in SAVE_EXCLUDE_FIELDS are never written by a plain
+    save; use them for columns maintained with F() updates. auto_now fields
+    are added whenever something else is written. post_save receivers can
+    compare against ``_loaded_values``, which still holds the previous values
+    until every receiver has run. Values mutated in place (e.g. a JSON dict)
+    are not noticed; assign a new value instead.
+    """
+    SAVE_EXCLUDE_FIELDS = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def get_dirty_fields(self):
+        """Names of concrete fields changed since the instance was loaded or saved"""
+        loaded = getattr(self, '_loaded_values', None)
+        dirty = []
+        for field in self._meta.concrete_fields:
+            if field.primary_key or field.name in self.SAVE_EXCLUDE_FIELDS:
+                continue
+            if loaded is None:
+                dirty.append(field.name)
+            elif field.attname in loaded:
+                if getattr(self, field.attname) != loaded[field.attname]:
+                    dirty.append(field.name)
+            elif field.attname in self.__dict__:
+                # Deferred when loaded, but assigned since
+                dirty.append(field.name)
+        return dirty
+
+    def is_dirty(self):
+        return self._state.adding or bool(self.get_dirty_fields())
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and not kwargs.get('force_insert'):
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None:
+                update_fields = self.get_dirty_fields()
+            if update_fields:
+                update_fields = set(update_fields)
+                update_fields.update(
+                    field.name for field in self._meta.concrete_fields
+                    if getattr(field, 'auto_now', False)
+                )
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+        self._remember_loaded_values(kwargs.get('update_fields'))
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        self._remember_loaded_values(fields)
+
+    def _remember_loaded_values(self, fields=None):
+        # post_save receivers compare against these, so only refresh them
+        # once every receiver has seen the previous values.
+        if getattr(self, '_loaded_values', None) is None or fields is None:
+            self._loaded_values = {}
+        if fields is None:
+            deferred = self.get_deferred_fields()
+            fields = [
+                field.name for field in self._meta.concrete_fields
+                if field.attname not in deferred
+            ]
+        for name in fields:
+            field = self._meta.get_field(name)
+            self._loaded_values[field.attname] = getattr(self, field.attname)
+
+def form_update_fields(form):
+    """Model fields a ModelForm changed, for save(update_fields=...)"""
+    names = {field.name for field in form._meta.model._meta.concrete_fields}
+    return [name for name in form.changed_data if name in names]
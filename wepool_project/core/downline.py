@@ -0,0 +1,82 @@
+# core/downline.py
+from django.db import NotSupportedError, connection
+from users.models import Profile
+from .models import Referral, ReferralClosure
+
+# Deepest level a recursive walk goes when no max_depth is given. MySQL
+# stops recursive CTEs at cte_max_recursion_depth (1000 by default).
+MAX_DOWNLINE_DEPTH = 100
+
+# Backends whose WITH RECURSIVE this module's SQL is written for (every
+# MySQL and MariaDB release Django supports has it)
+RECURSIVE_CTE_VENDORS = ('sqlite', 'postgresql', 'mysql')
+
+def _tables():
+    if connection.vendor not in RECURSIVE_CTE_VENDORS:
+        raise NotSupportedError(f'Recursive downline queries are not written for {connection.vendor}')
+    quote = connection.ops.quote_name
+    return {
+        'referral': quote(Referral._meta.db_table),
+        'profile': quote(Profile._meta.db_table),
+        'closure': quote(ReferralClosure._meta.db_table),
+    }
+
+def _depth_range(min_depth, max_depth):
+    max_depth = MAX_DOWNLINE_DEPTH if max_depth is None else min(max_depth, MAX_DOWNLINE_DEPTH)
+    return max(min_depth, 1), max_depth
+
+def recursive_downlines(profile_ids, min_depth=1, max_depth=None):
+    """(root id, profile id, depth, member_type, status) of every member
+    min_depth to max_depth referrals below each of profile_ids
+
+    Walks the referral table with one WITH RECURSIVE query, so it needs
+    neither the closure table nor a query per level. Rows come ordered by
+    root, depth and profile id.
+    """
+    profile_ids = list(profile_ids)
+    min_depth, max_depth = _depth_range(min_depth, max_depth)
+    if not profile_ids or min_depth > max_depth:
+        return []
+
+    placeholders = ', '.join(['%s'] * len(profile_ids))
+    sql = (
+        'WITH RECURSIVE downline (root_id, profile_id, depth) AS ('
+        ' SELECT r.referrer_id, r.referred_id, 1 FROM {referral} r'
+        ' WHERE r.referrer_id IN ({placeholders})'
+        ' UNION ALL'
+        ' SELECT d.root_id, r.referred_id, d.depth + 1 FROM downline d'
+        ' INNER JOIN {referral} r ON r.referrer_id = d.profile_id'
+        ' WHERE d.depth < %s'
+        ')'
+        ' SELECT d.root_id, d.profile_id, d.depth, p.member_type, p.status'
+        ' FROM downline d INNER JOIN {profile} p ON p.id = d.profile_id'
+        ' WHERE d.depth >= %s'
+        ' ORDER BY d.root_id, d.depth, d.profile_id'
+    ).format(placeholders=placeholders, **_tables())
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*profile_ids, max_depth, min_depth])
+        return cursor.fetchall()
+
+def recursive_downline(profile_id, min_depth=1, max_depth=None):
+    """(profile id, depth, member_type, status) of a profile's downline
+    for a depth range, ordered by depth, from one recursive query"""
+    return [row[1:] for row in recursive_downlines([profile_id], min_depth, max_depth)]
+
+def rebuild_closure(max_depth=None):
+    """Refill the empty closure table from the referral table in one
+    INSERT ... WITH RECURSIVE statement, returning the paths written"""
+    _, max_depth = _depth_range(1, max_depth)
+    sql = (
+        'INSERT INTO {closure} (ancestor_id, descendant_id, depth)'
+        ' WITH RECURSIVE paths (ancestor_id, descendant_id, depth) AS ('
+        ' SELECT referrer_id, referred_id, 1 FROM {referral}'
+        ' UNION ALL'
+        ' SELECT p.ancestor_id, r.referred_id, p.depth + 1 FROM paths p'
+        ' INNER JOIN {referral} r ON r.referrer_id = p.descendant_id'
+        ' WHERE p.depth < %s'
+        ')'
+        ' SELECT ancestor_id, descendant_id, depth FROM paths'
+    ).format(**_tables())
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [max_depth])
+        return cursor.rowcount
@@ -0,0 +1,214 @@
+# core/instrumentation.py
+import contextvars
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack, contextmanager
+from django.conf import settings
+from django.db import connections
+from django.template.base import Template
+from django.utils.functional import empty
+
+logger = logging.getLogger(__name__)
+
+TIMING_FIELDS = ('total_ms', 'view_ms', 'template_ms', 'sql_ms', 'queries')
+PERCENTILES = (50, 95, 99)
+
+# Literals and placeholder lists that differ between otherwise identical queries
+_SQL_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SQL_IN_LISTS = re.compile(r'\bIN \((?:\s*(?:%s|\?)\s*,?)+\)', re.IGNORECASE)
+
+_current = contextvars.ContextVar('request_profile', default=None)
+
+# Rolling windows of the requests this process served, by view. Every
+# request is also logged, so the log holds the figures across workers.
+_windows = {}
+_windows_lock = threading.Lock()
+
+def sql_shape(sql):
+    """SQL with literals and IN lists collapsed, so repeated lookups compare equal"""
+    return _SQL_IN_LISTS.sub('IN (...)', _SQL_LITERALS.sub('?', sql))
+
+class RequestProfile:
+    """Query, SQL and template timings gathered while one request is served"""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_ms = 0.0
+        self.template_ms = 0.0
+        self.view_ms = 0.0
+        self.view_started = None
+        self.shapes = Counter()
+        self._template_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_ms += (time.perf_counter() - start) * 1000
+            self.queries += 1
+            self.shapes[sql_shape(sql)] += 1
+
+    def repeated_queries(self, threshold):
+        """(shape, count) for every SQL shape run at least threshold times"""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+def _timed_render(render):
+    """Wrap Template.render to add top-level render time to the current profile"""
+    def wrapper(self, context):
+        profile = _current.get()
+        if profile is None:
+            return render(self, context)
+
+        # Included and extended templates render inside their parent
+        profile._template_depth += 1
+        start = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            profile._template_depth -= 1
+            if not profile._template_depth:
+                profile.template_ms += (time.perf_counter() - start) * 1000
+    wrapper.instrumented = True
+    return wrapper
+
+def _percentile(values, percent):
+    ordered = sorted(values)
+    index = max(0, -(-len(ordered) * percent // 100) - 1)
+    return ordered[index]
+
+def record_timing(view_name, sample):
+    """Add a request's figures to this process's rolling window of its view"""
+    window = getattr(settings, 'REQUEST_TIMINGS_WINDOW', 200)
+    with _windows_lock:
+        samples = _windows.get(view_name)
+        if samples is None or samples.maxlen != window:
+            samples = _windows[view_name] = deque(samples or (), maxlen=window)
+        samples.append(sample)
+
+def timing_percentiles():
+    """Rolling p50/p95/p99 of every timing field, by view, for this process"""
+    with _windows_lock:
+        windows = {name: list(samples) for name, samples in _windows.items()}
+
+    report = {}
+    for name in sorted(windows):
+        samples = windows[name]
+        if not samples:
+            continue
+        report[name] = {'requests': len(samples)}
+        for field in TIMING_FIELDS:
+            values = [sample[field] for sample in samples]
+            if values:
+                report[name][field] = {
+                    f'p{percent}': round(_percentile(values, percent), 2) for percent in PERCENTILES
+                }
+    return report
+
+def reset_timings():
+    with _windows_lock:
+        _windows.clear()
+
+def _user_is_staff(request):
+    """Whether the request's user is staff, if the request already loaded the user"""
+    user = request.__dict__.get('user')
+    if user is None or getattr(user, '_wrapped', None) is empty:
+        return False
+    return user.is_staff
+
+class QueryInstrumentationMiddleware:
+    """Log query counts and timings per request and keep rolling per-view figures
+
+    Each request is logged as one JSON line on this module's logger, with a
+    warning when the same SQL shape repeats REQUEST_REPEATED_QUERY_THRESHOLD
+    times (usually an N+1). Responses to staff whose view loaded the user
+    get a Server-Timing header, so the browser's network panel shows the
+    breakdown. Template time comes from a Template.render wrapper that
+    does nothing outside an instrumented request. Keep it last in
+    MIDDLEWARE so the view time covers only the view.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if not getattr(Template.render, 'instrumented', False):
+            Template.render = _timed_render(Template.render)
+
+    def __call__(self, request):
+        if not getattr(settings, 'REQUEST_INSTRUMENTATION', True):
+            return self.get_response(request)
+
+        profile = RequestProfile()
+        token = _current.set(profile)
+        start = time.perf_counter()
+        try:
+            with _wrap_connections(profile):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        end = time.perf_counter()
+        total_ms = (end - start) * 1000
+        if profile.view_started is not None:
+            profile.view_ms = (end - profile.view_started) * 1000
+
+        match = request.resolver_match
+        view_name = (match.view_name if match else None) or 'unresolved'
+        sample = {
+            'total_ms': round(total_ms, 2),
+            'view_ms': round(profile.view_ms, 2),
+            'template_ms': round(profile.template_ms, 2),
+            'sql_ms': round(profile.sql_ms, 2),
+            'queries': profile.queries,
+        }
+        record_timing(view_name, sample)
+        self.log(request, response, view_name, sample, profile)
+
+        # Loading the user just for this would cost anonymous requests a
+        # session and user query
+        if _user_is_staff(request):
+            response['Server-Timing'] = ', '.join([
+                f"total;dur={sample['total_ms']}",
+                f"view;dur={sample['view_ms']}",
+                f"template;dur={sample['template_ms']}",
+                f"sql;dur={sample['sql_ms']};desc=\"{profile.queries} queries\"",
+            ])
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profile = _current.get()
+        if profile is not None:
+            profile.view_started = time.perf_counter()
+        return None
+
+    def log(self, request, response, view_name, sample, profile):
+        threshold = getattr(settings, 'REQUEST_REPEATED_QUERY_THRESHOLD', 5)
+        repeated = profile.repeated_queries(threshold)
+        entry = dict(
+            sample,
+            view=view_name,
+            method=request.method,
+            path=request.path,
+            status=response.status_code,
+            repeated_queries=len(repeated),
+        )
+        logger.info(json.dumps(entry))
+        for shape, count in repeated:
+            logger.warning(json.dumps({
+                'event': 'repeated_query',
+                'view': view_name,
+                'path': request.path,
+                'count': count,
+                'sql': shape,
+            }))
+
+@contextmanager
+def _wrap_connections(profile):
+    """Install a RequestProfile as execute wrapper on every configured database"""
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(profile))
+        yield
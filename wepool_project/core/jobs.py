@@ -0,0 +1,112 @@
+# core/jobs.py
+import logging
+import tempfile
+import threading
+import uuid
+from django.conf import settings
+from django.core.files import File
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Job handlers by kind; apps register theirs in a jobs.py module, which
+# CoreConfig.ready() imports
+JOB_HANDLERS = {}
+
+def register_job(kind):
+    """Register handler(job, **params) as the runner for a kind of job"""
+    def decorator(handler):
+        JOB_HANDLERS[kind] = handler
+        return handler
+    return decorator
+
+def enqueue_job(kind, params=None, user=None):
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f'Unknown job kind: {kind}')
+    return Job.objects.create(kind=kind, params=params or {}, created_by=user)
+
+def _claimed(job):
+    """The job's row, as long as it is still running under job's claim"""
+    return Job.objects.filter(pk=job.pk, status='running', claim_token=job.claim_token)
+
+def claim_job():
+    """Mark the oldest queued job as running and return it, or None"""
+    with transaction.atomic():
+        job = Job.objects.select_for_update(skip_locked=True).filter(
+            status='queued'
+        ).order_by('created_at', 'id').first()
+        if job is None:
+            return None
+
+        now = timezone.now()
+        job.status = 'running'
+        job.started_at = job.heartbeat_at = now
+        job.claim_token = uuid.uuid4()
+        job.save(update_fields=['status', 'started_at', 'heartbeat_at', 'claim_token'])
+    return job
+
+def report_progress(job, done, total=None):
+    """Record progress (and refresh the heartbeat) without touching other fields"""
+    job.progress = done
+    if total is not None:
+        job.total = total
+    job.heartbeat_at = timezone.now()
+    _claimed(job).update(progress=job.progress, total=job.total, heartbeat_at=job.heartbeat_at)
+
+def save_result_file(job, filename, chunks, content_type):
+    """Spool text or byte chunks to disk and attach them as the job's result file"""
+    with tempfile.TemporaryFile() as spool:
+        for chunk in chunks:
+            spool.write(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+        spool.seek(0)
+        job.result_file.save(filename, File(spool), save=False)
+    job.result_content_type = content_type
+    _claimed(job).update(result_file=job.result_file.name, result_content_type=content_type)
+
+def _keep_alive(job, stop):
+    """Refresh a running job's heartbeat every JOB_HEARTBEAT_SECONDS until stop is set"""
+    try:
+        while not stop.wait(settings.JOB_HEARTBEAT_SECONDS):
+            _claimed(job).update(heartbeat_at=timezone.now())
+    finally:
+        connection.close()
+
+def run_job(job):
+    """Run a claimed job to completion, recording its result or error
+
+    A thread keeps the heartbeat fresh while the handler runs, so slow
+    chunks are not taken for a dead worker. Every write is conditional on
+    the job still being held under this claim: if it was requeued anyway,
+    the result is dropped rather than overwriting the new run.
+    """
+    close_old_connections()
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_keep_alive, args=(job, stop), daemon=True)
+    heartbeat.start()
+    try:
+        job.result = JOB_HANDLERS[job.kind](job, **job.params)
+        job.status = 'succeeded'
+    except Exception as exc:
+        logger.exception('Job %s failed', job.pk)
+        job.status = 'failed'
+        job.error = str(exc)
+    finally:
+        stop.set()
+        heartbeat.join()
+        job.finished_at = timezone.now()
+        finished = _claimed(job).update(
+            result=job.result, status=job.status, error=job.error, finished_at=job.finished_at
+        )
+        if not finished:
+            logger.warning('Job %s was requeued while running; dropped its %s result', job.pk, job.status)
+        close_old_connections()
+    return job
+
+def requeue_stale_jobs(timeout):
+    """Put back running jobs whose worker stopped reporting for timeout"""
+    return Job.objects.filter(
+        status='running',
+        heartbeat_at__lt=timezone.now() - timeout
+    ).update(status='queued', progress=0, started_at=None, heartbeat_at=None, claim_token=None)
@@ -0,0 +1,118 @@
+# core/mail.py
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.db import transaction
+from django.utils import timezone
+from .models import OutboundEmail
+
+OUTBOX_BATCH_SIZE = 50
+OUTBOX_LEASE = timedelta(minutes=5)
+RETRY_BASE_DELAY = timedelta(minutes=1)
+RETRY_MAX_DELAY = timedelta(hours=6)
+DIGEST_MAX_NOTIFICATIONS = 500
+
+def admin_digest_enabled():
+    return getattr(settings, 'EMAIL_ADMIN_DIGEST', False)
+
+def max_attempts():
+    return getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+
+def queue_email(subject, body, recipients, from_email=None, kind='message'):
+    """Store an email for the send_queued_email worker instead of sending it inline"""
+    return OutboundEmail.objects.create(
+        subject=subject,
+        body=body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=list(recipients),
+        kind=kind
+    )
+
+def queue_admin_notification(subject, body, recipients, from_email=None):
+    """Queue an admin notice, held for the next digest when digests are enabled"""
+    kind = 'admin_notification' if admin_digest_enabled() else 'message'
+    return queue_email(subject, body, recipients, from_email=from_email, kind=kind)
+
+def retry_delay(attempts):
+    """Exponential backoff after the given number of failed attempts"""
+    return min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY)
+
+def claim_due_emails(batch_size=OUTBOX_BATCH_SIZE):
+    """Lease a batch of due messages so concurrent workers skip them"""
+    now = timezone.now()
+    with transaction.atomic():
+        emails = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True).filter(
+                status='pending',
+                kind='message',
+                next_attempt_at__lte=now
+            ).order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        OutboundEmail.objects.filter(
+            id__in=[email.id for email in emails]
+        ).update(next_attempt_at=now + OUTBOX_LEASE)
+    return emails
+
+def send_queued_emails(connection, batch_size=OUTBOX_BATCH_SIZE):
+    """Send one batch of due messages over a reused connection, returning (sent, failed)"""
+    sent = failed = 0
+    for email in claim_due_emails(batch_size):
+        message = EmailMessage(
+            email.subject, email.body, email.from_email, email.recipients,
+            connection=connection
+        )
+        try:
+            # open() is a no-op while the connection is up; opening it here
+            # keeps send_messages from closing it after every message
+            connection.open()
+            connection.send_messages([message])
+        except Exception as exc:
+            # Drop the connection so the next message reconnects cleanly
+            connection.close()
+            email.attempts += 1
+            email.last_error = str(exc)
+            if email.attempts >= max_attempts():
+                email.status = 'failed'
+            else:
+                email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+            email.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at'])
+            failed += 1
+            continue
+
+        email.attempts += 1
+        email.status = 'sent'
+        email.sent_at = timezone.now()
+        email.save(update_fields=['attempts', 'status', 'sent_at'])
+        sent += 1
+    return sent, failed
+
+def queue_admin_digest(limit=DIGEST_MAX_NOTIFICATIONS):
+    """Collapse held admin notifications into one queued email per recipient list"""
+    with transaction.atomic():
+        notifications = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True).filter(
+                status='pending',
+                kind='admin_notification'
+            ).order_by('id')[:limit]
+        )
+
+        groups = {}
+        for notification in notifications:
+            key = (notification.from_email, tuple(notification.recipients))
+            groups.setdefault(key, []).append(notification)
+
+        for (from_email, recipients), grouped in groups.items():
+            queue_email(
+                f'WePool Tribe admin digest: {len(grouped)} notifications',
+                '\n\n---\n\n'.join(
+                    f'{notification.subject}\n\n{notification.body}' for notification in grouped
+                ),
+                recipients,
+                from_email=from_email
+            )
+
+        OutboundEmail.objects.filter(
+            id__in=[notification.id for notification in notifications]
+        ).update(status='digested', sent_at=timezone.now())
+
+    return len(notifications)
@@ -0,0 +1,31 @@
+# Management command for backfilling the referral closure table
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from core.downline import MAX_DOWNLINE_DEPTH, rebuild_closure
+from core.models import ReferralClosure
+
+class Command(BaseCommand):
+    help = 'Rebuild the referral closure table from existing referrals'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-depth',
+            type=int,
+            default=MAX_DOWNLINE_DEPTH,
+            help='Stop expanding the tree after this many levels'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            ReferralClosure.objects.all().delete()
+            # Every level comes from one recursive INSERT ... SELECT
+            total = rebuild_closure(options['max_depth'])
+            levels = ReferralClosure.objects.aggregate(levels=Max('depth'))['levels'] or 0
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Rebuilt referral closure with {total} paths across {levels} levels'
+            )
+        )
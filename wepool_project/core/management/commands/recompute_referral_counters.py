@@ -0,0 +1,24 @@
+# Management command for repairing denormalized referral counters
+
+from django.core.management.base import BaseCommand
+from core.utils import recompute_referral_counters
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized referral counters on every profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of profiles to read and write per batch'
+        )
+
+    def handle(self, *args, **options):
+        drifted = recompute_referral_counters(batch_size=options['batch_size'])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Repaired referral counters on {drifted} profiles'
+            )
+        )
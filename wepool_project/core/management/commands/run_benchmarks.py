@@ -0,0 +1,63 @@
+# Management command that times the key views and utilities
+
+import json
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from users.models import Profile
+from core.benchmarks import BENCHMARKS, run_benchmarks
+
+class Command(BaseCommand):
+    help = 'Benchmark the key views and utilities against their query budgets'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=10,
+            help='Timed runs per benchmark; the first one runs with a cold cache'
+        )
+        parser.add_argument(
+            '--only',
+            action='append',
+            choices=sorted(BENCHMARKS),
+            help='Run just this benchmark (may be repeated)'
+        )
+        parser.add_argument(
+            '--output',
+            help='Write the results as JSON to this file'
+        )
+
+    def handle(self, *args, **options):
+        # The test environment lets the test client through ALLOWED_HOSTS
+        # and keeps any mail in memory
+        setup_test_environment()
+        try:
+            results = run_benchmarks(options['only'], options['iterations'])
+        finally:
+            teardown_test_environment()
+
+        for result in results:
+            line = (
+                f"{result['name']}: median {result['median_ms']} ms, "
+                f"p95 {result['p95_ms']} ms, cold {result['cold_ms']} ms, "
+                f"{result['queries']}/{result['query_budget']} queries"
+            )
+            style = self.style.SUCCESS if result['within_budget'] else self.style.ERROR
+            self.stdout.write(style(line))
+
+        if options['output']:
+            report = {
+                'created_at': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'profiles': Profile.objects.count(),
+                'results': results,
+            }
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(f"Wrote {options['output']}")
+
+        over_budget = [result['name'] for result in results if not result['within_budget']]
+        if over_budget:
+            raise CommandError(f"Over query budget: {', '.join(over_budget)}")
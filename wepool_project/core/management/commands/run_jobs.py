@@ -0,0 +1,78 @@
+# Management command that executes queued background jobs
+
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from core.jobs import claim_job, requeue_stale_jobs, run_job
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs on a pool of worker threads'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=2,
+            help='Number of jobs to run at the same time'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling for jobs instead of exiting once the queue is empty'
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=5,
+            help='Seconds to wait between polls of an empty queue with --loop'
+        )
+        parser.add_argument(
+            '--stale-minutes',
+            type=int,
+            default=30,
+            help='Requeue running jobs whose heartbeat is older than this'
+        )
+
+    def handle(self, *args, **options):
+        if options['stale_minutes'] * 60 <= settings.JOB_HEARTBEAT_SECONDS:
+            raise CommandError(
+                f'--stale-minutes must be longer than JOB_HEARTBEAT_SECONDS ({settings.JOB_HEARTBEAT_SECONDS}s)'
+            )
+        requeued = requeue_stale_jobs(timedelta(minutes=options['stale_minutes']))
+        if requeued:
+            self.stdout.write(f'Requeued {requeued} stale jobs')
+
+        succeeded = failed = 0
+        running = set()
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            while True:
+                # Fill free worker slots with newly claimed jobs
+                while len(running) < options['workers']:
+                    job = claim_job()
+                    if job is None:
+                        break
+                    self.stdout.write(f'Started {job}')
+                    running.add(pool.submit(run_job, job))
+
+                if not running:
+                    if not options['loop']:
+                        break
+                    time.sleep(options['interval'])
+                    continue
+
+                done, running = wait(running, timeout=options['interval'], return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = future.result()
+                    self.stdout.write(f'Finished {job}')
+                    if job.status == 'succeeded':
+                        succeeded += 1
+                    else:
+                        failed += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Ran {succeeded + failed} jobs: {succeeded} succeeded, {failed} failed'
+            )
+        )
@@ -0,0 +1,53 @@
+# Management command that fills a development database with synthetic members
+
+from django.core.management.base import BaseCommand
+from core.benchmarks import seed_membership
+
+class Command(BaseCommand):
+    help = 'Create synthetic members in referral trees (development databases only)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'count',
+            type=int,
+            help='Number of members to create'
+        )
+        parser.add_argument(
+            '--depth',
+            type=int,
+            default=6,
+            help='Deepest referral level a tree may reach'
+        )
+        parser.add_argument(
+            '--fanout',
+            type=int,
+            default=3,
+            help='Average number of members each member refers'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=None,
+            help='Random seed, for repeatable data sets'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of rows per bulk insert'
+        )
+
+    def handle(self, *args, **options):
+        referrals = seed_membership(
+            options['count'],
+            max_depth=options['depth'],
+            fanout=options['fanout'],
+            seed=options['seed'],
+            batch_size=options['batch_size']
+        )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {options['count']} members with {referrals} referrals"
+            )
+        )
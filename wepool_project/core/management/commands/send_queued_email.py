@@ -0,0 +1,75 @@
+# Management command that delivers the email outbox
+
+import time
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+from core.mail import DIGEST_MAX_NOTIFICATIONS, OUTBOX_BATCH_SIZE, queue_admin_digest, send_queued_emails
+
+class Command(BaseCommand):
+    help = 'Send queued emails over one SMTP connection, retrying failures with backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=OUTBOX_BATCH_SIZE,
+            help='Number of emails to claim per batch'
+        )
+        parser.add_argument(
+            '--digest',
+            action='store_true',
+            help='Collapse held admin notifications into a digest before sending'
+        )
+        parser.add_argument(
+            '--digest-interval',
+            type=int,
+            default=60,
+            help='Minutes between digests with --digest --loop'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling the outbox instead of exiting once it is empty'
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=10,
+            help='Seconds to wait between polls of an empty outbox with --loop'
+        )
+
+    def digest(self):
+        collapsed = total = queue_admin_digest()
+        while collapsed == DIGEST_MAX_NOTIFICATIONS:
+            collapsed = queue_admin_digest()
+            total += collapsed
+        self.stdout.write(f'Collapsed {total} admin notifications into a digest')
+
+    def handle(self, *args, **options):
+        connection = get_connection()
+        total_sent = total_failed = 0
+        next_digest = time.monotonic()
+        try:
+            while True:
+                # Digest first, then every --digest-interval while looping
+                if options['digest'] and time.monotonic() >= next_digest:
+                    self.digest()
+                    next_digest = time.monotonic() + options['digest_interval'] * 60
+                sent, failed = send_queued_emails(connection, batch_size=options['batch_size'])
+                total_sent += sent
+                total_failed += failed
+                if sent or failed:
+                    continue
+                if not options['loop']:
+                    break
+                # Don't hold an idle SMTP session open between polls
+                connection.close()
+                time.sleep(options['interval'])
+        finally:
+            connection.close()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Sent {total_sent} emails, {total_failed} failed attempts'
+            )
+        )
@@ -0,0 +1,51 @@
+# Management command that prebuilds referral matrix snapshots for active users
+
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from users.models import Profile
+from core.checks import cache_is_per_process
+from core.snapshots import warm_matrix_snapshot
+
+class Command(BaseCommand):
+    help = 'Build cached referral matrix snapshots for the most recently active users'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=500,
+            help='Number of profiles to warm, most recent logins first'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=30,
+            help='Only warm profiles whose user logged in within this many days'
+        )
+
+    def handle(self, *args, **options):
+        if cache_is_per_process():
+            raise CommandError(
+                'The cache is per process (locmem), so snapshots warmed here would '
+                'be gone when this command exits; set CACHE_BACKEND to db, file or redis'
+            )
+
+        since = timezone.now() - timedelta(days=options['days'])
+        profile_ids = Profile.objects.filter(
+            user__last_login__gte=since,
+            referral_count__gt=0
+        ).order_by('-user__last_login').values_list('id', flat=True)[:options['limit']]
+
+        built = cached = 0
+        for profile_id in profile_ids:
+            if warm_matrix_snapshot(profile_id):
+                built += 1
+            else:
+                cached += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Warmed {built} matrix snapshots ({cached} were already cached)'
+            )
+        )
@@ -0,0 +1,95 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:56
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def deactivate_duplicate_assignments(apps, schema_editor):
+    # Keep the earliest assignment of each member active on each side
+    Assignment = apps.get_model("core", "Assignment")
+    for field in ("yellow_member", "sponsored_member"):
+        seen = set()
+        duplicates = []
+        for pk, member_id in (
+            Assignment.objects.filter(active=True)
+            .order_by("assigned_at", "id")
+            .values_list("id", field)
+        ):
+            if member_id in seen:
+                duplicates.append(pk)
+            seen.add(member_id)
+        Assignment.objects.filter(id__in=duplicates).update(active=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("core", "0004_job"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AssignmentSubmission",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("key", models.CharField(max_length=64, unique=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="assignment",
+            name="active",
+            field=models.BooleanField(default=True),
+        ),
+        migrations.RunPython(
+            deactivate_duplicate_assignments, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name="assignment",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("active", True)),
+                fields=("yellow_member",),
+                name="core_assignment_active_yellow",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="assignment",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("active", True)),
+                fields=("sponsored_member",),
+                name="core_assignment_active_pif",
+            ),
+        ),
+        migrations.AddField(
+            model_name="assignmentsubmission",
+            name="created_by",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="assignment_submissions",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddField(
+            model_name="assignment",
+            name="submission",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="assignments",
+                to="core.assignmentsubmission",
+            ),
+        ),
+    ]
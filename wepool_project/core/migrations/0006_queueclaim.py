@@ -0,0 +1,87 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:59
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0004_profilesearch"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("core", "0005_assignment_uniqueness"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="QueueClaim",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("queue", models.CharField(max_length=30)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("claimed", "Claimed"),
+                            ("done", "Done"),
+                            ("released", "Released"),
+                            ("expired", "Expired"),
+                        ],
+                        default="claimed",
+                        max_length=10,
+                    ),
+                ),
+                ("claimed_at", models.DateTimeField()),
+                ("lease_expires_at", models.DateTimeField()),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "claimed_by",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="queue_claims",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "profile",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="queue_claims",
+                        to="users.profile",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["queue", "status", "lease_expires_at"],
+                        name="core_qclaim_live_idx",
+                    ),
+                    models.Index(
+                        fields=["claimed_by", "status"], name="core_qclaim_admin_idx"
+                    ),
+                    models.Index(
+                        fields=["queue", "status", "finished_at"],
+                        name="core_qclaim_done_idx",
+                    ),
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="queueclaim",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("status", "claimed")),
+                fields=("queue", "profile"),
+                name="core_qclaim_open_unique",
+            ),
+        ),
+    ]
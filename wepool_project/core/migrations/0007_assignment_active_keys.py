@@ -0,0 +1,52 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:09
+
+from django.db import migrations, models
+
+
+def fill_active_keys(apps, schema_editor):
+    # MySQL skipped the partial constraints, so duplicates may have been
+    # made since 0005; keep the earliest active assignment of each member
+    Assignment = apps.get_model("core", "Assignment")
+    seen = set()
+    for assignment in Assignment.objects.filter(active=True).order_by("assigned_at", "id"):
+        sides = {("yellow", assignment.yellow_member_id), ("pif", assignment.sponsored_member_id)}
+        if sides & seen:
+            assignment.active = False
+            assignment.save(update_fields=["active"])
+            continue
+        seen |= sides
+        assignment.active_yellow_key = assignment.yellow_member_id
+        assignment.active_pif_key = assignment.sponsored_member_id
+        assignment.save(update_fields=["active_yellow_key", "active_pif_key"])
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0006_queueclaim"),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name="assignment",
+            name="core_assignment_active_yellow",
+        ),
+        migrations.RemoveConstraint(
+            model_name="assignment",
+            name="core_assignment_active_pif",
+        ),
+        migrations.AddField(
+            model_name="assignment",
+            name="active_pif_key",
+            field=models.BigIntegerField(
+                blank=True, editable=False, null=True, unique=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="assignment",
+            name="active_yellow_key",
+            field=models.BigIntegerField(
+                blank=True, editable=False, null=True, unique=True
+            ),
+        ),
+        migrations.RunPython(fill_active_keys, migrations.RunPython.noop),
+    ]
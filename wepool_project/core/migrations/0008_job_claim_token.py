@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0007_assignment_active_keys"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="job",
+            name="claim_token",
+            field=models.UUIDField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -1,9 +1,20 @@
 #from django.db import models
 
 # Create your models here.
-from django.db import models
+from collections import defaultdict
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.storage import FileSystemStorage
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
 from users.models import Profile
 
+ACTIVE_STATUSES = ('yellow', 'green')
+COUNTED_DOWNLINE_DEPTH = 4
+
 class Referral(models.Model):
     referrer = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='referrals_made')
     referred = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='referral_received')
@@ -15,12 +26,342 @@ class Referral(models.Model):
     def __str__(self):
         return f"{self.referrer} referred {self.referred}"
 
+class ReferralClosure(models.Model):
+    """Ancestor/descendant pairs of the referral tree, one row per path"""
+    ancestor = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='descendant_links')
+    descendant = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='ancestor_links')
+    depth = models.PositiveSmallIntegerField()
+
+    class Meta:
+        unique_together = ['ancestor', 'descendant', 'depth']
+        indexes = [
+            models.Index(fields=['ancestor', 'depth'], name='core_closure_anc_depth_idx'),
+            models.Index(fields=['descendant', 'depth'], name='core_closure_desc_depth_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.ancestor} -> {self.descendant} ({self.depth})"
+
+class AssignmentSubmission(models.Model):
+    """One submitted assign request, keyed so a retried submission is applied once"""
+    key = models.CharField(max_length=64, unique=True)
+    created_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='assignment_submissions'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.key
+
 class Assignment(models.Model):
     """Track Yellow-Sponsored assignments"""
     yellow_member = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='yellow_assignments')
     sponsored_member = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='sponsored_assignments')
     assigned_at = models.DateTimeField(auto_now_add=True)
     completed = models.BooleanField(default=False)
+    # Inactive once the members are back in their queues (or, for
+    # duplicates made before the keys below existed, from the start)
+    active = models.BooleanField(default=True)
+    # The member ids while the assignment is active and NULL once it isn't.
+    # Their unique indexes allow one active assignment per member on each
+    # side on every backend, MySQL included, which has no partial indexes.
+    active_yellow_key = models.BigIntegerField(null=True, blank=True, unique=True, editable=False)
+    active_pif_key = models.BigIntegerField(null=True, blank=True, unique=True, editable=False)
+    submission = models.ForeignKey(
+        AssignmentSubmission, on_delete=models.SET_NULL, null=True, blank=True, related_name='assignments'
+    )
+
+    # Field values that deactivate assignments in an update()
+    INACTIVE_VALUES = {'active': False, 'active_yellow_key': None, 'active_pif_key': None}
+
+    def save(self, *args, **kwargs):
+        self.active_yellow_key = self.yellow_member_id if self.active else None
+        self.active_pif_key = self.sponsored_member_id if self.active else None
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'active' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'active_yellow_key', 'active_pif_key'}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Yellow: {self.yellow_member} -> Sponsored: {self.sponsored_member}"
+
+class QueueClaim(models.Model):
+    """An admin's lease on one member of a dashboard work queue"""
+    STATUS_CHOICES = [
+        ('claimed', 'Claimed'),
+        ('done', 'Done'),
+        ('released', 'Released'),
+        ('expired', 'Expired'),
+    ]
+
+    queue = models.CharField(max_length=30)
+    profile = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='queue_claims')
+    claimed_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='queue_claims')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='claimed')
+    claimed_at = models.DateTimeField()
+    lease_expires_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['queue', 'status', 'lease_expires_at'], name='core_qclaim_live_idx'),
+            models.Index(fields=['claimed_by', 'status'], name='core_qclaim_admin_idx'),
+            models.Index(fields=['queue', 'status', 'finished_at'], name='core_qclaim_done_idx'),
+        ]
+        # One open claim per member of a queue (skipped on MySQL, where the
+        # row locks taken by dashboard.queues.claim_batch are the guard)
+        constraints = [
+            models.UniqueConstraint(
+                fields=['queue', 'profile'],
+                condition=models.Q(status='claimed'),
+                name='core_qclaim_open_unique'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.queue}: {self.profile_id} by {self.claimed_by_id} ({self.status})"
+
+class OutboundEmail(models.Model):
+    """Email waiting to be sent by the send_queued_email worker"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+        ('digested', 'Sent in Digest'),
+    ]
+
+    KIND_CHOICES = [
+        ('message', 'Message'),
+        ('admin_notification', 'Admin Notification'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    recipients = models.JSONField(default=list)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default='message')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'kind', 'next_attempt_at'], name='core_outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)} ({self.status})"
+
+def job_results_storage():
+    # Outside MEDIA_ROOT: exports hold member data and must not be public
+    return FileSystemStorage(location=settings.JOB_RESULTS_ROOT)
+
+class Job(models.Model):
+    """Long-running admin operation executed by the run_jobs worker"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=50)
+    params = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    progress = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    result_file = models.FileField(upload_to='jobs/%Y/%m/', storage=job_results_storage, blank=True)
+    result_content_type = models.CharField(max_length=100, blank=True)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Set by each claim_job; writes from a worker whose claim was requeued
+    # match no row
+    claim_token = models.UUIDField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='core_job_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+    @property
+    def finished(self):
+        return self.status in ('succeeded', 'failed')
+
+    @property
+    def percent(self):
+        if self.status == 'succeeded':
+            return 100
+        if not self.total:
+            return 0
+        return min(100, self.progress * 100 // self.total)
+
+def _closure_ends(referral):
+    """Return the (id, depth) upline of the referrer and downline of the referred"""
+    ancestors = [(referral.referrer_id, 0)] + list(
+        ReferralClosure.objects.filter(
+            descendant_id=referral.referrer_id
+        ).values_list('ancestor_id', 'depth')
+    )
+    descendants = [(referral.referred_id, 0)] + list(
+        ReferralClosure.objects.filter(
+            ancestor_id=referral.referred_id
+        ).values_list('descendant_id', 'depth')
+    )
+    return ancestors, descendants
+
+def _direct_counter_deltas(member_type, status, sign):
+    """Counter changes on a referrer for one referred member"""
+    deltas = {'referral_count': sign}
+    if member_type == 'paying':
+        deltas['paying_referral_count'] = sign
+    else:
+        deltas['sponsored_referral_count'] = sign
+    if status in ACTIVE_STATUSES:
+        deltas['active_referral_count'] = sign
+    return deltas
+
+def _level_counter_deltas(ancestors, descendants, sign):
+    """Per-ancestor downline level changes for the paths through one referral"""
+    deltas = defaultdict(dict)
+    for ancestor_id, ancestor_depth in ancestors:
+        for _, descendant_depth in descendants:
+            depth = ancestor_depth + 1 + descendant_depth
+            if 2 <= depth <= COUNTED_DOWNLINE_DEPTH:
+                field = f'downline_level_{depth}_count'
+                deltas[ancestor_id][field] = deltas[ancestor_id].get(field, 0) + sign
+    return deltas
+
+def _apply_counter_deltas(profile_ids, deltas):
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if deltas:
+        Profile.objects.filter(id__in=profile_ids).update(
+            **{field: F(field) + delta for field, delta in deltas.items()}
+        )
+
+def _update_referral_counters(referral, ancestors, descendants, sign):
+    referred = Profile.objects.filter(
+        id=referral.referred_id
+    ).values('member_type', 'status').first()
+    if referred:
+        _apply_counter_deltas(
+            [referral.referrer_id],
+            _direct_counter_deltas(referred['member_type'], referred['status'], sign)
+        )
+    for ancestor_id, deltas in _level_counter_deltas(ancestors, descendants, sign).items():
+        _apply_counter_deltas([ancestor_id], deltas)
+
+def _invalidate_matrices_on_commit(ancestors):
+    """Retire the matrix snapshots of the upline that can see a changed referral"""
+    from .snapshots import invalidate_matrix_snapshots
+
+    # Invalidating after commit keeps a concurrent reader from caching the
+    # old tree under the new generation
+    upline = [ancestor_id for ancestor_id, depth in ancestors if depth < COUNTED_DOWNLINE_DEPTH]
+    transaction.on_commit(lambda: invalidate_matrix_snapshots(upline))
+
+@receiver(post_save, sender=Referral)
+def add_referral_closure(sender, instance, created, raw=False, **kwargs):
+    """Link the referred subtree to every ancestor of the referrer"""
+    if not created or raw:
+        return
+
+    with transaction.atomic():
+        ancestors, descendants = _closure_ends(instance)
+        ReferralClosure.objects.bulk_create(
+            [
+                ReferralClosure(
+                    ancestor_id=ancestor_id,
+                    descendant_id=descendant_id,
+                    depth=ancestor_depth + 1 + descendant_depth
+                )
+                for ancestor_id, ancestor_depth in ancestors
+                for descendant_id, descendant_depth in descendants
+            ],
+            batch_size=1000,
+            ignore_conflicts=True
+        )
+        _update_referral_counters(instance, ancestors, descendants, 1)
+        _invalidate_matrices_on_commit(ancestors)
+
+@receiver(pre_delete, sender=Referral)
+def remove_referral_closure(sender, instance, **kwargs):
+    """Drop every path that ran through the deleted referral"""
+    # The referral graph is a tree (a profile is referred once), so each
+    # upline/downline pair is connected only through this edge.
+    with transaction.atomic():
+        ancestors, descendants = _closure_ends(instance)
+        ancestor_ids = [ancestor_id for ancestor_id, _ in ancestors]
+        descendant_ids = [descendant_id for descendant_id, _ in descendants]
+
+        for start in range(0, len(descendant_ids), 1000):
+            ReferralClosure.objects.filter(
+                ancestor_id__in=ancestor_ids,
+                descendant_id__in=descendant_ids[start:start + 1000]
+            ).delete()
+        _update_referral_counters(instance, ancestors, descendants, -1)
+        _invalidate_matrices_on_commit(ancestors)
+
+@receiver(post_save, sender=Profile)
+def update_referrer_counters(sender, instance, created, raw=False, **kwargs):
+    """Move the referrer's counters when a member's type or status changes"""
+    loaded = getattr(instance, '_loaded_values', None)
+    if created or raw or not loaded:
+        return
+
+    old_type = loaded.get('member_type', instance.member_type)
+    old_status = loaded.get('status', instance.status)
+    if old_type == instance.member_type and old_status == instance.status:
+        return
+
+    deltas = _direct_counter_deltas(old_type, old_status, -1)
+    for field, delta in _direct_counter_deltas(instance.member_type, instance.status, 1).items():
+        deltas[field] = deltas.get(field, 0) + delta
+
+    with transaction.atomic():
+        referrer_ids = list(
+            Referral.objects.filter(referred=instance).values_list('referrer_id', flat=True)
+        )
+        _apply_counter_deltas(referrer_ids, deltas)
+
+# Profile and User fields shown in the cached referral matrix
+MATRIX_PROFILE_FIELDS = ('phone', 'member_type', 'status')
+MATRIX_USER_FIELDS = ('first_name', 'last_name', 'email')
+
+def _invalidate_upline_on_commit(profile_id):
+    from .snapshots import invalidate_upline_snapshots
+
+    transaction.on_commit(lambda: invalidate_upline_snapshots([profile_id]))
+
+@receiver(post_save, sender=Profile)
+def refresh_upline_matrices(sender, instance, created, raw=False, **kwargs):
+    """Retire the upline's matrix snapshots when a member's listed details change"""
+    loaded = getattr(instance, '_loaded_values', None)
+    if created or raw or not loaded:
+        return
+    if any(loaded.get(field, getattr(instance, field)) != getattr(instance, field)
+           for field in MATRIX_PROFILE_FIELDS):
+        _invalidate_upline_on_commit(instance.pk)
+
+@receiver(post_save, sender=User)
+def refresh_upline_matrices_for_user(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Retire the upline's matrix snapshots when a member's name or email may have changed"""
+    if created or raw:
+        return
+    if update_fields is not None and not set(update_fields) & set(MATRIX_USER_FIELDS):
+        return
+    profile_id = Profile.objects.filter(user=instance).values_list('id', flat=True).first()
+    if profile_id:
+        _invalidate_upline_on_commit(profile_id)
@@ -0,0 +1,59 @@
+# core/pagination.py
+from django.core import signing
+from django.db.models import Q
+
+CURSOR_SALT = 'core.keyset_cursor'
+
+def _field_value(obj, path):
+    for attr in path.split('__'):
+        obj = getattr(obj, attr)
+    return obj
+
+def encode_cursor(key, values):
+    """Sign the sort values of the last row on a page"""
+    # Full-precision isoformat: truncated timestamps would repeat or skip rows
+    values = [value.isoformat() if hasattr(value, 'isoformat') else value for value in values]
+    return signing.dumps([key, values], salt=CURSOR_SALT)
+
+def decode_cursor(key, cursor):
+    """Sort values from a cursor, or None if it is invalid or for another sort"""
+    try:
+        cursor_key, values = signing.loads(cursor, salt=CURSOR_SALT)
+    except (signing.BadSignature, TypeError, ValueError):
+        return None
+    return values if cursor_key == key else None
+
+def _after(ordering, values):
+    """Q matching rows that sort strictly after the given values"""
+    condition = Q()
+    for index, field in enumerate(ordering):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        step = Q(**{f'{name}__{lookup}': values[index]})
+        for previous, value in zip(ordering[:index], values):
+            step &= Q(**{previous.lstrip('-'): value})
+        condition |= step
+    return condition
+
+def keyset_paginate(queryset, ordering, cursor=None, page_size=50, key=''):
+    """Return (rows, next_cursor) for one page of queryset
+
+    ``ordering`` must end in a unique, non-null column (normally the
+    primary key) so every row has a distinct position. Pages are read
+    with a WHERE on the previous page's last row instead of an OFFSET,
+    so deep pages cost the same as the first one.
+    """
+    ordering = list(ordering)
+    if cursor:
+        values = decode_cursor(key, cursor)
+        if values is not None and len(values) == len(ordering):
+            queryset = queryset.filter(_after(ordering, values))
+
+    rows = list(queryset.order_by(*ordering)[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(
+            key, [_field_value(rows[-1], field.lstrip('-')) for field in ordering]
+        )
+    return rows, next_cursor
@@ -0,0 +1,103 @@
+# core/snapshots.py
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+from users.models import Profile
+from .cache import bump_namespace, get_or_set, make_key, namespace_version
+from .models import Referral, ReferralClosure
+from .utils import MATRIX_DEPTH
+
+# Bump when the snapshot layout changes so old entries are never read back
+MATRIX_SNAPSHOT_VERSION = 1
+
+STATUS_LABELS = dict(Profile.STATUS_CHOICES)
+
+def matrix_namespace(profile_id):
+    """Cache namespace of everything derived from one profile's matrix"""
+    return f'core:matrix:{profile_id}'
+
+def matrix_generation(profile_id):
+    """Version of a profile's matrix caches; it moves on every invalidation"""
+    return namespace_version(matrix_namespace(profile_id))
+
+def _snapshot_key(profile_id):
+    return make_key(matrix_namespace(profile_id), 'snapshot', MATRIX_SNAPSHOT_VERSION)
+
+def build_matrix_snapshot(profile_id):
+    """Read a profile's 4-level downline into plain, cacheable data"""
+    levels = {f'level_{level}': [] for level in range(1, MATRIX_DEPTH + 1)}
+
+    # A subquery rather than a join, so a member with more than one
+    # referral row still appears (and counts) once
+    joined = Referral.objects.filter(
+        referred_id=OuterRef('descendant_id')
+    ).order_by('created_at', 'id').values('created_at')[:1]
+    rows = ReferralClosure.objects.filter(
+        ancestor_id=profile_id, depth__gte=1, depth__lte=MATRIX_DEPTH
+    ).annotate(joined=Subquery(joined)).order_by('depth', 'id').values(
+        'depth',
+        'descendant_id',
+        'descendant__user__first_name',
+        'descendant__user__last_name',
+        'descendant__user__email',
+        'descendant__phone',
+        'descendant__member_type',
+        'descendant__status',
+        'joined',
+    )
+    for row in rows:
+        member_type = row['descendant__member_type']
+        status = row['descendant__status']
+        levels[f"level_{row['depth']}"].append({
+            'id': row['descendant_id'],
+            'name': f"{row['descendant__user__first_name']} {row['descendant__user__last_name']}".strip(),
+            'email': row['descendant__user__email'],
+            'phone': row['descendant__phone'],
+            'member_type': member_type,
+            'member_type_display': 'PIF Member' if member_type == 'sponsored' else 'Paying Member',
+            'status': status,
+            'status_display': STATUS_LABELS.get(status, status),
+            'joined': row['joined'],
+        })
+
+    counts = {level: len(members) for level, members in levels.items()}
+    return {
+        'profile_id': profile_id,
+        'levels': levels,
+        'counts': counts,
+        'total': sum(counts.values()),
+        'built_at': timezone.now(),
+    }
+
+def get_matrix_snapshot(profile_id):
+    """Cached matrix snapshot of a profile, rebuilt after an invalidation"""
+    return get_or_set(
+        _snapshot_key(profile_id),
+        lambda: build_matrix_snapshot(profile_id),
+        settings.MATRIX_SNAPSHOT_TTL
+    )
+
+def warm_matrix_snapshot(profile_id):
+    """Build a profile's snapshot if it isn't cached, returning True if built"""
+    key = _snapshot_key(profile_id)
+    if cache.get(key) is not None:
+        return False
+    get_or_set(key, lambda: build_matrix_snapshot(profile_id), settings.MATRIX_SNAPSHOT_TTL)
+    return True
+
+def invalidate_matrix_snapshots(profile_ids):
+    """Retire the cached snapshots of the given profiles"""
+    bump_namespace(*map(matrix_namespace, profile_ids))
+
+def matrix_upline(profile_ids):
+    """Ids of every profile whose matrix shows one of profile_ids"""
+    return ReferralClosure.objects.filter(
+        descendant_id__in=list(profile_ids), depth__lte=MATRIX_DEPTH
+    ).values_list('ancestor_id', flat=True).distinct()
+
+def invalidate_upline_snapshots(profile_ids):
+    """Retire the snapshots that list any of profile_ids as a member"""
+    profile_ids = list(profile_ids)
+    for start in range(0, len(profile_ids), 1000):
+        invalidate_matrix_snapshots(matrix_upline(profile_ids[start:start + 1000]))
@@ -1,3 +1,333 @@
-from django.test import TestCase
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from users.models import Profile
+from .cache import LOCK_PREFIX, get_or_set
+from .checks import check_shared_cache
+from .instrumentation import record_timing, reset_timings, timing_percentiles
+from .mail import queue_admin_notification
+from .jobs import JOB_HANDLERS, claim_job, enqueue_job, requeue_stale_jobs, run_job
+from .downline import rebuild_closure, recursive_downline, recursive_downlines
+from .models import Job, OutboundEmail, Referral, ReferralClosure
+from .snapshots import build_matrix_snapshot
+from .utils import recompute_referral_counters
 
-# Create your tests here.
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+DATABASE = {'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'wepool_cache'}}
+REDIS = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://127.0.0.1:6379/1'}}
+
+class SharedCacheCheckTests(SimpleTestCase):
+    def check_ids(self):
+        return [warning.id for warning in check_shared_cache(None)]
+
+    @override_settings(CACHES=LOCMEM)
+    def test_per_process_cache_warns(self):
+        self.assertEqual(self.check_ids(), ['core.W001'])
+
+    @override_settings(CACHES=DATABASE, DASHBOARD_STATS_LIVE_COUNTERS=False)
+    def test_shared_cache_passes(self):
+        self.assertEqual(self.check_ids(), [])
+
+    @override_settings(CACHES=DATABASE, DASHBOARD_STATS_LIVE_COUNTERS=True)
+    def test_live_counters_need_atomic_incr(self):
+        self.assertEqual(self.check_ids(), ['core.W002'])
+
+    @override_settings(CACHES=REDIS, DASHBOARD_STATS_LIVE_COUNTERS=True)
+    def test_live_counters_on_redis_pass(self):
+        self.assertEqual(self.check_ids(), [])
+
+@override_settings(CACHES=LOCMEM, CACHE_LOCK_TIMEOUT=10)
+class GetOrSetTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_waiters_compute_once_the_lock_is_dropped_without_a_value(self):
+        cache.add(f'{LOCK_PREFIX}:key', 1)
+
+        def holder_gives_up(seconds):
+            # The lock holder's compute() returned None
+            cache.delete(f'{LOCK_PREFIX}:key')
+
+        started = time.monotonic()
+        with mock.patch('core.cache.time.sleep', side_effect=holder_gives_up) as sleep:
+            self.assertEqual(get_or_set('key', lambda: 'value', 60), 'value')
+        self.assertEqual(sleep.call_count, 1)
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(cache.get('key')[0], 'value')
+        self.assertIsNone(cache.get(f'{LOCK_PREFIX}:key'))
+
+    @override_settings(CACHE_LOCK_TIMEOUT=0.2)
+    def test_timed_out_waiter_leaves_the_holders_lock(self):
+        cache.add(f'{LOCK_PREFIX}:key', 'holder', 60)
+        self.assertEqual(get_or_set('key', lambda: 'value', 60), 'value')
+        self.assertEqual(cache.get(f'{LOCK_PREFIX}:key'), 'holder')
+
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        reset_timings()
+
+    def test_anonymous_requests_do_not_load_the_user(self):
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('check_referrer'), {'phone': 'not-a-phone'})
+        self.assertNotIn('Server-Timing', response)
+        self.assertNotIn('Cookie', response.get('Vary', ''))
+
+    def test_staff_responses_get_server_timing(self):
+        staff = User.objects.create(username='staff', is_staff=True)
+        self.client.force_login(staff)
+        self.client.get(reverse('request_timings'))
+        response = self.client.get(reverse('request_timings'))
+        self.assertIn('sql;dur=', response['Server-Timing'])
+        self.assertIn('template;dur=', response['Server-Timing'])
+        self.assertEqual(response.json()['views']['request_timings']['requests'], 1)
+
+    @override_settings(DEBUG=False)
+    def test_template_time_is_recorded_without_debug(self):
+        self.assertEqual(self.client.get(reverse('login')).status_code, 200)
+        template_ms = timing_percentiles()['login']['template_ms']
+        self.assertGreater(template_ms['p50'], 0)
+
+    @override_settings(REQUEST_TIMINGS_WINDOW=1000)
+    def test_concurrent_samples_are_all_kept(self):
+        sample = {'total_ms': 1.0, 'view_ms': 1.0, 'template_ms': 0.0, 'sql_ms': 0.5, 'queries': 1}
+
+        def record():
+            for _ in range(100):
+                record_timing('view', sample)
+
+        threads = [threading.Thread(target=record) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(timing_percentiles()['view']['requests'], 800)
+
+def make_member(phone):
+    user = User.objects.create(username=f'member_{phone}', first_name='Member', last_name=phone)
+    user.profile.phone = phone
+    user.profile.member_type = 'paying'
+    user.profile.save()
+    return user.profile
+
+class MatrixSnapshotTests(TestCase):
+    def test_member_with_two_referral_rows_counts_once(self):
+        root, member, other = make_member('100'), make_member('101'), make_member('102')
+        first = Referral.objects.create(referrer=root, referred=member)
+        Referral.objects.create(referrer=other, referred=member)
+
+        with self.assertNumQueries(1):
+            snapshot = build_matrix_snapshot(root.id)
+        self.assertEqual(snapshot['counts']['level_1'], 1)
+        self.assertEqual(snapshot['total'], 1)
+        self.assertEqual(snapshot['levels']['level_1'][0]['joined'], first.created_at)
+
+class ReferralCounterTests(TestCase):
+    def setUp(self):
+        # 100 -> 101 -> 102 -> 103
+        self.members = [make_member(str(phone)) for phone in range(100, 104)]
+        self.referrals = [
+            Referral.objects.create(referrer=referrer, referred=referred)
+            for referrer, referred in zip(self.members, self.members[1:])
+        ]
+
+    def counters(self, member):
+        return Profile.objects.values(*Profile.REFERRAL_COUNTER_FIELDS).get(id=member.id)
+
+    def test_referrals_count_direct_and_downline_levels(self):
+        self.assertEqual(self.counters(self.members[0]), {
+            'referral_count': 1,
+            'paying_referral_count': 1,
+            'sponsored_referral_count': 0,
+            'active_referral_count': 0,
+            'downline_level_2_count': 1,
+            'downline_level_3_count': 1,
+            'downline_level_4_count': 0,
+        })
+        self.assertEqual(self.counters(self.members[2])['referral_count'], 1)
+        self.assertEqual(self.counters(self.members[3])['referral_count'], 0)
+
+    def test_deleting_a_referral_takes_its_subtree_off_the_upline(self):
+        self.referrals[1].delete()
+        root = self.counters(self.members[0])
+        self.assertEqual((root['referral_count'], root['downline_level_2_count'], root['downline_level_3_count']), (1, 0, 0))
+        self.assertEqual(self.counters(self.members[1])['referral_count'], 0)
+
+    def test_type_and_status_changes_move_the_referrers_counters(self):
+        member = Profile.objects.get(id=self.members[1].id)
+        member.member_type = 'sponsored'
+        member.status = 'yellow'
+        member.save()
+
+        root = self.counters(self.members[0])
+        self.assertEqual(
+            (root['referral_count'], root['paying_referral_count'], root['sponsored_referral_count'], root['active_referral_count']),
+            (1, 0, 1, 1)
+        )
+
+    def test_recompute_repairs_drifted_counters(self):
+        expected = [self.counters(member) for member in self.members]
+        Profile.objects.filter(id=self.members[0].id).update(referral_count=9, downline_level_3_count=0)
+        Profile.objects.filter(id=self.members[3].id).update(paying_referral_count=2)
+
+        self.assertEqual(recompute_referral_counters(), 2)
+        self.assertEqual([self.counters(member) for member in self.members], expected)
+        self.assertEqual(recompute_referral_counters([self.members[0].id]), 0)
+
+class RecursiveDownlineTests(TestCase):
+    def setUp(self):
+        # 100 -> 101 -> 102 -> 103, and 100 -> 104
+        self.members = [make_member(str(phone)) for phone in range(100, 105)]
+        for referrer, referred in ((0, 1), (1, 2), (2, 3), (0, 4)):
+            Referral.objects.create(referrer=self.members[referrer], referred=self.members[referred])
+
+    def closure_rows(self, ancestor, min_depth, max_depth):
+        return list(
+            ReferralClosure.objects.filter(
+                ancestor=ancestor, depth__gte=min_depth, depth__lte=max_depth
+            ).order_by('depth', 'descendant_id').values_list(
+                'descendant_id', 'depth', 'descendant__member_type', 'descendant__status'
+            )
+        )
+
+    def test_matches_the_closure_table(self):
+        root = self.members[0]
+        for min_depth, max_depth in ((1, 1), (1, 4), (2, 3), (3, 10)):
+            with self.assertNumQueries(1):
+                rows = recursive_downline(root.id, min_depth, max_depth)
+            self.assertEqual(rows, self.closure_rows(root, min_depth, max_depth))
+
+    def test_several_roots(self):
+        rows = recursive_downlines([self.members[1].id, self.members[2].id])
+        self.assertEqual(
+            [(root_id, profile_id, depth) for root_id, profile_id, depth, _, _ in rows],
+            [
+                (self.members[1].id, self.members[2].id, 1),
+                (self.members[1].id, self.members[3].id, 2),
+                (self.members[2].id, self.members[3].id, 1),
+            ]
+        )
+
+    def test_rebuild_reproduces_the_signal_maintained_closure(self):
+        expected = set(ReferralClosure.objects.values_list('ancestor_id', 'descendant_id', 'depth'))
+        ReferralClosure.objects.all().delete()
+        self.assertEqual(rebuild_closure(), len(expected))
+        self.assertEqual(set(ReferralClosure.objects.values_list('ancestor_id', 'descendant_id', 'depth')), expected)
+
+def echo(job, **params):
+    return params
+
+def broken(job):
+    raise RuntimeError('Handler failed')
+
+@mock.patch.dict(JOB_HANDLERS, {'echo': echo, 'broken': broken})
+class JobQueueTests(TestCase):
+    def test_claim_takes_the_oldest_queued_job(self):
+        first, second = enqueue_job('echo'), enqueue_job('echo')
+
+        claimed = claim_job()
+        self.assertEqual(claimed.id, first.id)
+        self.assertEqual(claimed.status, 'running')
+        self.assertIsNotNone(claimed.claim_token)
+        self.assertEqual(claimed.started_at, claimed.heartbeat_at)
+        self.assertEqual(claim_job().id, second.id)
+        self.assertIsNone(claim_job())
+
+    def test_run_job_records_the_result(self):
+        job = enqueue_job('echo', {'rows': 3})
+        run_job(claim_job())
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result, job.error), ('succeeded', {'rows': 3}, ''))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_run_job_records_a_failure(self):
+        job = enqueue_job('broken')
+        with self.assertLogs('core.jobs', 'ERROR'):
+            run_job(claim_job())
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), ('failed', 'Handler failed'))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_unknown_kinds_are_rejected(self):
+        with self.assertRaises(ValueError):
+            enqueue_job('missing')
+
+    def test_requeue_takes_back_only_silent_jobs(self):
+        silent, alive = enqueue_job('echo'), enqueue_job('echo')
+        claim_job(), claim_job()
+        Job.objects.filter(id=silent.id).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(requeue_stale_jobs(timedelta(minutes=30)), 1)
+        silent.refresh_from_db()
+        alive.refresh_from_db()
+        self.assertEqual((silent.status, silent.claim_token, silent.started_at), ('queued', None, None))
+        self.assertEqual(alive.status, 'running')
+
+def requeue_and_reclaim(job):
+    """Handler standing in for a slow job another worker requeued and took over"""
+    requeue_stale_jobs(timedelta(seconds=-1))
+    claim_job()
+    return {'rows': 1}
+
+@mock.patch.dict(JOB_HANDLERS, {'requeued': requeue_and_reclaim})
+class JobOwnershipTests(TestCase):
+    def test_requeued_job_keeps_the_new_claims_status(self):
+        job = enqueue_job('requeued')
+        first_claim = claim_job()
+        run_job(first_claim)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'running')
+        self.assertNotEqual(job.claim_token, first_claim.claim_token)
+        self.assertIsNone(job.result)
+
+def wait_for_heartbeat(job):
+    time.sleep(0.3)
+    return {}
+
+@override_settings(JOB_HEARTBEAT_SECONDS=0.05)
+@mock.patch.dict(JOB_HANDLERS, {'slow': wait_for_heartbeat})
+class JobHeartbeatTests(TransactionTestCase):
+    def test_heartbeat_moves_while_the_handler_runs(self):
+        enqueue_job('slow')
+        job = claim_job()
+        claimed_at = job.heartbeat_at
+        run_job(job)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'succeeded')
+        self.assertGreater(job.heartbeat_at, claimed_at)
+
+class StopLoop(Exception):
+    pass
+
+@override_settings(EMAIL_ADMIN_DIGEST=True)
+class AdminDigestLoopTests(TestCase):
+    def test_notifications_queued_while_looping_are_digested(self):
+        queue_admin_notification('First', 'body', ['admin@example.com'])
+        polls = []
+
+        def poll(seconds):
+            polls.append(seconds)
+            if len(polls) == 1:
+                queue_admin_notification('Second', 'body', ['admin@example.com'])
+            else:
+                raise StopLoop
+
+        with mock.patch('core.management.commands.send_queued_email.time.sleep', side_effect=poll):
+            with self.assertRaises(StopLoop):
+                call_command('send_queued_email', '--loop', '--digest', '--digest-interval', '0', stdout=StringIO())
+
+        self.assertEqual([message.body.split('\n')[0] for message in mail.outbox], ['First', 'Second'])
+        self.assertFalse(OutboundEmail.objects.filter(status='pending').exists())
@@ -1,61 +1,253 @@
 # core/utils.py
-from .models import Referral
-
-def build_referral_matrix(profile):
-    """Build a 4-level referral matrix for a profile"""
-    matrix = {
-        'level_1': [],
-        'level_2': [],
-        'level_3': [],
-        'level_4': []
+from collections import defaultdict
+from django.core import signing
+from django.db import transaction
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
+from users.models import Profile
+from .models import ACTIVE_STATUSES, COUNTED_DOWNLINE_DEPTH, Referral, ReferralClosure
+
+MATRIX_DEPTH = COUNTED_DOWNLINE_DEPTH
+
+# Referral tree API bounds
+TREE_DEPTH = 3
+TREE_FANOUT = 10
+MAX_TREE_DEPTH = 10
+MAX_TREE_FANOUT = 100
+MAX_TREE_NODES = 1000
+TREE_CURSOR_SALT = 'core.referral_tree'
+
+def get_downline(profile, min_depth=1, max_depth=None):
+    """Closure rows below a profile for a depth range, using one indexed query"""
+    links = ReferralClosure.objects.filter(ancestor=profile, depth__gte=min_depth)
+    if max_depth is not None:
+        links = links.filter(depth__lte=max_depth)
+    return links
+
+def referral_level_counts(profile, breakdown=False):
+    """Members per matrix level from one grouped query, without loading profiles
+
+    With ``breakdown`` each level also gets its counts by member_type and
+    status, computed by conditional aggregation in the same query.
+    """
+    aggregates = {'total': Count('id')}
+    if breakdown:
+        for member_type, _ in Profile.MEMBER_TYPE_CHOICES:
+            aggregates[f'type_{member_type}'] = Count(
+                'id', filter=Q(descendant__member_type=member_type)
+            )
+        for status, _ in Profile.STATUS_CHOICES:
+            aggregates[f'status_{status}'] = Count('id', filter=Q(descendant__status=status))
+
+    rows = {
+        row['depth']: row
+        for row in get_downline(profile, max_depth=MATRIX_DEPTH).values('depth').annotate(
+            **aggregates
+        ).order_by()
     }
 
-    # Level 1 - Direct referrals
-    level_1_referrals = Referral.objects.filter(referrer=profile).select_related('referred__user')
-    matrix['level_1'] = [ref.referred for ref in level_1_referrals]
-
-    if matrix['level_1']:
-        # Level 2
-        level_2_referrals = Referral.objects.filter(
-            referrer__in=matrix['level_1']
-        ).select_related('referred__user')
-        matrix['level_2'] = [ref.referred for ref in level_2_referrals]
-
-        if matrix['level_2']:
-            # Level 3
-            level_3_referrals = Referral.objects.filter(
-                referrer__in=matrix['level_2']
-            ).select_related('referred__user')
-            matrix['level_3'] = [ref.referred for ref in level_3_referrals]
-
-            if matrix['level_3']:
-                # Level 4
-                level_4_referrals = Referral.objects.filter(
-                    referrer__in=matrix['level_3']
-                ).select_related('referred__user')
-                matrix['level_4'] = [ref.referred for ref in level_4_referrals]
-
-    return matrix
+    counts = {}
+    levels = {}
+    for level in range(1, MATRIX_DEPTH + 1):
+        row = rows.get(level, {})
+        counts[f'level_{level}'] = row.get('total', 0)
+        if breakdown:
+            levels[f'level_{level}'] = {
+                'member_type': {
+                    member_type: row.get(f'type_{member_type}', 0)
+                    for member_type, _ in Profile.MEMBER_TYPE_CHOICES
+                },
+                'status': {
+                    status: row.get(f'status_{status}', 0)
+                    for status, _ in Profile.STATUS_CHOICES
+                },
+            }
+    counts['total'] = sum(counts.values())
+    if breakdown:
+        counts['breakdown'] = levels
+    return counts
 
 def get_referral_stats(profile):
     """Get referral statistics for a profile"""
-    stats = {
-        'total_referrals': 0,
-        'paying_referrals': 0,
-        'sponsored_referrals': 0,
-        'active_referrals': 0
+    return profile.referral_stats
+
+def recompute_referral_counters(profile_ids=None, batch_size=1000):
+    """Recompute denormalized referral counters, returning how many drifted"""
+    direct = Referral.objects.values('referrer_id').annotate(
+        referral_count=Count('id'),
+        paying_referral_count=Count('id', filter=Q(referred__member_type='paying')),
+        sponsored_referral_count=Count('id', filter=~Q(referred__member_type='paying')),
+        active_referral_count=Count('id', filter=Q(referred__status__in=ACTIVE_STATUSES))
+    ).order_by()
+    levels = ReferralClosure.objects.filter(
+        depth__gte=2, depth__lte=COUNTED_DOWNLINE_DEPTH
+    ).values('ancestor_id', 'depth').annotate(total=Count('id')).order_by()
+    profiles = Profile.objects.only('id', *Profile.REFERRAL_COUNTER_FIELDS).order_by('id')
+
+    if profile_ids is not None:
+        profile_ids = list(profile_ids)
+        direct = direct.filter(referrer_id__in=profile_ids)
+        levels = levels.filter(ancestor_id__in=profile_ids)
+        profiles = profiles.filter(id__in=profile_ids)
+
+    expected = defaultdict(dict)
+    for row in direct:
+        expected[row.pop('referrer_id')].update(row)
+    for row in levels:
+        expected[row['ancestor_id']][f"downline_level_{row['depth']}_count"] = row['total']
+
+    drifted = []
+    for profile in profiles.iterator(chunk_size=batch_size):
+        counters = expected.get(profile.id, {})
+        changed = False
+        for field in Profile.REFERRAL_COUNTER_FIELDS:
+            value = counters.get(field, 0)
+            if getattr(profile, field) != value:
+                setattr(profile, field, value)
+                changed = True
+        if changed:
+            drifted.append(profile)
+
+    Profile.objects.bulk_update(drifted, Profile.REFERRAL_COUNTER_FIELDS, batch_size=batch_size)
+    return len(drifted)
+
+def bulk_add_referrals(referrer_of, batch_size=1000):
+    """Link new members to their referrers without the per-referral signals
+
+    ``referrer_of`` maps the id of a member with no referral or downline
+    yet (e.g. one just bulk-created) to its referrer's id; referrers may be
+    new members of the same batch. The Referral and closure rows are
+    created in bulk and the counters of the affected upline recomputed
+    once. Members caught in a referral cycle are left unlinked. Returns
+    the ids of the members that were linked.
+    """
+    children = defaultdict(list)
+    for member_id, referrer_id in referrer_of.items():
+        children[referrer_id].append(member_id)
+
+    # Upline of the referrers that are already in the tree
+    upline = defaultdict(list)
+    existing = set(referrer_of.values()) - set(referrer_of)
+    for ancestor_id, descendant_id, depth in ReferralClosure.objects.filter(
+        descendant_id__in=existing
+    ).values_list('ancestor_id', 'descendant_id', 'depth'):
+        upline[descendant_id].append((ancestor_id, depth))
+
+    # Walk down from known referrers so a member's upline is always
+    # complete before its own referrals are linked
+    ancestors = {}
+    ready = [member_id for referrer_id in existing for member_id in children[referrer_id]]
+    while ready:
+        member_id = ready.pop()
+        referrer_id = referrer_of[member_id]
+        above = ancestors[referrer_id] if referrer_id in referrer_of else upline[referrer_id]
+        ancestors[member_id] = [(referrer_id, 1)] + [(ancestor_id, depth + 1) for ancestor_id, depth in above]
+        ready.extend(children[member_id])
+
+    Referral.objects.bulk_create(
+        [Referral(referrer_id=referrer_of[member_id], referred_id=member_id) for member_id in ancestors],
+        batch_size=batch_size
+    )
+    ReferralClosure.objects.bulk_create(
+        [
+            ReferralClosure(ancestor_id=ancestor_id, descendant_id=member_id, depth=depth)
+            for member_id, above in ancestors.items()
+            for ancestor_id, depth in above
+        ],
+        batch_size=batch_size
+    )
+
+    counted = {
+        ancestor_id
+        for above in ancestors.values()
+        for ancestor_id, depth in above
+        if depth <= COUNTED_DOWNLINE_DEPTH
+    }
+    recompute_referral_counters(counted, batch_size=batch_size)
+
+    from .snapshots import invalidate_matrix_snapshots
+    transaction.on_commit(lambda: invalidate_matrix_snapshots(counted))
+    return list(ancestors)
+
+def encode_tree_cursor(viewer, node_id, offset):
+    """Sign a cursor that lets a viewer expand one node of their tree"""
+    return signing.dumps([viewer.id, node_id, offset], salt=TREE_CURSOR_SALT)
+
+def decode_tree_cursor(viewer, cursor):
+    """Return (node_id, offset) for a cursor issued to this viewer"""
+    try:
+        viewer_id, node_id, offset = signing.loads(cursor, salt=TREE_CURSOR_SALT)
+    except (signing.BadSignature, TypeError, ValueError):
+        raise ValueError('Invalid cursor')
+
+    if viewer_id != viewer.id:
+        raise ValueError('Invalid cursor')
+    if node_id != viewer.id and not get_downline(viewer).filter(descendant_id=node_id).exists():
+        raise ValueError('Node is not in your referral tree')
+
+    return node_id, offset
+
+def _tree_node(member):
+    return {
+        'id': member.id,
+        'name': member.user.get_full_name(),
+        'phone': member.phone,
+        'status': member.status,
+        'member_type': member.member_type,
+        'child_count': 0,
+        'cursor': None,
+        'children': []
     }
 
-    referrals = Referral.objects.filter(referrer=profile).select_related('referred')
-    stats['total_referrals'] = referrals.count()
+def build_referral_tree(profile, depth=TREE_DEPTH, fanout=TREE_FANOUT, offset=0, viewer=None):
+    """Build a referral tree breadth-first with one query per level
+
+    Each node shows at most ``fanout`` children and the tree stops after
+    ``depth`` levels or before it could exceed ``MAX_TREE_NODES``. Nodes with unloaded
+    children carry a cursor that expands them on a later request.
+    """
+    viewer = viewer or profile
+    root = _tree_node(profile)
+    level = {profile.id: root}
+    loaded = 1
+
+    for _ in range(depth):
+        if not level or loaded + len(level) * fanout > MAX_TREE_NODES:
+            break
+
+        edges = Referral.objects.filter(referrer_id__in=list(level)).annotate(
+            position=Window(RowNumber(), partition_by=[F('referrer_id')], order_by=F('id').asc()),
+            siblings=Window(Count('id'), partition_by=[F('referrer_id')])
+        ).filter(
+            position__gt=offset,
+            position__lte=offset + fanout
+        ).select_related('referred__user').order_by('referrer_id', 'position')
+
+        next_level = {}
+        for edge in edges:
+            parent = level[edge.referrer_id]
+            parent['child_count'] = edge.siblings
+            if edge.position < edge.siblings:
+                parent['cursor'] = encode_tree_cursor(viewer, edge.referrer_id, edge.position)
+            else:
+                parent['cursor'] = None
+
+            child = _tree_node(edge.referred)
+            parent['children'].append(child)
+            next_level[edge.referred_id] = child
 
-    for referral in referrals:
-        if referral.referred.member_type == 'paying':
-            stats['paying_referrals'] += 1
-        else:
-            stats['sponsored_referrals'] += 1
+        level = next_level
+        loaded += len(next_level)
+        offset = 0
 
-        if referral.referred.status in ['yellow', 'green']:
-            stats['active_referrals'] += 1
+    # Leaves of the loaded tree only need to know whether they can expand
+    if level:
+        child_counts = Referral.objects.filter(
+            referrer_id__in=list(level)
+        ).values('referrer_id').annotate(total=Count('id')).order_by()
+        for row in child_counts:
+            node = level[row['referrer_id']]
+            node['child_count'] = row['total']
+            node['cursor'] = encode_tree_cursor(viewer, row['referrer_id'], 0)
 
-    return stats
+    return root
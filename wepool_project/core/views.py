@@ -5,41 +5,55 @@ from django.shortcuts import render
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
-from django.views.decorators.http import require_http_methods
+from django.conf import settings
+from django.views.decorators.http import condition, require_http_methods
 from users.models import Profile
 from .models import Referral
-from .utils import build_referral_matrix, get_referral_stats
+from .cache import cache_view
+from .snapshots import get_matrix_snapshot, matrix_generation, matrix_namespace
+from .utils import get_referral_stats, referral_level_counts
 
 @login_required
 def referral_matrix_view(request):
     """Display detailed referral matrix for current user"""
     profile = request.user.profile
-    matrix = build_referral_matrix(profile)
+    snapshot = get_matrix_snapshot(profile.id)
     stats = get_referral_stats(profile)
 
     return render(request, 'core/referral_matrix.html', {
-        'matrix': matrix,
+        'matrix': snapshot['levels'],
         'stats': stats,
         'profile': profile
     })
 
+def _wants_breakdown(request):
+    return request.GET.get('breakdown') in ('1', 'true')
+
+def referral_data_etag(request):
+    """Changes whenever the user's matrix snapshot generation is bumped"""
+    profile_id = request.user.profile.id
+    return f'{profile_id}-{matrix_generation(profile_id)}-{int(_wants_breakdown(request))}'
+
 @login_required
 @require_http_methods(["GET"])
+@condition(etag_func=referral_data_etag)
+@cache_view(
+    lambda request: matrix_namespace(request.user.profile.id),
+    settings.REFERRAL_DATA_CACHE_TTL,
+    query_params=['breakdown']
+)
 def get_referral_data(request):
-    """API endpoint to get referral data for charts/visualizations"""
-    profile = request.user.profile
-    matrix = build_referral_matrix(profile)
-
-    # Format data for response
-    data = {
-        'level_1': len(matrix['level_1']),
-        'level_2': len(matrix['level_2']),
-        'level_3': len(matrix['level_3']),
-        'level_4': len(matrix['level_4']),
-        'total': sum(len(matrix[level]) for level in matrix)
-    }
-
-    return JsonResponse(data)
+    """API endpoint to get referral data for charts/visualizations
+
+    Returns per-level counts (``?breakdown=1`` adds counts by member type
+    and status). Pollers should send If-None-Match to get a 304 until the
+    downline changes.
+    """
+    data = referral_level_counts(request.user.profile, breakdown=_wants_breakdown(request))
+
+    response = JsonResponse(data)
+    response['Cache-Control'] = 'private, no-cache'
+    return response
 
 @login_required
 def direct_referrals_view(request):
@@ -0,0 +1,106 @@
+# dashboard/bulk.py
+import time
+from contextlib import contextmanager
+from functools import partial
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F
+from core.models import Referral
+from core.snapshots import invalidate_upline_snapshots
+from core.utils import recompute_referral_counters
+from users.models import Profile
+from users.qualifications import QUALIFICATION_RULES, apply_rule
+from .utils import invalidate_dashboard_stats
+
+BULK_CHUNK_SIZE = 1000
+
+# Registered bulk actions by name; see register_bulk_action
+BULK_ACTIONS = {}
+
+def register_bulk_action(name):
+    """Register a function that applies an action to one chunk of profile ids"""
+    def decorator(action):
+        BULK_ACTIONS[name] = action
+        return action
+    return decorator
+
+@contextmanager
+def timed(timings, step):
+    """Add the wall-clock milliseconds of the block to timings[step]"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = (time.perf_counter() - start) * 1000
+        timings[step] = round(timings.get(step, 0) + elapsed, 2)
+
+@register_bulk_action('toggle_active')
+def toggle_active(profile_ids, timings, **kwargs):
+    with timed(timings, 'update'):
+        updated = User.objects.filter(
+            id__in=Profile.objects.filter(id__in=profile_ids).values('user_id')
+        ).update(is_active=~F('is_active'))
+    return {'updated_count': updated}
+
+@register_bulk_action('toggle_communications')
+def toggle_communications(profile_ids, timings, **kwargs):
+    with timed(timings, 'update'):
+        updated = Profile.objects.filter(
+            id__in=profile_ids
+        ).update(communications_opt_in=~F('communications_opt_in'))
+    return {'updated_count': updated}
+
+@register_bulk_action('update_status')
+def update_status(profile_ids, timings, new_status=None, **kwargs):
+    from .matching import release_requeued_assignments
+    with timed(timings, 'update'):
+        updated = Profile.objects.filter(id__in=profile_ids).update(status=new_status)
+        # Members this puts back in the yellow or PIF queue can be assigned again
+        release_requeued_assignments(profile_ids)
+
+    # update() skips the counter signals, so refresh the referrers
+    with timed(timings, 'counters'):
+        recompute_referral_counters(
+            Referral.objects.filter(
+                referred_id__in=profile_ids
+            ).values_list('referrer_id', flat=True)
+        )
+    transaction.on_commit(partial(invalidate_upline_snapshots, profile_ids))
+
+    # Re-run the qualification rules on just this selection (overridden
+    # profiles are excluded by the rules themselves)
+    counts = {'updated_count': updated}
+    with timed(timings, 'requalify'):
+        for name, candidates, rule_status in QUALIFICATION_RULES:
+            counts[name] = apply_rule(
+                candidates().filter(id__in=profile_ids),
+                rule_status,
+                batch_size=len(profile_ids)
+            )
+    return counts
+
+def run_bulk_action(action, profile_ids, chunk_size=BULK_CHUNK_SIZE, progress=None, **options):
+    """Apply a registered action to profile_ids chunk by chunk
+
+    Each chunk commits on its own so a large selection never holds locks
+    for the whole run. ``progress(done, total)`` is called after each
+    chunk. Returns summed counts plus per-step timings in ms.
+    """
+    timings = {}
+    totals = {}
+    start = time.perf_counter()
+
+    for offset in range(0, len(profile_ids), chunk_size):
+        chunk = profile_ids[offset:offset + chunk_size]
+        with transaction.atomic():
+            counts = BULK_ACTIONS[action](chunk, timings, **options)
+        for name, value in counts.items():
+            totals[name] = totals.get(name, 0) + value
+        if progress:
+            progress(offset + len(chunk), len(profile_ids))
+
+    invalidate_dashboard_stats()
+    totals['chunks'] = -(-len(profile_ids) // chunk_size)
+    totals['timings'] = timings
+    totals['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 2)
+    return totals
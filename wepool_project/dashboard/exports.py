@@ -0,0 +1,196 @@
+# dashboard/exports.py
+import csv
+import json
+import zlib
+from django.http import StreamingHttpResponse
+
+EXPORT_CHUNK_SIZE = 2000
+SQL_TABLE_NAME = 'profiles'
+
+# (header, Profile lookup, column name) for every exported column, in order
+EXPORT_COLUMNS = [
+    ('Username', 'user__username', 'username'),
+    ('Email', 'user__email', 'email'),
+    ('First Name', 'user__first_name', 'first_name'),
+    ('Last Name', 'user__last_name', 'last_name'),
+    ('Phone', 'phone', 'phone'),
+    ('Member Type', 'member_type', 'member_type'),
+    ('Status', 'status', 'status'),
+    ('Referrer Phone', 'referrer_phone', 'referrer_phone'),
+    ('Verified Email', 'verified_email', 'verified_email'),
+    ('Registered TAC Connector', 'registered_tacconnector', 'registered_tacconnector'),
+    ('TAC Connector Link', 'tacconnector_link', 'tacconnector_link'),
+    ('Is Active', 'user__is_active', 'is_active'),
+    ('Is Staff', 'user__is_staff', 'is_staff'),
+    ('Qualification Overridden', 'qualification_overridden', 'qualification_overridden'),
+    ('Override Reason', 'override_reason', 'override_reason'),
+    ('Overridden By', 'overridden_by__username', 'overridden_by'),
+    ('Admin Promotion Overridden', 'admin_promotion_overridden', 'admin_promotion_overridden'),
+    ('Admin Override Reason', 'admin_override_reason', 'admin_override_reason'),
+    ('Admin Override By', 'admin_overridden_by__username', 'admin_override_by'),
+    ('Created At', 'created_at', 'created_at'),
+    ('Updated At', 'updated_at', 'updated_at'),
+]
+
+# Registered export formats by name; see register_export_format
+EXPORT_FORMATS = {}
+
+def register_export_format(name, label, content_type, extension):
+    """Register a writer that turns row chunks into text chunks"""
+    def decorator(writer):
+        EXPORT_FORMATS[name] = {
+            'label': label,
+            'content_type': content_type,
+            'extension': extension,
+            'writer': writer
+        }
+        return writer
+    return decorator
+
+def export_format_choices():
+    return [(name, export_format['label']) for name, export_format in EXPORT_FORMATS.items()]
+
+def export_chunks(profiles, chunk_size=EXPORT_CHUNK_SIZE, progress=None):
+    """Yield lists of export rows, reading the queryset in primary-key chunks
+
+    Each chunk is a separate ``values_list`` query keyed on the last id
+    seen, so no model instances are built and memory stays bounded even
+    on backends whose cursors buffer the whole result client-side.
+    ``progress(rows)`` is called with the running row count.
+    """
+    lookups = ['id'] + [lookup for _, lookup, _ in EXPORT_COLUMNS]
+    rows = profiles.order_by('id').values_list(*lookups)
+    last_id = 0
+    exported = 0
+    while True:
+        chunk = list(rows.filter(id__gt=last_id)[:chunk_size])
+        if chunk:
+            yield [row[1:] for row in chunk]
+            exported += len(chunk)
+            if progress:
+                progress(exported)
+        if len(chunk) < chunk_size:
+            return
+        last_id = chunk[-1][0]
+
+class Echo:
+    """File-like object whose write() hands the value straight back"""
+
+    def write(self, value):
+        return value
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'strftime'):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return value
+
+@register_export_format('csv', 'CSV', 'text/csv', 'csv')
+def write_csv(chunks):
+    writer = csv.writer(Echo())
+    yield writer.writerow([header for header, _, _ in EXPORT_COLUMNS])
+    for chunk in chunks:
+        yield ''.join(writer.writerow([_csv_value(value) for value in row]) for row in chunk)
+
+# The SQL export is loaded into MySQL, where a backslash in a string
+# literal escapes the next character; escape the same characters as
+# mysql_real_escape_string so no value can end its literal early
+SQL_STRING_ESCAPES = str.maketrans({
+    '\\': '\\\\',
+    "'": "\\'",
+    '"': '\\"',
+    '\0': '\\0',
+    '\n': '\\n',
+    '\r': '\\r',
+    '\x1a': '\\Z',
+})
+
+def _sql_literal(value):
+    """Render a value as a MySQL literal"""
+    if value is None:
+        return 'NULL'
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, int):
+        return str(value)
+    if hasattr(value, 'isoformat'):
+        value = value.isoformat()
+    return "'" + str(value).translate(SQL_STRING_ESCAPES) + "'"
+
+@register_export_format('sql', 'SQL INSERT statements (MySQL)', 'application/sql', 'sql')
+def write_sql(chunks):
+    columns = ', '.join(column for _, _, column in EXPORT_COLUMNS)
+    for chunk in chunks:
+        values = ',\n'.join(
+            '(' + ', '.join(_sql_literal(value) for value in row) + ')'
+            for row in chunk
+        )
+        yield f'INSERT INTO {SQL_TABLE_NAME} ({columns}) VALUES\n{values};\n'
+
+def _tsv_value(value):
+    """Render a value in PostgreSQL COPY text format"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return (
+        str(value)
+        .replace('\\', '\\\\')
+        .replace('\t', '\\t')
+        .replace('\n', '\\n')
+        .replace('\r', '\\r')
+    )
+
+@register_export_format('tsv', 'TSV (COPY format)', 'text/tab-separated-values', 'tsv')
+def write_tsv(chunks):
+    for chunk in chunks:
+        yield ''.join('\t'.join(_tsv_value(value) for value in row) + '\n' for row in chunk)
+
+def _json_value(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+@register_export_format('jsonl', 'JSON Lines', 'application/x-ndjson', 'jsonl')
+def write_jsonl(chunks):
+    columns = [column for _, _, column in EXPORT_COLUMNS]
+    for chunk in chunks:
+        yield ''.join(
+            json.dumps({column: _json_value(value) for column, value in zip(columns, row)}) + '\n'
+            for row in chunk
+        )
+
+def gzip_stream(chunks):
+    """Compress a stream of text chunks into a gzip byte stream"""
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+def stream_export(profiles, export_format, compress=False, chunk_size=EXPORT_CHUNK_SIZE, progress=None):
+    """Yield an export of profiles in a registered format"""
+    chunks = EXPORT_FORMATS[export_format]['writer'](export_chunks(profiles, chunk_size, progress))
+    return gzip_stream(chunks) if compress else chunks
+
+def export_file_details(export_format, compress=False, filename='wepool_users_with_overrides'):
+    """(filename, content type) of an export download"""
+    registered = EXPORT_FORMATS[export_format]
+    filename = f"{filename}.{registered['extension']}"
+    if compress:
+        return filename + '.gz', 'application/gzip'
+    return filename, registered['content_type']
+
+def export_response(profiles, export_format, compress=False, filename='wepool_users_with_overrides'):
+    """Streaming download of profiles in a registered format"""
+    filename, content_type = export_file_details(export_format, compress, filename)
+    response = StreamingHttpResponse(
+        stream_export(profiles, export_format, compress),
+        content_type=content_type
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
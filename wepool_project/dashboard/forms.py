@@ -2,6 +2,9 @@
 from django import forms
 from django.contrib.auth.models import User
 from users.models import Profile
+from users.search import search_profiles
+from .exports import export_format_choices
+from .matching import matching_strategy_choices
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 
@@ -275,6 +278,68 @@ class ProfileFilterForm(forms.Form):
         }),
         label='Search'
     )
+    sort = forms.ChoiceField(
+        choices=[
+            ('newest', 'Newest First'),
+            ('oldest', 'Oldest First'),
+            ('last_name', 'Last Name'),
+            ('phone', 'Phone'),
+            ('relevance', 'Best Match'),
+        ],
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'}),
+        label='Sort By'
+    )
+    page_size = forms.TypedChoiceField(
+        choices=[('25', '25'), ('50', '50'), ('100', '100'), ('200', '200')],
+        coerce=int,
+        required=False,
+        empty_value=50,
+        widget=forms.Select(attrs={'class': 'form-select'}),
+        label='Per Page'
+    )
+
+    # Keyset orderings for each sort option; each ends in the primary key
+    SORT_ORDERINGS = {
+        'newest': ('-created_at', '-id'),
+        'oldest': ('created_at', 'id'),
+        'last_name': ('user__last_name', 'user__first_name', 'id'),
+        'phone': ('phone', 'id'),
+        'relevance': ('-search_rank', '-id'),
+    }
+
+    def filter_queryset(self, profiles):
+        """Apply the cleaned filters to a Profile queryset"""
+        if self.cleaned_data.get('member_type'):
+            profiles = profiles.filter(member_type=self.cleaned_data['member_type'])
+
+        if self.cleaned_data.get('status'):
+            profiles = profiles.filter(status=self.cleaned_data['status'])
+
+        # Override status filter
+        override_status = self.cleaned_data.get('override_status')
+        if override_status == 'overridden':
+            profiles = profiles.filter(qualification_overridden=True)
+        elif override_status == 'normal':
+            profiles = profiles.filter(qualification_overridden=False)
+        elif override_status == 'admin_overridden':
+            profiles = profiles.filter(admin_promotion_overridden=True)
+
+        search_term = self.cleaned_data.get('search')
+        if search_term:
+            profiles = search_profiles(profiles, search_term)
+
+        return profiles
+
+def export_queryset(data, selected_ids=None):
+    """Profiles matching the ProfileFilterForm fields in data, optionally by id"""
+    form = ProfileFilterForm(data)
+    profiles = Profile.objects.all()
+    if form.is_valid():
+        profiles = form.filter_queryset(profiles)
+    if selected_ids:
+        profiles = profiles.filter(id__in=selected_ids)
+    return profiles
 
 class BulkActionForm(forms.Form):
     """Form for bulk actions on multiple users"""
@@ -300,6 +365,13 @@ class BulkActionForm(forms.Form):
         label='New Status'
     )
 
+    export_format = forms.ChoiceField(
+        choices=export_format_choices,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'}),
+        label='Export Format'
+    )
+
     def clean(self):
         cleaned_data = super().clean()
         action = cleaned_data.get('action')
@@ -310,6 +382,11 @@ class BulkActionForm(forms.Form):
                 'new_status': 'Status is required when updating status.'
             })
 
+        if action == 'export_selected' and not cleaned_data.get('export_format'):
+            raise ValidationError({
+                'export_format': 'Format is required when exporting users.'
+            })
+
         return cleaned_data
 
 class TACConnectorUpdateForm(forms.Form):
@@ -340,6 +417,21 @@ class TACConnectorUpdateForm(forms.Form):
 
         return cleaned_data
 
+class AutoAssignForm(forms.Form):
+    """Form for pairing the yellow and PIF queues in bulk"""
+    strategy = forms.ChoiceField(
+        choices=matching_strategy_choices,
+        initial='fifo',
+        widget=forms.Select(attrs={'class': 'form-select'}),
+        label='Match By'
+    )
+    limit = forms.IntegerField(
+        required=False,
+        min_value=1,
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'All'}),
+        label='Maximum Pairs'
+    )
+
 class AssignmentForm(forms.Form):
     """Form for assigning Yellow members to PIF members"""
     yellow_member = forms.ModelChoiceField(
@@ -0,0 +1,44 @@
+# dashboard/jobs.py
+from core.jobs import register_job, report_progress, save_result_file
+from users.qualifications import QUALIFICATION_RULES, apply_rule
+from .bulk import run_bulk_action
+from .exports import export_file_details, stream_export
+from .forms import export_queryset
+
+@register_job('bulk_action')
+def bulk_action_job(job, action, profile_ids, new_status=None):
+    return run_bulk_action(
+        action,
+        profile_ids,
+        new_status=new_status,
+        progress=lambda done, total: report_progress(job, done, total)
+    )
+
+@register_job('export')
+def export_job(job, export_format, filters=None, selected_ids=None, compress=False):
+    profiles = export_queryset(filters or {}, selected_ids)
+    total = profiles.count()
+    report_progress(job, 0, total)
+
+    filename, content_type = export_file_details(export_format, compress)
+    save_result_file(
+        job,
+        filename,
+        stream_export(
+            profiles,
+            export_format,
+            compress,
+            progress=lambda rows: report_progress(job, rows)
+        ),
+        content_type
+    )
+    return {'rows': total, 'filename': filename}
+
+@register_job('qualification_sweep')
+def qualification_sweep_job(job, dry_run=False):
+    counts = {}
+    for done, (name, candidates, new_status) in enumerate(QUALIFICATION_RULES):
+        report_progress(job, done, len(QUALIFICATION_RULES))
+        counts[name] = apply_rule(candidates(), new_status, dry_run=dry_run)
+    report_progress(job, len(QUALIFICATION_RULES))
+    return counts
@@ -0,0 +1,60 @@
+# Management command for pairing the yellow and PIF queues in bulk
+
+from django.core.management.base import BaseCommand
+from dashboard.matching import MATCHING_STRATEGIES, describe_pairs, match_members
+
+class Command(BaseCommand):
+    help = 'Assign waiting yellow members to waiting PIF members in bulk'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--strategy',
+            choices=sorted(MATCHING_STRATEGIES),
+            default='fifo',
+            help='How to pair the two queues'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            help='Consider at most this many of the longest-waiting members of each queue'
+        )
+        parser.add_argument(
+            '--key',
+            help='Idempotency key; running again with the same key assigns nothing new'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='List the pairs that would be made without assigning them'
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        result = match_members(
+            options['strategy'], limit=options['limit'], preview=dry_run, key=options['key']
+        )
+        if result['replayed']:
+            self.stdout.write(
+                self.style.WARNING(f"Key already used: {len(result['pairs'])} pairs were assigned then")
+            )
+            return
+
+        if dry_run:
+            for pair in describe_pairs(result['pairs']):
+                yellow, pif = pair['yellow'], pair['pif']
+                self.stdout.write(
+                    f"{yellow['name']} ({yellow['phone']}) -> {pif['name']} ({pif['phone']})"
+                )
+
+        verb = 'Would assign' if dry_run else 'Assigned'
+        timings = ', '.join(f'{step} {ms} ms' for step, ms in result['timings'].items())
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {len(result['pairs'])} pairs "
+                f"({result['yellow_considered']} yellow and {result['pif_considered']} PIF members considered)"
+            )
+        )
+        self.stdout.write(
+            f"{result['elapsed_ms']} ms ({timings}); "
+            f"{result['ms_per_1000_pairs']} ms per 1000 pairs"
+        )
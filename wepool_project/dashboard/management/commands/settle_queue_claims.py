@@ -0,0 +1,14 @@
+# Management command that closes claims on members who have left their queue
+
+from django.core.management.base import BaseCommand
+from dashboard.queues import settle_all_claims
+
+class Command(BaseCommand):
+    help = 'Mark open work queue claims on members who have left the queue as done'
+
+    def handle(self, *args, **options):
+        settled = settle_all_claims()
+        details = ', '.join(f'{queue} {count}' for queue, count in settled.items())
+        self.stdout.write(
+            self.style.SUCCESS(f'Settled {sum(settled.values())} claims ({details})')
+        )
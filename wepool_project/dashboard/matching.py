@@ -0,0 +1,281 @@
+# dashboard/matching.py
+import time
+from collections import defaultdict, deque
+from contextlib import nullcontext
+from functools import partial
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from core.models import Assignment, AssignmentSubmission, Referral, ReferralClosure
+from core.snapshots import invalidate_upline_snapshots
+from core.utils import recompute_referral_counters
+from users.models import Profile
+from .bulk import timed
+from .utils import invalidate_dashboard_stats
+
+MATCH_BATCH_SIZE = 1000
+# Pairs listed in a preview, and members per queue offered for manual
+# assignment, on the assign members page
+MATCH_PREVIEW_ROWS = 200
+MANUAL_ASSIGN_CHOICES = 100
+# Furthest apart (in referrals, from a shared upline member) two members
+# can be for the proximity strategy to pair them
+MATCH_PROXIMITY_DEPTH = 4
+# Region fields compared by the region strategy, most specific first
+REGION_LEVELS = (('country', 'state', 'city'), ('country', 'state'), ('country',))
+QUEUE_FIELDS = ('id', 'city', 'state', 'country')
+
+# Registered matching strategies by name; see register_matching_strategy
+MATCHING_STRATEGIES = {}
+
+def register_matching_strategy(name, label):
+    """Register a function that pairs the yellow and PIF queues
+
+    It takes both queues as lists of QUEUE_FIELDS dicts, oldest first, and
+    returns (yellow id, PIF id) pairs, the pairs to make first first.
+    """
+    def decorator(strategy):
+        MATCHING_STRATEGIES[name] = {'label': label, 'match': strategy}
+        return strategy
+    return decorator
+
+def matching_strategy_choices():
+    return [(name, strategy['label']) for name, strategy in MATCHING_STRATEGIES.items()]
+
+def yellow_queue():
+    """Yellow members waiting to sponsor a PIF member, oldest first"""
+    return Profile.objects.filter(
+        status='yellow',
+        paid_for_sponsored=False
+    ).order_by('created_at', 'id')
+
+def pif_queue():
+    """Qualified PIF members waiting for a sponsor, oldest first"""
+    return Profile.objects.filter(
+        member_type='sponsored',
+        status='qualified',
+        paid_for_self=False
+    ).order_by('created_at', 'id')
+
+def _pair_in_order(yellow_ids, pif_ids, taken, pairs):
+    """Pair two id queues front to front, skipping ids already taken"""
+    yellow_ids = deque(yellow_ids)
+    pif_ids = deque(pif_ids)
+    while yellow_ids and pif_ids:
+        if yellow_ids[0] in taken:
+            yellow_ids.popleft()
+        elif pif_ids[0] in taken:
+            pif_ids.popleft()
+        else:
+            pair = (yellow_ids.popleft(), pif_ids.popleft())
+            taken.update(pair)
+            pairs.append(pair)
+
+def _pair_rest(yellows, pifs, taken, pairs):
+    """Pair whoever is left in both queues FIFO"""
+    _pair_in_order([member['id'] for member in yellows], [member['id'] for member in pifs], taken, pairs)
+    return pairs
+
+@register_matching_strategy('fifo', 'Longest waiting first')
+def match_fifo(yellows, pifs):
+    return _pair_rest(yellows, pifs, set(), [])
+
+@register_matching_strategy('proximity', 'Closest in the referral tree')
+def match_by_proximity(yellows, pifs):
+    """Pair members sharing the nearest upline member, then the rest FIFO"""
+    # under[ancestor][side][depth]: queue members that many referrals below
+    # the ancestor (a member is its own ancestor at depth 0), oldest first
+    under = defaultdict(lambda: (defaultdict(list), defaultdict(list)))
+    upline = defaultdict(list)
+    for descendant_id, ancestor_id, depth in ReferralClosure.objects.filter(
+        descendant_id__in=[member['id'] for member in yellows + pifs],
+        depth__lte=MATCH_PROXIMITY_DEPTH
+    ).values_list('descendant_id', 'ancestor_id', 'depth'):
+        upline[descendant_id].append((ancestor_id, depth))
+    for side, members in enumerate((yellows, pifs)):
+        for member in members:
+            for ancestor_id, depth in [(member['id'], 0)] + upline[member['id']]:
+                under[ancestor_id][side][depth].append(member['id'])
+
+    taken = set()
+    pairs = []
+    for distance in range(1, 2 * MATCH_PROXIMITY_DEPTH + 1):
+        for below_yellow, below_pif in under.values():
+            lowest = max(0, distance - MATCH_PROXIMITY_DEPTH)
+            for yellow_depth in range(lowest, min(distance, MATCH_PROXIMITY_DEPTH) + 1):
+                yellow_ids = below_yellow.get(yellow_depth)
+                pif_ids = below_pif.get(distance - yellow_depth)
+                if yellow_ids and pif_ids:
+                    _pair_in_order(yellow_ids, pif_ids, taken, pairs)
+    return _pair_rest(yellows, pifs, taken, pairs)
+
+@register_matching_strategy('region', 'Same city, state or country')
+def match_by_region(yellows, pifs):
+    """Pair members in the same city, then state, then country, then the rest FIFO"""
+    taken = set()
+    pairs = []
+    for fields in REGION_LEVELS:
+        buckets = defaultdict(lambda: ([], []))
+        for side, members in enumerate((yellows, pifs)):
+            for member in members:
+                key = tuple((member[field] or '').strip().lower() for field in fields)
+                if all(key) and member['id'] not in taken:
+                    buckets[key][side].append(member['id'])
+        for yellow_ids, pif_ids in buckets.values():
+            _pair_in_order(yellow_ids, pif_ids, taken, pairs)
+    return _pair_rest(yellows, pifs, taken, pairs)
+
+def _start_submission(key, user):
+    """Record a submission key, returning (submission, None), or (None, the
+    pairs it made) when the key was submitted before"""
+    try:
+        with transaction.atomic():
+            return AssignmentSubmission.objects.create(key=key, created_by=user), None
+    except IntegrityError:
+        # A concurrent submission with this key waits here until the first commits
+        return None, list(
+            Assignment.objects.filter(submission__key=key).order_by('id').values_list(
+                'yellow_member_id', 'sponsored_member_id'
+            )
+        )
+
+def release_assignments(yellow_ids=(), pif_ids=()):
+    """Deactivate the active assignments of these yellow and PIF members"""
+    return Assignment.objects.filter(
+        Q(active_yellow_key__in=list(yellow_ids)) | Q(active_pif_key__in=list(pif_ids))
+    ).update(**Assignment.INACTIVE_VALUES)
+
+def release_requeued_assignments(profile_ids):
+    """Deactivate the assignments of those of profile_ids who are back in
+    the yellow or PIF queue, so they can be assigned again"""
+    profile_ids = list(profile_ids)
+    return Assignment.objects.filter(
+        Q(active_yellow_key__in=yellow_queue().filter(id__in=profile_ids).values('id')) |
+        Q(active_pif_key__in=pif_queue().filter(id__in=profile_ids).values('id'))
+    ).update(**Assignment.INACTIVE_VALUES)
+
+def _create_assignments(pairs, submission=None, batch_size=MATCH_BATCH_SIZE):
+    """Write assignments for pairs whose queue rows this transaction has locked"""
+    matched_yellows = [yellow_id for yellow_id, _ in pairs]
+    matched_pifs = [pif_id for _, pif_id in pairs]
+    # Members put back in a queue by hand may still hold an old assignment
+    release_assignments(matched_yellows, matched_pifs)
+    Assignment.objects.bulk_create(
+        [
+            Assignment(
+                yellow_member_id=yellow_id,
+                sponsored_member_id=pif_id,
+                active_yellow_key=yellow_id,
+                active_pif_key=pif_id,
+                completed=True,
+                submission=submission
+            )
+            for yellow_id, pif_id in pairs
+        ],
+        batch_size=batch_size
+    )
+    now = timezone.now()
+    Profile.objects.filter(id__in=matched_yellows).update(paid_for_sponsored=True, updated_at=now)
+    Profile.objects.filter(id__in=matched_pifs).update(status='green', paid_for_self=True, updated_at=now)
+
+    # update() skips the counter signals, so refresh the PIF members' referrers
+    recompute_referral_counters(
+        Referral.objects.filter(
+            referred_id__in=matched_pifs
+        ).values_list('referrer_id', flat=True)
+    )
+    transaction.on_commit(partial(invalidate_upline_snapshots, matched_yellows + matched_pifs))
+    transaction.on_commit(invalidate_dashboard_stats)
+    return pairs
+
+def assign_pairs(pairs, key=None, user=None, batch_size=MATCH_BATCH_SIZE):
+    """Create completed assignments for chosen (yellow id, PIF id) pairs
+
+    Returns (pairs made, replayed). Everything happens in one transaction:
+    queue rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so a pair
+    whose member another admin is assigning right now, or who has left the
+    queue, is dropped rather than assigned twice. A repeated ``key`` makes
+    nothing new and returns what the first submission made.
+    """
+    with transaction.atomic():
+        submission = None
+        if key:
+            submission, replayed = _start_submission(key, user)
+            if submission is None:
+                return replayed, True
+
+        yellow_ids = set(
+            yellow_queue().filter(
+                id__in=[yellow_id for yellow_id, _ in pairs]
+            ).select_for_update(skip_locked=True).order_by().values_list('id', flat=True)
+        )
+        pif_ids = set(
+            pif_queue().filter(
+                id__in=[pif_id for _, pif_id in pairs]
+            ).select_for_update(skip_locked=True).order_by().values_list('id', flat=True)
+        )
+        pairs = [(yellow_id, pif_id) for yellow_id, pif_id in pairs if yellow_id in yellow_ids and pif_id in pif_ids]
+        if pairs:
+            _create_assignments(pairs, submission, batch_size)
+    return pairs, False
+
+def match_members(strategy='fifo', limit=None, preview=False, key=None, user=None):
+    """Pair the yellow and PIF queues with a registered strategy
+
+    ``limit`` caps how many of the longest-waiting members of each queue
+    are considered. Unless previewing, they are claimed with SKIP LOCKED
+    and assigned in the same transaction, so several admins (or workers)
+    can drain the queues in parallel, each taking the heads the others
+    haven't; ``key`` makes a retried submission a no-op as in assign_pairs.
+    Returns the pairs made (or that would be made), how many members were
+    considered, per-step timings in ms and the ms it took per 1000 pairs.
+    """
+    timings = {}
+    start = time.perf_counter()
+    yellows = pifs = []
+    with nullcontext() if preview else transaction.atomic():
+        submission = replayed = None
+        if key and not preview:
+            submission, replayed = _start_submission(key, user)
+
+        if replayed is None:
+            with timed(timings, 'load' if preview else 'claim'):
+                yellows = _queue_heads(yellow_queue(), limit, lock=not preview)
+                pifs = _queue_heads(pif_queue(), limit, lock=not preview)
+            with timed(timings, 'match'):
+                pairs = MATCHING_STRATEGIES[strategy]['match'](yellows, pifs)
+            if not preview and pairs:
+                with timed(timings, 'assign'):
+                    _create_assignments(pairs, submission)
+        else:
+            pairs = replayed
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    return {
+        'strategy': strategy,
+        'preview': preview,
+        'replayed': replayed is not None,
+        'yellow_considered': len(yellows),
+        'pif_considered': len(pifs),
+        'pairs': pairs,
+        'timings': timings,
+        'elapsed_ms': round(elapsed_ms, 2),
+        'ms_per_1000_pairs': round(elapsed_ms * 1000 / len(pairs), 2) if pairs else None,
+    }
+
+def _queue_heads(queue, limit, lock):
+    if lock:
+        queue = queue.select_for_update(skip_locked=True)
+    return list(queue.values(*QUEUE_FIELDS)[:limit])
+
+def describe_pairs(pairs):
+    """Names, phones and regions of both members of each pair, for display"""
+    members = {
+        member['id']: member
+        for member in Profile.objects.filter(
+            id__in=[member_id for pair in pairs for member_id in pair]
+        ).values('id', 'phone', 'city', 'state', 'country', 'user__first_name', 'user__last_name')
+    }
+    for member in members.values():
+        member['name'] = f"{member['user__first_name']} {member['user__last_name']}".strip()
+    return [{'yellow': members[yellow_id], 'pif': members[pif_id]} for yellow_id, pif_id in pairs]
@@ -1,3 +1,110 @@
-from django.db import models
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+from users.models import Profile
+from core.models import Assignment
+from .utils import (
+    TRACKED_PROFILE_FIELDS,
+    apply_stats_deltas,
+    invalidate_dashboard_stats,
+    live_counters_enabled,
+    profile_stat_values
+)
 
-# Create your models here.
+# Keep the cached dashboard statistics in step with the data they count.
+
+@receiver(post_save, sender=Profile)
+def profile_stats_changed(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+
+    new_values = {field: getattr(instance, field) for field in TRACKED_PROFILE_FIELDS}
+    if created:
+        if not live_counters_enabled():
+            invalidate_dashboard_stats()
+            return
+        deltas = profile_stat_values(**new_values)
+        deltas['total_users'] = 1
+        deltas['recent_registrations'] = 1
+        deltas['active_users'] = int(instance.user.is_active)
+        apply_stats_deltas(deltas)
+        return
+
+    loaded = getattr(instance, '_loaded_values', None)
+    if loaded is None:
+        invalidate_dashboard_stats()
+        return
+
+    old_values = {field: loaded.get(field, new_values[field]) for field in TRACKED_PROFILE_FIELDS}
+    if old_values == new_values:
+        return
+
+    if not live_counters_enabled():
+        invalidate_dashboard_stats()
+        return
+
+    deltas = profile_stat_values(**new_values)
+    for name, value in profile_stat_values(**old_values).items():
+        deltas[name] = deltas.get(name, 0) - value
+    apply_stats_deltas(deltas)
+
+# Profile fields that decide whether a member waits in the yellow or PIF queue
+QUEUE_MEMBERSHIP_FIELDS = ('member_type', 'status', 'paid_for_self', 'paid_for_sponsored')
+
+@receiver(post_save, sender=Profile)
+def release_requeued_member(sender, instance, created, raw=False, **kwargs):
+    """Deactivate the old assignment of a member an edit puts back in a queue"""
+    loaded = getattr(instance, '_loaded_values', None)
+    if raw or created or loaded is None:
+        return
+    if all(loaded.get(field) == getattr(instance, field) for field in QUEUE_MEMBERSHIP_FIELDS):
+        return
+    from .matching import release_requeued_assignments
+    release_requeued_assignments([instance.pk])
+
+@receiver(post_delete, sender=Profile)
+def profile_stats_deleted(sender, instance, **kwargs):
+    invalidate_dashboard_stats()
+
+@receiver(pre_save, sender=User)
+@receiver(pre_save, sender=Assignment)
+def remember_stats_flags(sender, instance, update_fields=None, **kwargs):
+    """Record the stored active/completed flag so live counters get a delta"""
+    flag = 'is_active' if sender is User else 'completed'
+    if not live_counters_enabled() or instance._state.adding:
+        return
+    if update_fields is not None and flag not in update_fields:
+        return
+    instance._stats_previous_flag = sender.objects.filter(
+        pk=instance.pk
+    ).values_list(flag, flat=True).first()
+
+@receiver(post_save, sender=User)
+def user_stats_changed(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, '_stats_previous_flag', None)
+    if raw or created or previous is None or previous == instance.is_active:
+        return
+    apply_stats_deltas({'active_users': 1 if instance.is_active else -1})
+    instance._stats_previous_flag = instance.is_active
+
+@receiver(post_save, sender=Assignment)
+def assignment_stats_changed(sender, instance, created, raw=False, **kwargs):
+    if raw or not live_counters_enabled():
+        return
+
+    if created:
+        name = 'assignments_completed' if instance.completed else 'assignments_pending'
+        apply_stats_deltas({name: 1})
+        return
+
+    previous = getattr(instance, '_stats_previous_flag', None)
+    if previous is None or previous == instance.completed:
+        return
+    sign = 1 if instance.completed else -1
+    apply_stats_deltas({'assignments_completed': sign, 'assignments_pending': -sign})
+    instance._stats_previous_flag = instance.completed
+
+@receiver(post_delete, sender=Assignment)
+def assignment_stats_deleted(sender, instance, **kwargs):
+    if live_counters_enabled():
+        invalidate_dashboard_stats()
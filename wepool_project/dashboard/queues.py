@@ -0,0 +1,163 @@
+# dashboard/queues.py
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg, Count, DurationField, Exists, ExpressionWrapper, F, OuterRef
+from django.utils import timezone
+from core.models import QueueClaim
+from users.models import Profile
+from .matching import pif_queue, yellow_queue
+
+CLAIM_BATCH_SIZE = 10
+MAX_CLAIM_BATCH_SIZE = 100
+
+# Registered work queues by name; see register_work_queue
+WORK_QUEUES = {}
+
+def register_work_queue(name, label):
+    """Register a factory for the profiles waiting in a queue, oldest first"""
+    def decorator(members):
+        WORK_QUEUES[name] = {'label': label, 'members': members}
+        return members
+    return decorator
+
+@register_work_queue('paying', 'Paying Members')
+def paying_members():
+    return Profile.objects.filter(member_type='paying', status='pending').order_by('created_at', 'id')
+
+@register_work_queue('sponsored', 'Sponsored Members')
+def sponsored_members():
+    return Profile.objects.filter(member_type='sponsored', status='pending').order_by('created_at', 'id')
+
+register_work_queue('yellow', 'Yellow Members')(yellow_queue)
+register_work_queue('qualified_sponsored', 'Qualified Sponsored Members')(pif_queue)
+
+def _live_claims(queue, now):
+    return QueueClaim.objects.filter(queue=queue, status='claimed', lease_expires_at__gt=now)
+
+def settle_claims(queue):
+    """Close open claims on members who have left the queue
+
+    Live claims are marked done; claims whose lease had already run out
+    are closed as expired when their lease ended, as claim_batch does, so
+    an abandoned claim gets no credit for work done after it. Runs when
+    admins claim or renew, and from the settle_queue_claims command; reads
+    leave claims alone and just skip members who have left. Returns the
+    number of claims closed.
+    """
+    now = timezone.now()
+    left = QueueClaim.objects.filter(queue=queue, status='claimed').exclude(
+        profile__in=WORK_QUEUES[queue]['members']().values('id')
+    )
+    done = left.filter(lease_expires_at__gt=now).update(status='done', finished_at=now)
+    expired = left.filter(lease_expires_at__lte=now).update(status='expired', finished_at=F('lease_expires_at'))
+    return done + expired
+
+def settle_all_claims():
+    """settle_claims for every queue, returning the count per queue"""
+    return {queue: settle_claims(queue) for queue in WORK_QUEUES}
+
+def claim_batch(queue, user, size=CLAIM_BATCH_SIZE):
+    """Lease up to size of the oldest unclaimed members of a queue to user
+
+    Members are picked with SELECT ... FOR UPDATE SKIP LOCKED, so admins
+    claiming at the same time get different members without waiting on
+    each other. Claims whose lease ran out are closed as expired and their
+    members can be claimed again. Returns the claimed profile ids.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        settle_claims(queue)
+        profile_ids = list(
+            WORK_QUEUES[queue]['members']().filter(
+                ~Exists(_live_claims(queue, now).filter(profile=OuterRef('pk')))
+            ).select_for_update(skip_locked=True).values_list('id', flat=True)[:size]
+        )
+        if not profile_ids:
+            return []
+
+        QueueClaim.objects.filter(
+            queue=queue, status='claimed', profile_id__in=profile_ids
+        ).update(status='expired', finished_at=F('lease_expires_at'))
+        lease_expires_at = now + timedelta(seconds=settings.QUEUE_LEASE_SECONDS)
+        QueueClaim.objects.bulk_create([
+            QueueClaim(
+                queue=queue,
+                profile_id=profile_id,
+                claimed_by=user,
+                claimed_at=now,
+                lease_expires_at=lease_expires_at
+            )
+            for profile_id in profile_ids
+        ])
+    return profile_ids
+
+def renew_claims(queue, user):
+    """Extend the leases user still holds in a queue, returning how many"""
+    settle_claims(queue)
+    now = timezone.now()
+    return _live_claims(queue, now).filter(claimed_by=user).update(
+        lease_expires_at=now + timedelta(seconds=settings.QUEUE_LEASE_SECONDS)
+    )
+
+def release_claims(queue, user, profile_ids=None):
+    """Hand members user holds in a queue back to it (all of them by default)"""
+    claims = _live_claims(queue, timezone.now()).filter(claimed_by=user)
+    if profile_ids is not None:
+        claims = claims.filter(profile_id__in=profile_ids)
+    return claims.update(status='released', finished_at=timezone.now())
+
+def complete_claims(user, profile_ids, queue=None):
+    """Mark user's open claims on profile_ids as done, in one queue or all"""
+    claims = QueueClaim.objects.filter(status='claimed', claimed_by=user, profile_id__in=profile_ids)
+    if queue is not None:
+        claims = claims.filter(queue=queue)
+    return claims.update(status='done', finished_at=timezone.now())
+
+def claimed_members(queue, user):
+    """Profiles of a queue user currently holds a lease on, oldest first"""
+    return WORK_QUEUES[queue]['members']().filter(
+        id__in=_live_claims(queue, timezone.now()).filter(claimed_by=user).values('profile_id')
+    )
+
+def queue_metrics(hours=None, queues=None):
+    """Waiting, in-progress and done counts per queue, with items/hour
+
+    In progress counts live claims on members still in the queue.
+    Throughput counts members whose claims were completed (or settled) in
+    the last ``hours`` (QUEUE_THROUGHPUT_HOURS by default). ``queues``
+    limits the figures to those queues (all registered ones by default).
+    """
+    hours = hours or settings.QUEUE_THROUGHPUT_HOURS
+    queues = list(WORK_QUEUES) if queues is None else list(queues)
+    now = timezone.now()
+    done = {
+        row['queue']: row
+        for row in QueueClaim.objects.filter(
+            queue__in=queues, status='done', finished_at__gte=now - timedelta(hours=hours)
+        ).values('queue').annotate(
+            count=Count('id'),
+            handling_time=Avg(
+                ExpressionWrapper(F('finished_at') - F('claimed_at'), output_field=DurationField())
+            )
+        ).order_by()
+    }
+
+    metrics = {}
+    for queue in queues:
+        registered = WORK_QUEUES[queue]
+        counts = registered['members']().order_by().aggregate(
+            waiting=Count('id'),
+            in_progress=Count('id', filter=Exists(_live_claims(queue, now).filter(profile=OuterRef('pk'))))
+        )
+        finished = done.get(queue, {})
+        handling_time = finished.get('handling_time')
+        metrics[queue] = {
+            'label': registered['label'],
+            'waiting': counts['waiting'],
+            'in_progress': counts['in_progress'],
+            'done': finished.get('count', 0),
+            'items_per_hour': round(finished.get('count', 0) / hours, 2),
+            'avg_handling_minutes': round(handling_time.total_seconds() / 60, 1) if handling_time else None,
+        }
+    return {'hours': hours, 'queues': metrics}
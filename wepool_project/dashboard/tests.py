@@ -1,3 +1,252 @@
+import tempfile
+from datetime import timedelta
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, connection, transaction
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from core.jobs import claim_job, run_job
+from core.models import Assignment, Job, QueueClaim
+from users.models import Profile
+from .bulk import run_bulk_action
+from .exports import EXPORT_COLUMNS, _sql_literal, write_sql
+from .matching import match_members
+from .queues import claim_batch, claimed_members, complete_claims, queue_metrics, settle_claims
 
-# Create your tests here.
+def make_member(phone, **fields):
+    user = User.objects.create(username=f'member_{phone}', first_name='Member', last_name=phone)
+    Profile.objects.filter(user=user).update(phone=phone, **fields)
+    return Profile.objects.get(user=user)
+
+def make_yellow(phone):
+    return make_member(phone, member_type='paying', status='yellow')
+
+def make_pif(phone):
+    return make_member(phone, member_type='sponsored', status='qualified')
+
+class AssignmentUniquenessTests(TestCase):
+    def test_one_active_assignment_per_member(self):
+        yellow, pif, other_pif = make_yellow('100'), make_pif('200'), make_pif('201')
+        Assignment.objects.create(yellow_member=yellow, sponsored_member=pif)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Assignment.objects.create(yellow_member=yellow, sponsored_member=other_pif)
+
+    def test_inactive_assignments_do_not_count(self):
+        yellow, pif, other_pif = make_yellow('100'), make_pif('200'), make_pif('201')
+        first = Assignment.objects.create(yellow_member=yellow, sponsored_member=pif)
+        first.active = False
+        first.save(update_fields=['active'])
+        Assignment.objects.create(yellow_member=yellow, sponsored_member=other_pif)
+        first.refresh_from_db()
+        self.assertIsNone(first.active_yellow_key)
+
+    def test_requeued_yellow_member_is_matched_again(self):
+        yellow, pif = make_yellow('100'), make_pif('200')
+        self.assertEqual(match_members('fifo')['pairs'], [(yellow.id, pif.id)])
+
+        # An admin puts the yellow member back in the queue and a new PIF
+        # member qualifies
+        yellow = Profile.objects.get(id=yellow.id)
+        yellow.paid_for_sponsored = False
+        yellow.save()
+        new_pif = make_pif('201')
+
+        self.assertEqual(match_members('fifo')['pairs'], [(yellow.id, new_pif.id)])
+        self.assertEqual(
+            list(Assignment.objects.filter(active=True).values_list('yellow_member_id', 'sponsored_member_id')),
+            [(yellow.id, new_pif.id)]
+        )
+        self.assertEqual(Assignment.objects.filter(yellow_member=yellow).count(), 2)
+
+    def test_requeue_without_signals_is_released_when_matching(self):
+        yellow, pif = make_yellow('100'), make_pif('200')
+        match_members('fifo')
+        Profile.objects.filter(id=yellow.id).update(paid_for_sponsored=False)
+        new_pif = make_pif('201')
+
+        self.assertEqual(match_members('fifo')['pairs'], [(yellow.id, new_pif.id)])
+        self.assertFalse(Assignment.objects.get(sponsored_member=pif).active)
+
+    def test_bulk_status_update_releases_requeued_members(self):
+        yellow, pif = make_yellow('100'), make_pif('200')
+        match_members('fifo')
+        Profile.objects.filter(id=yellow.id).update(status='green', paid_for_sponsored=False)
+
+        run_bulk_action('update_status', [yellow.id], new_status='yellow')
+        self.assertFalse(Assignment.objects.get(yellow_member=yellow).active)
+
+    def test_repeated_key_assigns_once(self):
+        yellow, pif = make_yellow('100'), make_pif('200')
+        first = match_members('fifo', key='submission-1')
+        make_yellow('101'), make_pif('201')
+        again = match_members('fifo', key='submission-1')
+
+        self.assertTrue(again['replayed'])
+        self.assertEqual(again['pairs'], first['pairs'])
+        self.assertEqual(Assignment.objects.count(), 1)
+
+MYSQL_UNESCAPES = {'0': '\0', 'n': '\n', 'r': '\r', 'Z': '\x1a'}
+
+def read_mysql_string(sql, start=0):
+    """Decode the MySQL string literal at sql[start], returning (value, end)"""
+    assert sql[start] == "'"
+    value = []
+    position = start + 1
+    while True:
+        char = sql[position]
+        if char == '\\':
+            escaped = sql[position + 1]
+            value.append(MYSQL_UNESCAPES.get(escaped, escaped))
+            position += 2
+        elif char == "'" and sql[position + 1:position + 2] == "'":
+            value.append("'")
+            position += 2
+        elif char == "'":
+            return ''.join(value), position + 1
+        else:
+            value.append(char)
+            position += 1
+
+class SqlExportTests(TestCase):
+    VALUES = ["O'Brien", "O\\'Brien", 'ends with \\', "\\'); DROP TABLE profiles; --", 'two\nlines\r', '"quoted"\0\x1a']
+
+    def test_string_literals_round_trip_in_mysql(self):
+        for value in self.VALUES:
+            literal = _sql_literal(value)
+            self.assertEqual(read_mysql_string(literal), (value, len(literal)), literal)
+
+    def test_rows_stay_inside_their_literals(self):
+        row = ['user', 'user@example.com', "O\\'Brien", 'ends with \\'] + [None] * (len(EXPORT_COLUMNS) - 4)
+        statement = ''.join(write_sql([[row]]))
+
+        values = statement[statement.index('VALUES\n(') + len('VALUES\n('):]
+        decoded = []
+        for _ in range(4):
+            value, end = read_mysql_string(values)
+            decoded.append(value)
+            values = values[end:].lstrip(', ')
+        self.assertEqual(decoded, row[:4])
+        self.assertTrue(values.startswith('NULL'))
+
+class QueueClaimTests(TestCase):
+    def setUp(self):
+        self.first_admin = make_member('900', member_type='paying', status='green').user
+        self.second_admin = make_member('901', member_type='paying', status='green').user
+        self.members = [make_member(f'30{i}', member_type='paying', status='pending') for i in range(3)]
+
+    def test_admins_claim_different_members(self):
+        first = claim_batch('paying', self.first_admin, size=2)
+        second = claim_batch('paying', self.second_admin, size=2)
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 1)
+        self.assertFalse(set(first) & set(second))
+
+    def test_expired_lease_can_be_claimed_again(self):
+        claimed = claim_batch('paying', self.first_admin, size=3)
+        QueueClaim.objects.filter(profile_id=claimed[0]).update(
+            lease_expires_at=timezone.now() - timedelta(seconds=1)
+        )
+
+        self.assertEqual(claim_batch('paying', self.second_admin, size=3), [claimed[0]])
+        self.assertEqual(
+            list(QueueClaim.objects.filter(profile_id=claimed[0]).order_by('id').values_list('status', 'claimed_by')),
+            [('expired', self.first_admin.id), ('claimed', self.second_admin.id)]
+        )
+        self.assertNotIn(claimed[0], claimed_members('paying', self.first_admin).values_list('id', flat=True))
+
+    def test_reads_do_not_write(self):
+        claimed = claim_batch('paying', self.first_admin, size=1)
+        Profile.objects.filter(id=claimed[0]).update(status='yellow')
+
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(list(claimed_members('paying', self.first_admin)), [])
+            metrics = queue_metrics()['queues']['paying']
+        self.assertFalse([query for query in captured if not query['sql'].startswith('SELECT')])
+        self.assertEqual((metrics['waiting'], metrics['in_progress']), (2, 0))
+
+    def test_handling_time_metric(self):
+        claimed = claim_batch('paying', self.first_admin, size=2)
+        complete_claims(self.first_admin, claimed)
+        finished_at = timezone.now()
+        QueueClaim.objects.filter(profile_id=claimed[0]).update(
+            claimed_at=finished_at - timedelta(minutes=1), finished_at=finished_at
+        )
+        QueueClaim.objects.filter(profile_id=claimed[1]).update(
+            claimed_at=finished_at - timedelta(minutes=2), finished_at=finished_at
+        )
+
+        metrics = queue_metrics(hours=2)['queues']['paying']
+        self.assertEqual(metrics['done'], 2)
+        self.assertEqual(metrics['items_per_hour'], 1.0)
+        self.assertEqual(metrics['avg_handling_minutes'], 1.5)
+
+    def test_settling_credits_only_live_claims(self):
+        live, abandoned = claim_batch('paying', self.first_admin, size=2)
+        lease_expired_at = timezone.now() - timedelta(hours=1)
+        QueueClaim.objects.filter(profile_id=abandoned).update(lease_expires_at=lease_expired_at)
+        Profile.objects.filter(id__in=[live, abandoned]).update(status='yellow')
+
+        self.assertEqual(settle_claims('paying'), 2)
+        self.assertEqual(QueueClaim.objects.get(profile_id=live).status, 'done')
+        abandoned_claim = QueueClaim.objects.get(profile_id=abandoned)
+        self.assertEqual(
+            (abandoned_claim.status, abandoned_claim.finished_at), ('expired', lease_expired_at)
+        )
+        self.assertEqual(queue_metrics()['queues']['paying']['done'], 1)
+
+    def test_metrics_for_one_queue(self):
+        with self.assertNumQueries(2):
+            metrics = queue_metrics(queues=['paying'])
+        self.assertEqual(list(metrics['queues']), ['paying'])
+        self.assertEqual(metrics['queues']['paying']['waiting'], 3)
+
+class JobEndpointTests(TestCase):
+    def setUp(self):
+        results = tempfile.TemporaryDirectory()
+        self.addCleanup(results.cleanup)
+        storage = mock.patch.object(Job._meta.get_field('result_file'), 'storage', FileSystemStorage(results.name))
+        storage.start()
+        self.addCleanup(storage.stop)
+
+        self.admin = make_member('900', member_type='paying', status='green').user
+        self.admin.is_staff = True
+        self.admin.save()
+        self.client.force_login(self.admin)
+
+    def test_background_export_is_polled_and_downloaded(self):
+        response = self.client.post(reverse('export_data'), {'export_type': 'csv', 'background': '1'})
+        job = Job.objects.get()
+        self.assertRedirects(response, reverse('job_detail', args=[job.id]))
+        self.assertEqual((job.kind, job.created_by), ('export', self.admin))
+        self.assertEqual(self.client.get(reverse('job_status', args=[job.id])).json()['status'], 'queued')
+        self.assertEqual(self.client.get(reverse('job_download', args=[job.id])).status_code, 404)
+
+        run_job(claim_job())
+        status = self.client.get(reverse('job_status', args=[job.id])).json()
+        self.assertEqual((status['status'], status['percent'], status['result']['rows']), ('succeeded', 100, 1))
+        self.assertEqual(status['download_url'], reverse('job_download', args=[job.id]))
+
+        download = self.client.get(status['download_url'])
+        self.assertEqual(download.status_code, 200)
+        self.assertIn('attachment', download['Content-Disposition'])
+        self.assertIn(b'member_900', b''.join(download.streaming_content))
+
+    def test_qualification_sweep_is_queued(self):
+        response = self.client.post(reverse('qualification_sweep'), {'dry_run': '1'})
+        job = Job.objects.get()
+        self.assertRedirects(response, reverse('job_detail', args=[job.id]))
+        self.assertEqual((job.kind, job.params), ('qualification_sweep', {'dry_run': True}))
+
+        run_job(claim_job())
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'succeeded')
+        self.assertEqual(self.client.get(reverse('job_detail', args=[job.id])).status_code, 200)
+
+    def test_job_pages_are_staff_only(self):
+        job = Job.objects.create(kind='export')
+        self.client.force_login(make_member('901').user)
+        for name in ('job_detail', 'job_status', 'job_download'):
+            self.assertEqual(self.client.get(reverse(name, args=[job.id])).status_code, 302)
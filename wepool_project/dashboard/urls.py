@@ -19,6 +19,16 @@ urlpatterns = [
 
     # API and utility endpoints
     path('api/stats/', views.dashboard_stats, name='dashboard_stats'),
+    path('api/request-timings/', views.request_timings, name='request_timings'),
+    path('api/users/autocomplete/', views.user_autocomplete, name='user_autocomplete'),
+    path('api/queues/metrics/', views.work_queue_metrics, name='work_queue_metrics'),
+    path('api/queues/<str:queue>/', views.work_queue_api, name='work_queue_api'),
     path('bulk-update-status/', views.bulk_update_status, name='bulk_update_status'),
     path('process-yellow/', views.process_yellow_queue, name='process_yellow_queue'),
+
+    # Background jobs
+    path('jobs/qualification-sweep/', views.qualification_sweep, name='qualification_sweep'),
+    path('jobs/<int:job_id>/', views.job_detail, name='job_detail'),
+    path('jobs/<int:job_id>/download/', views.job_download, name='job_download'),
+    path('api/jobs/<int:job_id>/', views.job_status, name='job_status'),
 ]
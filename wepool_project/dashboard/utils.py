@@ -0,0 +1,137 @@
+# dashboard/utils.py
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils import timezone
+from users.models import Profile
+from core.cache import bump_namespace, get_or_set
+from core.models import Assignment
+
+STATS_CACHE_KEY = 'dashboard:stats'
+LIVE_COUNTER_PREFIX = 'dashboard:live:'
+# core.cache namespace of the cached dashboard_stats responses
+STATS_VIEW_NAMESPACE = 'dashboard:stats_view'
+
+# Profile fields whose changes move the dashboard figures
+TRACKED_PROFILE_FIELDS = (
+    'member_type', 'status', 'verified_email',
+    'qualification_overridden', 'admin_promotion_overridden',
+)
+
+STAT_COUNTERS = (
+    'total_users', 'paying_members', 'sponsored_members', 'active_users',
+    'verified_emails', 'pending', 'yellow', 'green', 'qualified',
+    'qualification_overrides', 'admin_overrides', 'recent_registrations',
+    'assignments_completed', 'assignments_pending',
+)
+
+def live_counters_enabled():
+    return getattr(settings, 'DASHBOARD_STATS_LIVE_COUNTERS', False)
+
+def compute_dashboard_stats():
+    """Count every dashboard figure with one aggregate query per table"""
+    last_week = timezone.now() - timedelta(days=7)
+
+    stats = Profile.objects.aggregate(
+        total_users=Count('id'),
+        paying_members=Count('id', filter=Q(member_type='paying')),
+        sponsored_members=Count('id', filter=Q(member_type='sponsored')),
+        active_users=Count('id', filter=Q(user__is_active=True)),
+        verified_emails=Count('id', filter=Q(verified_email=True)),
+        pending=Count('id', filter=Q(status='pending')),
+        yellow=Count('id', filter=Q(status='yellow')),
+        green=Count('id', filter=Q(status='green')),
+        qualified=Count('id', filter=Q(status='qualified')),
+        qualification_overrides=Count('id', filter=Q(qualification_overridden=True)),
+        admin_overrides=Count('id', filter=Q(admin_promotion_overridden=True)),
+        recent_registrations=Count('id', filter=Q(created_at__gte=last_week))
+    )
+    stats.update(Assignment.objects.aggregate(
+        assignments_completed=Count('id', filter=Q(completed=True)),
+        assignments_pending=Count('id', filter=Q(completed=False))
+    ))
+
+    return stats
+
+def format_dashboard_stats(stats):
+    """Shape flat counters into the dashboard_stats response"""
+    return {
+        'total_users': stats['total_users'],
+        'paying_members': stats['paying_members'],
+        'sponsored_members': stats['sponsored_members'],
+        'active_users': stats['active_users'],
+        'verified_emails': stats['verified_emails'],
+        'status_breakdown': {
+            'pending': stats['pending'],
+            'yellow': stats['yellow'],
+            'green': stats['green'],
+            'qualified': stats['qualified']
+        },
+        'overrides': {
+            'qualification_overrides': stats['qualification_overrides'],
+            'admin_overrides': stats['admin_overrides']
+        },
+        'recent_registrations': stats['recent_registrations'],
+        'assignments': {
+            'completed': stats['assignments_completed'],
+            'pending': stats['assignments_pending']
+        }
+    }
+
+def get_dashboard_stats():
+    """Dashboard figures from the cache, recomputing them when missing"""
+    if live_counters_enabled():
+        return _get_live_stats()
+
+    return get_or_set(
+        STATS_CACHE_KEY,
+        compute_dashboard_stats,
+        getattr(settings, 'DASHBOARD_STATS_CACHE_TTL', 60)
+    )
+
+def _get_live_stats():
+    keys = [LIVE_COUNTER_PREFIX + name for name in STAT_COUNTERS]
+    values = cache.get_many(keys)
+    if len(values) == len(keys):
+        return {name: values[LIVE_COUNTER_PREFIX + name] for name in STAT_COUNTERS}
+
+    # Seed (or reseed) the counters; the reseed interval also bounds how
+    # stale the sliding recent_registrations window can get.
+    stats = compute_dashboard_stats()
+    cache.set_many(
+        {LIVE_COUNTER_PREFIX + name: value for name, value in stats.items()},
+        getattr(settings, 'DASHBOARD_STATS_LIVE_RESEED', 3600)
+    )
+    return stats
+
+def invalidate_dashboard_stats():
+    """Drop cached figures so the next request recomputes them"""
+    cache.delete(STATS_CACHE_KEY)
+    cache.delete_many([LIVE_COUNTER_PREFIX + name for name in STAT_COUNTERS])
+    bump_namespace(STATS_VIEW_NAMESPACE)
+
+def apply_stats_deltas(deltas):
+    """Adjust live counters in place, reseeding if any have expired"""
+    try:
+        for name, delta in deltas.items():
+            if delta:
+                cache.incr(LIVE_COUNTER_PREFIX + name, delta)
+    except ValueError:
+        invalidate_dashboard_stats()
+    else:
+        bump_namespace(STATS_VIEW_NAMESPACE)
+
+def profile_stat_values(member_type, status, verified_email,
+                        qualification_overridden, admin_promotion_overridden):
+    """Which profile counters a profile with these values contributes to"""
+    values = {
+        'paying_members': member_type == 'paying',
+        'sponsored_members': member_type == 'sponsored',
+        'verified_emails': verified_email,
+        'qualification_overrides': qualification_overridden,
+        'admin_overrides': admin_promotion_overridden,
+    }
+    if status in ('pending', 'yellow', 'green', 'qualified'):
+        values[status] = True
+    return {name: int(bool(value)) for name, value in values.items()}
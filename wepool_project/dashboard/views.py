@@ -1,26 +1,59 @@
 # dashboard/views.py - Complete import section
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
-from django.db.models import Q
-from django.http import HttpResponse, JsonResponse
+from django.db.models import Count, Q
+from django.http import FileResponse, Http404, JsonResponse
 from django.contrib.auth.models import User
 from django.db import transaction
 from django.views.decorators.http import require_http_methods
 from django.utils import timezone
 from django.core.exceptions import PermissionDenied
+from django.conf import settings
 from users.models import Profile
-from core.models import Referral, Assignment
+from users.search import annotate_search_rank, autocomplete
+from core.cache import cache_view
+from core.dirty_fields import form_update_fields
+from core.instrumentation import reset_timings, timing_percentiles
+from core.jobs import enqueue_job
+from core.models import Referral, Assignment, Job, QueueClaim
+from core.pagination import keyset_paginate
+from .bulk import BULK_ACTIONS, run_bulk_action
+from .exports import EXPORT_FORMATS, export_format_choices, export_response
+from .matching import (
+    MANUAL_ASSIGN_CHOICES,
+    MATCH_PREVIEW_ROWS,
+    assign_pairs,
+    describe_pairs,
+    match_members,
+    pif_queue,
+    yellow_queue
+)
+from .queues import (
+    CLAIM_BATCH_SIZE,
+    MAX_CLAIM_BATCH_SIZE,
+    WORK_QUEUES,
+    claim_batch,
+    claimed_members,
+    complete_claims,
+    queue_metrics,
+    release_claims,
+    renew_claims
+)
+from .utils import STATS_VIEW_NAMESPACE, format_dashboard_stats, get_dashboard_stats
 from .forms import (
     AdminUserEditForm,
     AdminProfileEditForm,
+    AutoAssignForm,
+    BulkActionForm,
     ProfileFilterForm,
+    export_queryset,
     UserDeleteForm,
     QualificationOverrideForm
 )
-import csv
 import json
-from datetime import datetime, timedelta
+import uuid
 
 @staff_member_required
 def admin_dashboard(request):
@@ -29,41 +62,56 @@ def admin_dashboard(request):
 
 @staff_member_required
 def view_all_users(request):
-    """View all users with filtering and override status"""
+    """View all users with filtering, server-side sorting and keyset pages"""
     form = ProfileFilterForm(request.GET)
     profiles = Profile.objects.select_related('user', 'overridden_by', 'admin_overridden_by').all()
+    sort = 'newest'
+    page_size = 50
 
     if form.is_valid():
-        # Apply filters
-        if form.cleaned_data['member_type']:
-            profiles = profiles.filter(member_type=form.cleaned_data['member_type'])
-
-        if form.cleaned_data['status']:
-            profiles = profiles.filter(status=form.cleaned_data['status'])
-
-        # Override status filter
-        if form.cleaned_data.get('override_status'):
-            override_status = form.cleaned_data['override_status']
-            if override_status == 'overridden':
-                profiles = profiles.filter(qualification_overridden=True)
-            elif override_status == 'normal':
-                profiles = profiles.filter(qualification_overridden=False)
-            elif override_status == 'admin_overridden':
-                profiles = profiles.filter(admin_promotion_overridden=True)
-
-        if form.cleaned_data['search']:
-            search_term = form.cleaned_data['search']
-            profiles = profiles.filter(
-                Q(user__first_name__icontains=search_term) |
-                Q(user__last_name__icontains=search_term) |
-                Q(user__email__icontains=search_term) |
-                Q(user__username__icontains=search_term) |
-                Q(phone__icontains=search_term)
-            )
+        profiles = form.filter_queryset(profiles)
+        sort = form.cleaned_data['sort'] or sort
+        page_size = form.cleaned_data['page_size'] or page_size
+
+        # Best Match only means something while searching
+        if sort == 'relevance':
+            if form.cleaned_data['search']:
+                profiles = annotate_search_rank(profiles, form.cleaned_data['search'])
+            else:
+                sort = 'newest'
+
+    # Summary figures for the whole filtered set in one aggregate query
+    summary = profiles.order_by().aggregate(
+        total=Count('id'),
+        verified_emails=Count('id', filter=Q(verified_email=True)),
+        tacconnector=Count('id', filter=Q(registered_tacconnector=True)),
+        overrides=Count('id', filter=Q(qualification_overridden=True))
+    )
+
+    page, next_cursor = keyset_paginate(
+        profiles,
+        ProfileFilterForm.SORT_ORDERINGS[sort],
+        cursor=request.GET.get('cursor'),
+        page_size=page_size,
+        key=sort
+    )
+
+    next_page_url = first_page_url = None
+    params = request.GET.copy()
+    if next_cursor:
+        params['cursor'] = next_cursor
+        next_page_url = '?' + params.urlencode()
+    if request.GET.get('cursor'):
+        params.pop('cursor', None)
+        first_page_url = '?' + params.urlencode()
 
     return render(request, 'dashboard/view_all_users.html', {
-        'profiles': profiles,
-        'form': form
+        'profiles': page,
+        'form': form,
+        'export_formats': export_format_choices(),
+        'summary': summary,
+        'next_page_url': next_page_url,
+        'first_page_url': first_page_url
     })
 
 @staff_member_required
@@ -80,7 +128,8 @@ def edit_user(request, profile_id):
             try:
                 with transaction.atomic():
                     # Save user information
-                    updated_user = user_form.save()
+                    updated_user = user_form.save(commit=False)
+                    updated_user.save(update_fields=form_update_fields(user_form))
 
                     # Handle profile save with override tracking
                     updated_profile = profile_form.save(commit=False)
@@ -101,7 +150,7 @@ def edit_user(request, profile_id):
                         # If admin promotion is overridden, promote to staff
                         if updated_profile.admin_promotion_overridden:
                             updated_user.is_staff = True
-                            updated_user.save()
+                            updated_user.save(update_fields=['is_staff'])
                             messages.info(request, f'Admin promotion override applied - user promoted to staff')
 
                     # Save the profile
@@ -192,7 +241,9 @@ def quick_override(request, profile_id):
                         profile.override_reason = reason
                         profile.overridden_by = request.user
                         profile.override_date = timezone.now()
-                        profile.save()
+                        profile.save(update_fields=[
+                            'qualification_overridden', 'override_reason', 'overridden_by', 'override_date'
+                        ])
 
                         messages.success(request, f'Qualification override applied for {profile.user.get_full_name()}')
 
@@ -204,8 +255,11 @@ def quick_override(request, profile_id):
 
                         # Promote to staff
                         profile.user.is_staff = True
-                        profile.user.save()
-                        profile.save()
+                        profile.user.save(update_fields=['is_staff'])
+                        profile.save(update_fields=[
+                            'admin_promotion_overridden', 'admin_override_reason',
+                            'admin_overridden_by', 'admin_override_date'
+                        ])
 
                         messages.success(request, f'Admin promotion override applied for {profile.user.get_full_name()}')
 
@@ -239,7 +293,9 @@ def remove_override(request, profile_id):
                     profile.override_reason = ''
                     profile.overridden_by = None
                     profile.override_date = None
-                    profile.save()
+                    profile.save(update_fields=[
+                        'qualification_overridden', 'override_reason', 'overridden_by', 'override_date'
+                    ])
 
                     # Re-check qualifications
                     profile.check_yellow_qualification()
@@ -259,10 +315,13 @@ def remove_override(request, profile_id):
                     # Check if user should still be admin based on normal qualifications
                     if not profile.can_be_promoted_to_admin():
                         profile.user.is_staff = False
-                        profile.user.save()
+                        profile.user.save(update_fields=['is_staff'])
                         messages.info(request, f'Admin status removed - user no longer meets qualification requirements')
 
-                    profile.save()
+                    profile.save(update_fields=[
+                        'admin_promotion_overridden', 'admin_override_reason',
+                        'admin_overridden_by', 'admin_override_date'
+                    ])
                     messages.success(request, f'Admin promotion override removed for {profile.user.get_full_name()}')
 
         except Exception as e:
@@ -342,105 +401,189 @@ def delete_user(request, profile_id):
 
 # Keep existing views with minor updates for override information
 
+def _claim_size(value):
+    """Parse a requested claim batch size, clamped to MAX_CLAIM_BATCH_SIZE"""
+    try:
+        return max(1, min(int(value), MAX_CLAIM_BATCH_SIZE))
+    except (TypeError, ValueError):
+        return CLAIM_BATCH_SIZE
+
+def _bounded_hours(value):
+    """Parse a throughput window in hours, at most 30 days"""
+    try:
+        return max(1, min(int(value), 24 * 30))
+    except (TypeError, ValueError):
+        return None
+
+def _work_queue_page(request, queue, template):
+    """Render the members of a work queue this admin has claimed
+
+    Admins claim batches of the oldest unclaimed members instead of every
+    admin working through the full list; POSTs claim, renew or release.
+    """
+    if request.method == 'POST':
+        action = request.POST.get('action')
+        if action == 'claim':
+            claimed = claim_batch(queue, request.user, _claim_size(request.POST.get('size')))
+            if claimed:
+                messages.success(request, f'Claimed {len(claimed)} members')
+            else:
+                messages.info(request, 'No unclaimed members are waiting')
+        elif action == 'renew':
+            messages.success(request, f'Renewed {renew_claims(queue, request.user)} claims')
+        elif action == 'release':
+            messages.info(request, f'Released {release_claims(queue, request.user)} members')
+        return redirect(request.path)
+
+    profiles = claimed_members(queue, request.user).select_related('user', 'overridden_by')
+    return render(request, template, {
+        'profiles': profiles,
+        'queue': dict(
+            queue_metrics(queues=[queue])['queues'][queue],
+            name=queue,
+            claim_size=CLAIM_BATCH_SIZE,
+            max_claim_size=MAX_CLAIM_BATCH_SIZE,
+            lease_minutes=settings.QUEUE_LEASE_SECONDS // 60
+        )
+    })
+
 @staff_member_required
 def paying_queue(request):
     """Paying members queue with override status"""
-    paying_profiles = Profile.objects.filter(
-        member_type='paying',
-        status='pending'
-    ).select_related('user', 'overridden_by')
-
-    return render(request, 'dashboard/paying_queue.html', {
-        'profiles': paying_profiles
-    })
+    return _work_queue_page(request, 'paying', 'dashboard/paying_queue.html')
 
 @staff_member_required
 def sponsored_queue(request):
     """Sponsored members queue with override status"""
-    sponsored_profiles = Profile.objects.filter(
-        member_type='sponsored',
-        status='pending'
-    ).select_related('user', 'overridden_by')
-
-    return render(request, 'dashboard/sponsored_queue.html', {
-        'profiles': sponsored_profiles
-    })
+    return _work_queue_page(request, 'sponsored', 'dashboard/sponsored_queue.html')
 
 @staff_member_required
 def yellow_members(request):
     """Yellow members with override status"""
-    yellow_profiles = Profile.objects.filter(
-        status='yellow',
-        paid_for_sponsored=False
-    ).select_related('user', 'overridden_by')
-
-    return render(request, 'dashboard/yellow_members.html', {
-        'profiles': yellow_profiles
-    })
+    return _work_queue_page(request, 'yellow', 'dashboard/yellow_members.html')
 
 @staff_member_required
 def qualified_sponsored(request):
     """Qualified sponsored members with override status"""
-    qualified_profiles = Profile.objects.filter(
-        member_type='sponsored',
-        status='qualified',
-        paid_for_self=False
-    ).select_related('user', 'overridden_by')
-
-    return render(request, 'dashboard/qualified_sponsored.html', {
-        'profiles': qualified_profiles
+    return _work_queue_page(request, 'qualified_sponsored', 'dashboard/qualified_sponsored.html')
+
+@staff_member_required
+def work_queue_api(request, queue):
+    """JSON claiming API for a work queue
+
+    GET lists the caller's claimed members; POST with action=claim (and
+    size), renew, release or complete (with profile_ids for the last two,
+    release defaulting to everything held).
+    """
+    if queue not in WORK_QUEUES:
+        raise Http404('Unknown queue')
+
+    if request.method == 'POST':
+        action = request.POST.get('action')
+        selected = request.POST.get('profile_ids', '').split(',')
+        profile_ids = [int(pk) for pk in selected if pk.isdigit()]
+        if action == 'claim':
+            result = {'claimed': claim_batch(queue, request.user, _claim_size(request.POST.get('size')))}
+        elif action == 'renew':
+            result = {'renewed': renew_claims(queue, request.user)}
+        elif action == 'release':
+            result = {'released': release_claims(queue, request.user, profile_ids or None)}
+        elif action == 'complete':
+            result = {'completed': complete_claims(request.user, profile_ids, queue=queue)}
+        else:
+            return JsonResponse({'success': False, 'error': f'Unknown action: {action}'}, status=400)
+        return JsonResponse({'success': True, **result})
+
+    claims = QueueClaim.objects.filter(
+        queue=queue,
+        claimed_by=request.user,
+        profile__in=claimed_members(queue, request.user)
+    ).select_related('profile__user').order_by('claimed_at', 'id')
+    return JsonResponse({
+        'queue': queue,
+        'members': [
+            {
+                'id': claim.profile_id,
+                'name': claim.profile.user.get_full_name(),
+                'phone': claim.profile.phone,
+                'claimed_at': claim.claimed_at.isoformat(),
+                'lease_expires_at': claim.lease_expires_at.isoformat(),
+                'url': reverse('edit_user', args=[claim.profile_id])
+            }
+            for claim in claims
+        ]
     })
 
+@staff_member_required
+def work_queue_metrics(request):
+    """Waiting, in-progress and items/hour figures for every work queue"""
+    return JsonResponse(queue_metrics(_bounded_hours(request.GET.get('hours'))))
+
 @staff_member_required
 def assign_members(request):
-    """Assign yellow to sponsored members"""
-    if request.method == 'POST':
+    """Assign yellow to sponsored members, one pair at a time or in bulk"""
+    auto_form = AutoAssignForm(request.POST or None)
+    preview = None
+    # Set per rendered form, so a resubmitted or retried POST is applied once
+    submission_key = request.POST.get('submission_key', '')[:64] or None
+
+    if request.method == 'POST' and request.POST.get('action') in ('preview', 'auto_assign'):
+        if auto_form.is_valid():
+            is_preview = request.POST['action'] == 'preview'
+            try:
+                result = match_members(
+                    auto_form.cleaned_data['strategy'],
+                    limit=auto_form.cleaned_data['limit'],
+                    preview=is_preview,
+                    key=submission_key,
+                    user=request.user
+                )
+            except Exception as e:
+                messages.error(request, f'Error matching members: {str(e)}')
+                return redirect('assign_members')
+
+            if is_preview:
+                preview = dict(result, rows=describe_pairs(result['pairs'][:MATCH_PREVIEW_ROWS]))
+            elif result['replayed']:
+                messages.info(request, f"Already submitted: {len(result['pairs'])} pairs were assigned")
+                return redirect('assign_members')
+            else:
+                messages.success(
+                    request,
+                    f"Assigned {len(result['pairs'])} pairs in {result['elapsed_ms']} ms "
+                    f"({result['ms_per_1000_pairs']} ms per 1000 pairs)"
+                    if result['pairs'] else 'No members could be paired'
+                )
+                return redirect('assign_members')
+
+    elif request.method == 'POST':
         yellow_id = request.POST.get('yellow_member')
         sponsored_id = request.POST.get('sponsored_member')
 
         if yellow_id and sponsored_id:
             try:
-                with transaction.atomic():
-                    yellow = get_object_or_404(Profile, id=yellow_id)
-                    sponsored = get_object_or_404(Profile, id=sponsored_id)
-
-                    # Create assignment
-                    assignment = Assignment.objects.create(
-                        yellow_member=yellow,
-                        sponsored_member=sponsored
-                    )
-
-                    # Update statuses
-                    yellow.paid_for_sponsored = True
-                    yellow.save()
-
-                    sponsored.status = 'green'
-                    sponsored.paid_for_self = True
-                    sponsored.save()
-
-                    assignment.completed = True
-                    assignment.save()
-
-                messages.success(
-                    request,
-                    f'Successfully assigned {yellow.user.get_full_name()} to sponsor {sponsored.user.get_full_name()}'
+                pairs, replayed = assign_pairs(
+                    [(int(yellow_id), int(sponsored_id))], key=submission_key, user=request.user
                 )
+                if replayed:
+                    messages.info(request, 'This assignment was already submitted')
+                elif pairs:
+                    pair = describe_pairs(pairs)[0]
+                    messages.success(
+                        request,
+                        f"Successfully assigned {pair['yellow']['name']} to sponsor {pair['pif']['name']}"
+                    )
+                else:
+                    messages.error(request, 'Those members are no longer waiting, or another admin is assigning them')
             except Exception as e:
                 messages.error(request, f'Error creating assignment: {str(e)}')
 
             return redirect('assign_members')
 
-    # Get available members
-    yellow_members = Profile.objects.filter(
-        status='yellow',
-        paid_for_sponsored=False
-    ).select_related('user')
-
-    sponsored_members = Profile.objects.filter(
-        member_type='sponsored',
-        status='qualified',
-        paid_for_self=False
-    ).select_related('user')
+    # The longest-waiting members of each queue for manual assignment
+    member_fields = ('id', 'phone', 'user__first_name', 'user__last_name')
+    yellow_members = yellow_queue().select_related('user').only(*member_fields)[:MANUAL_ASSIGN_CHOICES]
+    sponsored_members = pif_queue().select_related('user').only(*member_fields)[:MANUAL_ASSIGN_CHOICES]
 
     # Get recent assignments
     assignments = Assignment.objects.filter(
@@ -450,6 +593,11 @@ def assign_members(request):
     return render(request, 'dashboard/assign_members.html', {
         'yellow_members': yellow_members,
         'sponsored_members': sponsored_members,
+        'waiting_yellow': yellow_queue().count(),
+        'waiting_pif': pif_queue().count(),
+        'auto_form': auto_form,
+        'preview': preview,
+        'submission_key': uuid.uuid4().hex,
         'assignments': assignments
     })
 
@@ -458,181 +606,107 @@ def export_data(request):
     """Export data with override information"""
     if request.method == 'POST':
         export_type = request.POST.get('export_type', 'csv')
+        compress = request.POST.get('compress') == 'gzip'
+
+        # Selected users from the bulk action on the users page
+        selected_ids = request.POST.getlist('selected_ids[]')
+
+        if export_type in EXPORT_FORMATS and request.POST.get('background'):
+            job = enqueue_job('export', {
+                'export_format': export_type,
+                'filters': {name: request.POST.get(name, '') for name in ProfileFilterForm.base_fields},
+                'selected_ids': selected_ids,
+                'compress': compress
+            }, request.user)
+            return redirect('job_detail', job_id=job.id)
+
+        if export_type in EXPORT_FORMATS:
+            return export_response(
+                export_queryset(request.POST, selected_ids),
+                export_type,
+                compress=compress
+            )
 
-        if export_type == 'csv':
-            response = HttpResponse(content_type='text/csv')
-            response['Content-Disposition'] = 'attachment; filename="wepool_users_with_overrides.csv"'
-
-            writer = csv.writer(response)
-            writer.writerow([
-                'Username', 'Email', 'First Name', 'Last Name', 'Phone',
-                'Member Type', 'Status', 'Referrer Phone', 'Verified Email',
-                'Registered TechConnect', 'TechConnect Link', 'Is Active', 'Is Staff',
-                'Qualification Overridden', 'Override Reason', 'Overridden By',
-                'Admin Promotion Overridden', 'Admin Override Reason', 'Admin Override By',
-                'Created At', 'Updated At'
-            ])
-
-            profiles = Profile.objects.select_related('user', 'overridden_by', 'admin_overridden_by').all()
-            for profile in profiles:
-                writer.writerow([
-                    profile.user.username,
-                    profile.user.email,
-                    profile.user.first_name,
-                    profile.user.last_name,
-                    profile.phone,
-                    profile.member_type,
-                    profile.status,
-                    profile.referrer_phone or '',
-                    profile.verified_email,
-                    profile.registered_techconnect,
-                    profile.techconnect_link or '',
-                    profile.user.is_active,
-                    profile.user.is_staff,
-                    profile.qualification_overridden,
-                    profile.override_reason or '',
-                    profile.overridden_by.username if profile.overridden_by else '',
-                    profile.admin_promotion_overridden,
-                    profile.admin_override_reason or '',
-                    profile.admin_overridden_by.username if profile.admin_overridden_by else '',
-                    profile.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                    profile.updated_at.strftime('%Y-%m-%d %H:%M:%S')
-                ])
-
-            return response
-
-        elif export_type == 'sql':
-            response = HttpResponse(content_type='text/plain')
-            response['Content-Disposition'] = 'attachment; filename="wepool_users_with_overrides.sql"'
-
-            sql_statements = []
-            profiles = Profile.objects.select_related('user', 'overridden_by', 'admin_overridden_by').all()
-
-            for profile in profiles:
-                sql = f"""INSERT INTO profiles (username, email, first_name, last_name, phone, member_type, status, referrer_phone, verified_email, registered_techconnect, techconnect_link, is_active, is_staff, qualification_overridden, override_reason, overridden_by, admin_promotion_overridden, admin_override_reason, admin_override_by, created_at, updated_at) VALUES ('{profile.user.username}', '{profile.user.email}', '{profile.user.first_name}', '{profile.user.last_name}', '{profile.phone}', '{profile.member_type}', '{profile.status}', '{profile.referrer_phone or "NULL"}', {profile.verified_email}, {profile.registered_techconnect}, '{profile.techconnect_link or "NULL"}', {profile.user.is_active}, {profile.user.is_staff}, {profile.qualification_overridden}, '{profile.override_reason or "NULL"}', '{profile.overridden_by.username if profile.overridden_by else "NULL"}', {profile.admin_promotion_overridden}, '{profile.admin_override_reason or "NULL"}', '{profile.admin_overridden_by.username if profile.admin_overridden_by else "NULL"}', '{profile.created_at}', '{profile.updated_at}');"""
-                sql_statements.append(sql)
-
-            response.write('\n'.join(sql_statements))
-            return response
-
-    return render(request, 'dashboard/export_data.html')
+        messages.error(request, f'Unknown export format: {export_type}')
+
+    return render(request, 'dashboard/export_data.html', {
+        'form': ProfileFilterForm(request.GET or None),
+        'export_formats': export_format_choices()
+    })
 
 @staff_member_required
+@cache_view(STATS_VIEW_NAMESPACE, settings.DASHBOARD_STATS_CACHE_TTL)
 def dashboard_stats(request):
     """API endpoint for dashboard statistics with override information"""
-    from django.db.models import Count, Q
-
-    # Get statistics
-    total_users = Profile.objects.count()
-    paying_members = Profile.objects.filter(member_type='paying').count()
-    sponsored_members = Profile.objects.filter(member_type='sponsored').count()
-
-    # Status counts
-    pending_count = Profile.objects.filter(status='pending').count()
-    yellow_count = Profile.objects.filter(status='yellow').count()
-    green_count = Profile.objects.filter(status='green').count()
-    qualified_count = Profile.objects.filter(status='qualified').count()
-
-    # Override counts
-    qualification_overrides = Profile.objects.filter(qualification_overridden=True).count()
-    admin_overrides = Profile.objects.filter(admin_promotion_overridden=True).count()
-
-    # Recent registrations (last 7 days)
-    last_week = datetime.now() - timedelta(days=7)
-    recent_registrations = Profile.objects.filter(
-        created_at__gte=last_week
-    ).count()
-
-    # Assignment statistics
-    total_assignments = Assignment.objects.filter(completed=True).count()
-    pending_assignments = Assignment.objects.filter(completed=False).count()
-
-    # Active users
-    active_users = Profile.objects.filter(user__is_active=True).count()
-    verified_emails = Profile.objects.filter(verified_email=True).count()
-
-    data = {
-        'total_users': total_users,
-        'paying_members': paying_members,
-        'sponsored_members': sponsored_members,
-        'active_users': active_users,
-        'verified_emails': verified_emails,
-        'status_breakdown': {
-            'pending': pending_count,
-            'yellow': yellow_count,
-            'green': green_count,
-            'qualified': qualified_count
-        },
-        'overrides': {
-            'qualification_overrides': qualification_overrides,
-            'admin_overrides': admin_overrides
-        },
-        'recent_registrations': recent_registrations,
-        'assignments': {
-            'completed': total_assignments,
-            'pending': pending_assignments
-        }
-    }
+    return JsonResponse(format_dashboard_stats(get_dashboard_stats()))
+
+@staff_member_required
+@require_http_methods(["GET", "POST"])
+def request_timings(request):
+    """Rolling per-view latency and query percentiles; POST clears them"""
+    if request.method == 'POST':
+        reset_timings()
+    return JsonResponse({'views': timing_percentiles()})
 
-    return JsonResponse(data)
+@staff_member_required
+def user_autocomplete(request):
+    """Ranked name/email/username/phone suggestions for the user search box"""
+    results = [
+        {
+            'id': profile.id,
+            'name': profile.user.get_full_name(),
+            'username': profile.user.username,
+            'email': profile.user.email,
+            'phone': profile.phone,
+            'url': reverse('edit_user', args=[profile.id])
+        }
+        for profile in autocomplete(request.GET.get('q', ''))
+    ]
+    return JsonResponse({'results': results})
 
 @staff_member_required
 @require_http_methods(["POST"])
 def bulk_update_status(request):
     """Bulk update user statuses and other bulk actions"""
-    profile_ids = request.POST.getlist('profile_ids[]')
-    action = request.POST.get('action')
-    new_status = request.POST.get('new_status')
+    # A single comma-separated field keeps large selections under
+    # DATA_UPLOAD_MAX_NUMBER_FIELDS; profile_ids[] is still accepted
+    selected = request.POST.get('profile_ids', '').split(',') + request.POST.getlist('profile_ids[]')
+    profile_ids = [int(pk) for pk in selected if pk.isdigit()]
 
     if not profile_ids:
         return JsonResponse({'success': False, 'error': 'No users selected'})
 
-    try:
-        with transaction.atomic():
-            if action == 'toggle_active':
-                # Toggle active status for selected users
-                updated_count = 0
-                for profile_id in profile_ids:
-                    try:
-                        profile = Profile.objects.get(id=profile_id)
-                        profile.user.is_active = not profile.user.is_active
-                        profile.user.save()
-                        updated_count += 1
-                    except Profile.DoesNotExist:
-                        pass
-
-                return JsonResponse({
-                    'success': True,
-                    'updated_count': updated_count
-                })
-
-            elif new_status:
-                # Update status for selected profiles
-                updated_count = Profile.objects.filter(
-                    id__in=profile_ids
-                ).update(status=new_status)
-
-                # Check qualifications for updated profiles (respect overrides)
-                for profile_id in profile_ids:
-                    try:
-                        profile = Profile.objects.get(id=profile_id)
-                        if not profile.qualification_overridden:
-                            profile.check_yellow_qualification()
-                            profile.check_sponsored_qualification()
-                    except Profile.DoesNotExist:
-                        pass
-
-                return JsonResponse({
-                    'success': True,
-                    'updated_count': updated_count
-                })
-
-            else:
-                return JsonResponse({'success': False, 'error': 'No valid action specified'})
+    # The status button posts only new_status
+    form = BulkActionForm({
+        'action': request.POST.get('action') or ('update_status' if request.POST.get('new_status') else ''),
+        'new_status': request.POST.get('new_status')
+    })
+    if not form.is_valid() or form.cleaned_data['action'] not in BULK_ACTIONS:
+        return JsonResponse({'success': False, 'error': 'No valid action specified'})
+
+    if request.POST.get('background'):
+        job = enqueue_job('bulk_action', {
+            'action': form.cleaned_data['action'],
+            'profile_ids': profile_ids,
+            'new_status': form.cleaned_data['new_status']
+        }, request.user)
+        return JsonResponse({
+            'success': True,
+            'job_id': job.id,
+            'status_url': reverse('job_status', args=[job.id])
+        })
 
+    try:
+        result = run_bulk_action(
+            form.cleaned_data['action'],
+            profile_ids,
+            new_status=form.cleaned_data['new_status']
+        )
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)})
 
+    return JsonResponse({'success': True, **result})
+
 @staff_member_required
 def process_yellow_queue(request):
     """Process yellow members to check their qualification"""
@@ -646,13 +720,16 @@ def process_yellow_queue(request):
 
                 if action == 'approve':
                     profile.status = 'yellow'
-                    profile.save()
+                    profile.save(update_fields=['status'])
                     messages.success(request, f'{profile.user.get_full_name()} approved as Yellow member')
                 elif action == 'reject':
                     profile.status = 'pending'
-                    profile.save()
+                    profile.save(update_fields=['status'])
                     messages.warning(request, f'{profile.user.get_full_name()} status reverted to pending')
 
+                # Processing a member finishes this admin's claims on it
+                complete_claims(request.user, [profile.id])
+
             except Exception as e:
                 messages.error(request, f'Error processing request: {str(e)}')
 
@@ -698,7 +775,9 @@ def quick_override(request, profile_id):
                         profile.override_reason = reason
                         profile.overridden_by = request.user
                         profile.override_date = timezone.now()
-                        profile.save()
+                        profile.save(update_fields=[
+                            'qualification_overridden', 'override_reason', 'overridden_by', 'override_date'
+                        ])
 
                         messages.success(request, f'Qualification override applied for {profile.user.get_full_name()}')
 
@@ -710,8 +789,11 @@ def quick_override(request, profile_id):
 
                         # Promote to staff
                         profile.user.is_staff = True
-                        profile.user.save()
-                        profile.save()
+                        profile.user.save(update_fields=['is_staff'])
+                        profile.save(update_fields=[
+                            'admin_promotion_overridden', 'admin_override_reason',
+                            'admin_overridden_by', 'admin_override_date'
+                        ])
 
                         messages.success(request, f'Admin promotion override applied for {profile.user.get_full_name()}')
 
@@ -745,7 +827,9 @@ def remove_override(request, profile_id):
                     profile.override_reason = ''
                     profile.overridden_by = None
                     profile.override_date = None
-                    profile.save()
+                    profile.save(update_fields=[
+                        'qualification_overridden', 'override_reason', 'overridden_by', 'override_date'
+                    ])
 
                     # Re-check qualifications
                     profile.check_yellow_qualification()
@@ -765,13 +849,63 @@ def remove_override(request, profile_id):
                     # Check if user should still be admin based on normal qualifications
                     if not profile.can_be_promoted_to_admin():
                         profile.user.is_staff = False
-                        profile.user.save()
+                        profile.user.save(update_fields=['is_staff'])
                         messages.info(request, f'Admin status removed - user no longer meets qualification requirements')
 
-                    profile.save()
+                    profile.save(update_fields=[
+                        'admin_promotion_overridden', 'admin_override_reason',
+                        'admin_overridden_by', 'admin_override_date'
+                    ])
                     messages.success(request, f'Admin promotion override removed for {profile.user.get_full_name()}')
 
         except Exception as e:
             messages.error(request, f'Error removing override: {str(e)}')
 
     return redirect('edit_user', profile_id=profile.id)
+
+@staff_member_required
+@require_http_methods(["POST"])
+def qualification_sweep(request):
+    """Queue a run of every qualification rule"""
+    job = enqueue_job('qualification_sweep', {'dry_run': bool(request.POST.get('dry_run'))}, request.user)
+    return redirect('job_detail', job_id=job.id)
+
+def _job_payload(job):
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'progress': job.progress,
+        'total': job.total,
+        'percent': job.percent,
+        'result': job.result,
+        'error': job.error,
+        'download_url': reverse('job_download', args=[job.id]) if job.result_file else None,
+        'created_at': job.created_at,
+        'finished_at': job.finished_at
+    }
+
+@staff_member_required
+def job_detail(request, job_id):
+    """Progress page for a background job"""
+    job = get_object_or_404(Job, id=job_id)
+    return render(request, 'dashboard/job_detail.html', {'job': job})
+
+@staff_member_required
+def job_status(request, job_id):
+    """API endpoint polled for a background job's progress"""
+    job = get_object_or_404(Job, id=job_id)
+    return JsonResponse(_job_payload(job))
+
+@staff_member_required
+def job_download(request, job_id):
+    """Download the file a finished job produced"""
+    job = get_object_or_404(Job, id=job_id, status='succeeded')
+    if not job.result_file:
+        raise Http404('This job has no file to download')
+    return FileResponse(
+        job.result_file.open('rb'),
+        as_attachment=True,
+        filename=job.result.get('filename') or job.result_file.name.rsplit('/', 1)[-1],
+        content_type=job.result_content_type or None
+    )
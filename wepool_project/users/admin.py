@@ -3,7 +3,9 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
 from django.utils import timezone
+from import_export.admin import ImportMixin
 from .models import Profile
+from .resources import MemberResource
 
 class ProfileInline(admin.StackedInline):
     model = Profile
@@ -74,7 +76,9 @@ admin.site.unregister(User)
 admin.site.register(User, UserAdmin)
 
 @admin.register(Profile)
-class ProfileAdmin(admin.ModelAdmin):
+class ProfileAdmin(ImportMixin, admin.ModelAdmin):
+    # Bulk member imports with a dry-run preview; see MemberResource
+    resource_classes = [MemberResource]
     list_display = (
         'user', 'phone', 'member_type_display', 'status', 'verified_email',
         'registered_tacconnector', 'qualification_overridden', 'admin_promotion_overridden', 'created_at'  # Updated field name
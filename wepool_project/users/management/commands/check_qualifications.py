@@ -1,39 +1,42 @@
 # Management command for checking qualifications
 
-from django.core.management.base import BaseCommand
-from users.models import Profile
+from django.core.management.base import BaseCommand, CommandError
+from users.qualifications import run_qualification_rules
 
 class Command(BaseCommand):
     help = 'Check and update qualifications for all users'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report how many profiles would change without updating them'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of profiles to update per statement'
+        )
+
     def handle(self, *args, **options):
-        # Check yellow qualifications
-        pending_profiles = Profile.objects.filter(status='pending')
-        yellow_qualified = 0
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
 
-        for profile in pending_profiles:
-            if profile.check_yellow_qualification():
-                yellow_qualified += 1
+        dry_run = options['dry_run']
+        counts = run_qualification_rules(
+            batch_size=options['batch_size'],
+            dry_run=dry_run
+        )
+        verb = 'Would update' if dry_run else 'Updated'
 
         self.stdout.write(
             self.style.SUCCESS(
-                f'Updated {yellow_qualified} profiles to Yellow status'
+                f"{verb} {counts['yellow']} profiles to Yellow status"
             )
         )
-
-        # Check sponsored qualifications
-        sponsored_profiles = Profile.objects.filter(
-            member_type='sponsored',
-            status__in=['pending', 'yellow']
-        )
-        sponsored_qualified = 0
-
-        for profile in sponsored_profiles:
-            if profile.check_sponsored_qualification():
-                sponsored_qualified += 1
-
         self.stdout.write(
             self.style.SUCCESS(
-                f'Updated {sponsored_qualified} sponsored members to Qualified status'
+                f"{verb} {counts['sponsored_qualified']} sponsored members to Qualified status"
             )
         )
@@ -0,0 +1,68 @@
+# Management command for bulk member imports from CSV or XLSX
+
+import os
+from django.core.management.base import BaseCommand, CommandError
+from import_export.formats.base_formats import CSV, XLSX
+from import_export.results import RowResult
+from users.resources import MemberResource
+
+FORMATS = {'csv': CSV, 'xlsx': XLSX}
+
+class Command(BaseCommand):
+    help = 'Import members (users, profiles and referrals) from a CSV or XLSX file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import')
+        parser.add_argument(
+            '--format',
+            choices=sorted(FORMATS),
+            help='File format (defaults to the file extension)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would change without saving anything'
+        )
+
+    def handle(self, *args, **options):
+        name = options['format'] or os.path.splitext(options['path'])[1].lstrip('.').lower()
+        if name not in FORMATS:
+            raise CommandError(f'Unsupported format: {name or "unknown"}')
+        file_format = FORMATS[name]()
+        if not file_format.is_available():
+            raise CommandError(f'{name} imports need an extra package (e.g. openpyxl for xlsx)')
+
+        mode = 'rb' if file_format.is_binary() else 'r'
+        with open(options['path'], mode) as source:
+            dataset = file_format.create_dataset(source.read())
+
+        resource = MemberResource()
+        result = resource.import_data(dataset, dry_run=options['dry_run'])
+
+        for number, import_type, phone, changes in resource.changes:
+            self.stdout.write(f'Row {number}: {import_type} {phone}')
+            for column, (old, new) in changes.items():
+                self.stdout.write(f'    {column}: {old!r} -> {new!r}')
+        for invalid in result.invalid_rows:
+            self.stdout.write(self.style.WARNING(f'Row {invalid.number}: invalid {invalid.error_dict}'))
+        for number, errors in result.row_errors():
+            for error in errors:
+                self.stdout.write(self.style.ERROR(f'Row {number}: {error.error}'))
+        for error in result.base_errors:
+            self.stdout.write(self.style.ERROR(str(error.error)))
+        if resource.unmatched_referrers:
+            self.stdout.write(self.style.WARNING(
+                f'No referrer found for: {", ".join(resource.unmatched_referrers)}'
+            ))
+
+        totals = result.totals
+        verb = 'Would import' if options['dry_run'] else 'Imported'
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {totals[RowResult.IMPORT_TYPE_NEW]} new and "
+                f"{totals[RowResult.IMPORT_TYPE_UPDATE]} updated members "
+                f"({totals[RowResult.IMPORT_TYPE_SKIP]} unchanged, "
+                f"{totals[RowResult.IMPORT_TYPE_INVALID]} invalid, "
+                f"{totals[RowResult.IMPORT_TYPE_ERROR]} errors)"
+            )
+        )
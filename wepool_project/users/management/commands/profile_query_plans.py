@@ -0,0 +1,109 @@
+# Management command for comparing Profile query plans with and without indexes
+
+import random
+import statistics
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from users.models import Profile
+
+# The dashboard and registration queries the Profile indexes are designed for
+HOT_QUERIES = [
+    ('paying_queue', lambda: Profile.objects.filter(member_type='paying', status='pending')),
+    ('sponsored_queue', lambda: Profile.objects.filter(member_type='sponsored', status='pending')),
+    ('yellow_members', lambda: Profile.objects.filter(status='yellow', paid_for_sponsored=False)),
+    ('qualified_sponsored', lambda: Profile.objects.filter(
+        member_type='sponsored', status='qualified', paid_for_self=False
+    )),
+    ('view_all_users', lambda: Profile.objects.order_by('-created_at', '-id')),
+    ('referred_by_phone', lambda: Profile.objects.filter(referrer_phone='0000000001')),
+    ('qualification_overrides', lambda: Profile.objects.filter(
+        qualification_overridden=True
+    ).order_by('-override_date')),
+]
+
+class Rollback(Exception):
+    pass
+
+class Command(BaseCommand):
+    help = 'Show query plans and timings for the hot Profile queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Create this many synthetic profiles before measuring'
+        )
+        parser.add_argument(
+            '--compare',
+            action='store_true',
+            help='Also measure with the Profile indexes dropped (rolled back afterwards)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Number of timed runs per query'
+        )
+
+    def handle(self, *args, **options):
+        if options['compare'] and not connection.features.can_rollback_ddl:
+            raise CommandError(
+                f'--compare needs transactional DDL, which {connection.vendor} does not support'
+            )
+        if options['seed']:
+            self.seed(options['seed'])
+            self.stdout.write(self.style.SUCCESS(f"Seeded {options['seed']} profiles"))
+
+        if options['compare']:
+            try:
+                with connection.schema_editor(atomic=True) as editor:
+                    for index in Profile._meta.indexes:
+                        editor.remove_index(Profile, index)
+                    self.report('Without indexes', options['repeat'])
+                    raise Rollback
+            except Rollback:
+                pass
+
+        self.report('With indexes', options['repeat'])
+
+    def report(self, heading, repeat):
+        self.stdout.write(self.style.MIGRATE_HEADING(heading))
+        for name, query in HOT_QUERIES:
+            queryset = query()[:50]
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                list(queryset.values_list('id', flat=True))
+                timings.append((time.perf_counter() - start) * 1000)
+
+            self.stdout.write(f'{name}: median {statistics.median(timings):.2f} ms')
+            for line in queryset.explain().splitlines():
+                self.stdout.write(f'    {line}')
+
+    def seed(self, count):
+        """Bulk-create users and profiles with a realistic spread of states"""
+        start = User.objects.count()
+        users = User.objects.bulk_create(
+            [User(username=f'bench{start + i}') for i in range(count)],
+            batch_size=1000
+        )
+        statuses = ['pending'] * 6 + ['yellow'] * 2 + ['green', 'qualified']
+        Profile.objects.bulk_create(
+            [
+                Profile(
+                    user=user,
+                    phone=f'9{start + i:09d}',
+                    referrer_phone=f'9{random.randrange(start + i):09d}' if start + i else None,
+                    member_type=random.choice(['paying', 'sponsored']),
+                    status=random.choice(statuses),
+                    paid_for_self=random.random() < 0.3,
+                    paid_for_sponsored=random.random() < 0.3,
+                    qualification_overridden=random.random() < 0.01
+                )
+                for i, user in enumerate(users)
+            ],
+            batch_size=1000
+        )
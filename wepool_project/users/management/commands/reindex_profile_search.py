@@ -0,0 +1,24 @@
+# Management command for rebuilding the profile search documents
+
+from django.core.management.base import BaseCommand
+from users.search import reindex_profiles
+
+class Command(BaseCommand):
+    help = 'Rebuild the search document of every profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of profiles to read and write per batch'
+        )
+
+    def handle(self, *args, **options):
+        indexed = reindex_profiles(batch_size=options['batch_size'])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Indexed {indexed} profiles'
+            )
+        )
@@ -0,0 +1,60 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0002_profile_referral_counters"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="profile",
+            index=models.Index(
+                fields=["member_type", "status", "created_at"],
+                name="users_profile_queue_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="profile",
+            index=models.Index(
+                fields=["status", "created_at"], name="users_profile_status_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="profile",
+            index=models.Index(fields=["created_at"], name="users_profile_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="profile",
+            index=models.Index(
+                fields=["referrer_phone"], name="users_profile_referrer_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="profile",
+            index=models.Index(
+                condition=models.Q(("paid_for_sponsored", False)),
+                fields=["status", "created_at"],
+                name="users_profile_unassigned_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="profile",
+            index=models.Index(
+                condition=models.Q(("qualification_overridden", True)),
+                fields=["override_date"],
+                name="users_profile_q_override_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="profile",
+            index=models.Index(
+                condition=models.Q(("admin_promotion_overridden", True)),
+                fields=["admin_override_date"],
+                name="users_profile_a_override_idx",
+            ),
+        ),
+    ]
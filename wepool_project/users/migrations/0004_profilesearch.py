@@ -0,0 +1,112 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+SQLITE_FTS = [
+    """CREATE VIRTUAL TABLE users_profilesearch_fts USING fts5(
+        document, content='users_profilesearch', content_rowid='profile_id',
+        tokenize='trigram'
+    )""",
+    """CREATE TRIGGER users_profilesearch_ai AFTER INSERT ON users_profilesearch BEGIN
+        INSERT INTO users_profilesearch_fts(rowid, document)
+        VALUES (new.profile_id, new.document);
+    END""",
+    """CREATE TRIGGER users_profilesearch_ad AFTER DELETE ON users_profilesearch BEGIN
+        INSERT INTO users_profilesearch_fts(users_profilesearch_fts, rowid, document)
+        VALUES ('delete', old.profile_id, old.document);
+    END""",
+    """CREATE TRIGGER users_profilesearch_au AFTER UPDATE ON users_profilesearch BEGIN
+        INSERT INTO users_profilesearch_fts(users_profilesearch_fts, rowid, document)
+        VALUES ('delete', old.profile_id, old.document);
+        INSERT INTO users_profilesearch_fts(rowid, document)
+        VALUES (new.profile_id, new.document);
+    END""",
+]
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        schema_editor.execute(
+            "CREATE INDEX users_profilesearch_trgm_idx ON users_profilesearch "
+            "USING gin (document gin_trgm_ops)"
+        )
+    elif vendor == "mysql":
+        schema_editor.execute(
+            "CREATE FULLTEXT INDEX users_profilesearch_ngram_idx "
+            "ON users_profilesearch (document) WITH PARSER ngram"
+        )
+    elif vendor == "sqlite":
+        for statement in SQLITE_FTS:
+            schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS users_profilesearch_trgm_idx")
+    elif vendor == "mysql":
+        schema_editor.execute(
+            "DROP INDEX users_profilesearch_ngram_idx ON users_profilesearch"
+        )
+    elif vendor == "sqlite":
+        for trigger in ("ai", "ad", "au"):
+            schema_editor.execute(
+                f"DROP TRIGGER IF EXISTS users_profilesearch_{trigger}"
+            )
+        schema_editor.execute("DROP TABLE IF EXISTS users_profilesearch_fts")
+
+
+def index_existing_profiles(apps, schema_editor):
+    Profile = apps.get_model("users", "Profile")
+    ProfileSearch = apps.get_model("users", "ProfileSearch")
+    documents = []
+    for profile in Profile.objects.select_related("user").iterator(chunk_size=1000):
+        user = profile.user
+        parts = [
+            user.first_name,
+            user.last_name,
+            user.email,
+            user.username,
+            profile.phone,
+        ]
+        documents.append(
+            ProfileSearch(
+                profile_id=profile.id,
+                document=" ".join(part.lower() for part in parts if part),
+            )
+        )
+        if len(documents) >= 1000:
+            ProfileSearch.objects.bulk_create(documents)
+            documents = []
+    ProfileSearch.objects.bulk_create(documents)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0003_profile_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProfileSearch",
+            fields=[
+                (
+                    "profile",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="search",
+                        serialize=False,
+                        to="users.profile",
+                    ),
+                ),
+                ("document", models.TextField()),
+            ],
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(index_existing_profiles, migrations.RunPython.noop),
+    ]
@@ -1,12 +1,19 @@
 # users/models.py - Update the Profile model to include new fields
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.utils import timezone
 import uuid
+from core.dirty_fields import DirtyFieldsMixin
 
-class Profile(models.Model):
+# Paying referrals a PIF member needs before becoming Qualified
+PAYING_REFERRALS_TO_QUALIFY = 4
+
+# core.cache namespace of the cached referrer lookups (users.referrers)
+REFERRER_LOOKUP_NAMESPACE = 'users:referrer_lookup'
+
+class Profile(DirtyFieldsMixin, models.Model):
     MEMBER_TYPE_CHOICES = [
         ('paying', 'Paying Member'),
         ('sponsored', 'PIF Member'),  # Changed for display only
@@ -94,37 +101,88 @@ class Profile(models.Model):
         help_text="When admin promotion was overridden"
     )
 
+    # Denormalized referral counters (maintained by core.models signals)
+    referral_count = models.IntegerField(default=0, editable=False)
+    paying_referral_count = models.IntegerField(default=0, editable=False)
+    sponsored_referral_count = models.IntegerField(default=0, editable=False)
+    active_referral_count = models.IntegerField(default=0, editable=False)
+    downline_level_2_count = models.IntegerField(default=0, editable=False)
+    downline_level_3_count = models.IntegerField(default=0, editable=False)
+    downline_level_4_count = models.IntegerField(default=0, editable=False)
+
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    REFERRAL_COUNTER_FIELDS = (
+        'referral_count', 'paying_referral_count', 'sponsored_referral_count',
+        'active_referral_count', 'downline_level_2_count',
+        'downline_level_3_count', 'downline_level_4_count',
+    )
+    # Counters are changed with F() updates, so a plain save of an instance
+    # loaded earlier must not write stale values back.
+    SAVE_EXCLUDE_FIELDS = REFERRAL_COUNTER_FIELDS
+
     class Meta:
         verbose_name = "Profile"
         verbose_name_plural = "Profiles"
         ordering = ['-created_at']
+        indexes = [
+            # Paying/PIF queues and filtered user lists, newest first
+            models.Index(fields=['member_type', 'status', 'created_at'], name='users_profile_queue_idx'),
+            models.Index(fields=['status', 'created_at'], name='users_profile_status_idx'),
+            models.Index(fields=['created_at'], name='users_profile_created_idx'),
+            models.Index(fields=['referrer_phone'], name='users_profile_referrer_idx'),
+            # Partial indexes (skipped on MySQL) for small, hot subsets: yellow
+            # members awaiting a PIF assignment and the rare overridden rows
+            models.Index(
+                fields=['status', 'created_at'],
+                condition=models.Q(paid_for_sponsored=False),
+                name='users_profile_unassigned_idx'
+            ),
+            models.Index(
+                fields=['override_date'],
+                condition=models.Q(qualification_overridden=True),
+                name='users_profile_q_override_idx'
+            ),
+            models.Index(
+                fields=['admin_override_date'],
+                condition=models.Q(admin_promotion_overridden=True),
+                name='users_profile_a_override_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user.get_full_name()} - {self.phone}"
 
+    @property
+    def referral_stats(self):
+        """Direct referral statistics from the denormalized counters"""
+        return {
+            'total_referrals': self.referral_count,
+            'paying_referrals': self.paying_referral_count,
+            'sponsored_referrals': self.sponsored_referral_count,
+            'active_referrals': self.active_referral_count
+        }
+
     def get_member_type_display_ui(self):
         """Get display name for UI (PIF instead of sponsored)"""
         if self.member_type == 'sponsored':
             return 'PIF Member'
         return 'Paying Member'
 
-# users/models.py - Update the qualification check methods
-def check_yellow_qualification(self, override_check=False):
-    """Check if user qualifies for Yellow status"""
-    if self.qualification_overridden and not override_check:
-        return False
+    def check_yellow_qualification(self, override_check=False):
+        """Check if user qualifies for Yellow status"""
+        if self.qualification_overridden and not override_check:
+            return False
 
-    if (self.verified_email and
-        self.registered_tacconnector and  # Updated field name
-        self.tacconnector_link):          # Updated field name
-        self.status = 'yellow'
-        self.save()
-        return True
-    return False
+        if (self.verified_email and
+            self.registered_tacconnector and  # Updated field name
+            self.tacconnector_link):          # Updated field name
+            self.status = 'yellow'
+            self.save(update_fields=['status'])
+            return True
+        return False
 
     def check_sponsored_qualification(self, override_check=False):
         """Check if PIF member is qualified"""
@@ -137,9 +195,9 @@ def check_yellow_qualification(self, override_check=False):
                 referrer=self,
                 referred__member_type='paying'
             ).count()
-            if paying_referrals >= 4:
+            if paying_referrals >= PAYING_REFERRALS_TO_QUALIFY:
                 self.status = 'qualified'
-                self.save()
+                self.save(update_fields=['status'])
                 return True
         return False
 
@@ -152,12 +210,82 @@ def check_yellow_qualification(self, override_check=False):
                 self.paid_for_sponsored and
                 self.paid_for_self)
 
+# User fields that make up a search document
+SEARCH_USER_FIELDS = ('first_name', 'last_name', 'email', 'username')
+
+class ProfileSearch(models.Model):
+    """Lowercased names, email, username and phone of a profile for searching
+
+    Each database indexes ``document`` with its own engine (pg_trgm,
+    MySQL ngram FULLTEXT or SQLite FTS5); see users.search.
+    """
+    profile = models.OneToOneField(
+        Profile, on_delete=models.CASCADE, primary_key=True, related_name='search'
+    )
+    document = models.TextField()
+
+    def __str__(self):
+        return self.document
+
+    @staticmethod
+    def build_document(user, phone):
+        parts = [user.first_name, user.last_name, user.email, user.username, phone]
+        return ' '.join(part.lower() for part in parts if part)
+
+def update_search_document(profile_id, user, phone):
+    document = ProfileSearch.build_document(user, phone)
+    if not ProfileSearch.objects.filter(profile_id=profile_id).update(document=document):
+        ProfileSearch.objects.create(profile_id=profile_id, document=document)
+
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
     if created:
         Profile.objects.create(user=instance)
 
 @receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    if hasattr(instance, 'profile'):
-        instance.profile.save()
+def save_user_profile(sender, instance, created, raw=False, **kwargs):
+    # Only a profile already loaded through this user can hold unsaved
+    # edits; logins and password changes leave it untouched
+    if raw or created:
+        return
+    profile = User.profile.related.get_cached_value(instance, default=None)
+    if profile is not None and profile.is_dirty():
+        profile.save()
+
+@receiver(post_save, sender=Profile)
+def index_profile(sender, instance, created, raw=False, **kwargs):
+    loaded = getattr(instance, '_loaded_values', None)
+    if raw or not (created or loaded is None or loaded.get('phone') != instance.phone):
+        return
+    update_search_document(instance.pk, instance.user, instance.phone)
+
+@receiver(post_save, sender=Profile)
+def forget_cached_referrer(sender, instance, created, raw=False, **kwargs):
+    # Cached lookups hold the member type, and misses for phones now in use
+    from .referrers import forget_referrers
+    loaded = getattr(instance, '_loaded_values', None)
+    if created or raw or loaded is None:
+        forget_referrers(instance.phone)
+    elif (loaded.get('phone'), loaded.get('member_type')) != (instance.phone, instance.member_type):
+        forget_referrers(loaded.get('phone'), instance.phone)
+
+@receiver(post_delete, sender=Profile)
+def forget_deleted_referrer(sender, instance, **kwargs):
+    from .referrers import forget_referrers
+    forget_referrers(instance.phone)
+
+@receiver(post_save, sender=User)
+def index_user_profile(sender, instance, created, raw=False, **kwargs):
+    # A new user's profile is indexed when it is created
+    if raw or created:
+        return
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and not update_fields & set(SEARCH_USER_FIELDS):
+        return
+    profile = Profile.objects.filter(user=instance).values_list('id', 'phone').first()
+    if profile:
+        update_search_document(profile[0], instance, profile[1])
+
+        # The cached referrer lookup carries the name
+        from .referrers import forget_referrers
+        forget_referrers(profile[1])
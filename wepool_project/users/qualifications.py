@@ -0,0 +1,73 @@
+# users/qualifications.py
+from functools import partial
+from django.db import transaction
+from django.db.models import Count, Q
+from core.models import Referral
+from core.snapshots import invalidate_upline_snapshots
+from core.utils import recompute_referral_counters
+from dashboard.utils import invalidate_dashboard_stats
+from .models import Profile, PAYING_REFERRALS_TO_QUALIFY
+
+def yellow_candidates():
+    """Pending profiles that meet the Yellow requirements"""
+    return Profile.objects.filter(
+        status='pending',
+        qualification_overridden=False,
+        verified_email=True,
+        registered_tacconnector=True,
+        tacconnector_link__isnull=False
+    ).exclude(tacconnector_link='')
+
+def sponsored_candidates():
+    """PIF members with enough paying referrals to become Qualified"""
+    return Profile.objects.filter(
+        member_type='sponsored',
+        status__in=['pending', 'yellow'],
+        qualification_overridden=False
+    ).annotate(
+        paying_referrals=Count(
+            'referrals_made',
+            filter=Q(referrals_made__referred__member_type='paying')
+        )
+    ).filter(paying_referrals__gte=PAYING_REFERRALS_TO_QUALIFY)
+
+# (rule name, candidate queryset factory, status to apply), run in order.
+# Both rules read a member's own fields and direct referrals only; a rule
+# that depends on deeper levels should aggregate one
+# core.downline.recursive_downlines() result for all candidates rather
+# than walk each candidate's downline.
+QUALIFICATION_RULES = [
+    ('yellow', yellow_candidates, 'yellow'),
+    ('sponsored_qualified', sponsored_candidates, 'qualified'),
+]
+
+def apply_rule(candidates, new_status, batch_size=1000, dry_run=False):
+    """Move candidate profiles to new_status in batches, returning the count"""
+    profile_ids = list(candidates.values_list('id', flat=True).order_by())
+    if dry_run:
+        return len(profile_ids)
+
+    updated = 0
+    for start in range(0, len(profile_ids), batch_size):
+        batch = profile_ids[start:start + batch_size]
+        with transaction.atomic():
+            updated += Profile.objects.filter(id__in=batch).update(status=new_status)
+
+            # update() skips the counter signals, so refresh the referrers
+            recompute_referral_counters(
+                Referral.objects.filter(
+                    referred_id__in=batch
+                ).values_list('referrer_id', flat=True)
+            )
+            transaction.on_commit(partial(invalidate_upline_snapshots, batch))
+
+    if updated:
+        invalidate_dashboard_stats()
+    return updated
+
+def run_qualification_rules(batch_size=1000, dry_run=False):
+    """Apply every qualification rule, returning per-rule counts"""
+    return {
+        name: apply_rule(candidates(), new_status, batch_size=batch_size, dry_run=dry_run)
+        for name, candidates, new_status in QUALIFICATION_RULES
+    }
@@ -0,0 +1,64 @@
+# users/referrers.py
+from functools import partial
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from core.cache import get_or_set, make_key
+from .models import REFERRER_LOOKUP_NAMESPACE, Profile
+
+# Profile phones are at most 15 digits
+MAX_PHONE_LENGTH = 15
+
+def _referrer_key(phone):
+    return make_key(REFERRER_LOOKUP_NAMESPACE, phone)
+
+def _find_referrer(phone):
+    rows = Profile.objects.filter(phone=phone).order_by().values(
+        'id', 'member_type', 'user__first_name', 'user__last_name'
+    )[:1]
+    if not rows:
+        # Misses are cached too, until a member with this phone is created
+        return {'exists': False}
+    row = rows[0]
+    return {
+        'exists': True,
+        'id': row['id'],
+        'name': f"{row['user__first_name']} {row['user__last_name']}".strip(),
+        'member_type': row['member_type'],
+    }
+
+def lookup_referrer(phone):
+    """Id, full name and member type of the member with this phone, from one cached query
+
+    Returns ``{'exists': False}`` when no member has the phone, without
+    touching the cache or database when it can't be a phone at all.
+    """
+    if not phone or not phone.isdigit() or len(phone) > MAX_PHONE_LENGTH:
+        return {'exists': False}
+    return get_or_set(
+        _referrer_key(phone),
+        lambda: _find_referrer(phone),
+        settings.REFERRER_LOOKUP_CACHE_TTL
+    )
+
+def lock_referrer(phone, referred_id=None):
+    """Id of the member with this phone (never referred_id), or None
+
+    Reads the database rather than the cache, which may be stale, and locks
+    the row until the transaction ends so the referrer can't be deleted
+    before a Referral to it is written. Call inside transaction.atomic().
+    """
+    if not phone:
+        return None
+    return Profile.objects.filter(phone=phone).exclude(pk=referred_id).select_for_update().order_by().values_list(
+        'id', flat=True
+    ).first()
+
+def _delete_lookups(phones):
+    cache.delete_many([_referrer_key(phone) for phone in phones])
+
+def forget_referrers(*phones):
+    """Drop the cached lookups of these phones once the current transaction commits"""
+    phones = {phone for phone in phones if phone}
+    if phones:
+        transaction.on_commit(partial(_delete_lookups, phones))
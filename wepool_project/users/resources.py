@@ -0,0 +1,210 @@
+# users/resources.py
+from functools import partial
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from import_export import fields, resources
+from import_export.instance_loaders import CachedInstanceLoader
+from import_export.results import RowResult
+from core.models import Referral
+from core.snapshots import invalidate_upline_snapshots
+from core.utils import bulk_add_referrals, recompute_referral_counters
+from dashboard.utils import invalidate_dashboard_stats
+from .models import Profile
+from .referrers import forget_referrers
+from .search import reindex_profiles
+
+IMPORT_BATCH_SIZE = 1000
+USER_FIELDS = ('username', 'email', 'first_name', 'last_name')
+
+class MemberResource(resources.ModelResource):
+    """Members (User + Profile + Referral) for CSV/XLSX imports
+
+    Rows are matched on phone. New members are written with bulk_create a
+    batch at a time instead of through the per-row profile signals, and are
+    linked to the member whose phone is in referrer_phone (existing members
+    keep their referrer). Closure rows, counters, search documents and
+    cached matrices are brought up to date once per batch.
+    """
+    username = fields.Field(attribute='user__username', column_name='username')
+    email = fields.Field(attribute='user__email', column_name='email')
+    first_name = fields.Field(attribute='user__first_name', column_name='first_name')
+    last_name = fields.Field(attribute='user__last_name', column_name='last_name')
+
+    class Meta:
+        model = Profile
+        fields = (
+            'username', 'email', 'first_name', 'last_name', 'phone', 'referrer_phone',
+            'member_type', 'status', 'city', 'state', 'country', 'zip_code',
+            'verified_email', 'paid_for_self', 'paid_for_sponsored', 'communications_opt_in',
+        )
+        import_id_fields = ('phone',)
+        instance_loader_class = CachedInstanceLoader
+        use_bulk = True
+        batch_size = IMPORT_BATCH_SIZE
+        use_transactions = True
+        skip_unchanged = True
+        report_skipped = True
+        store_instance = True
+        skip_html_diff = True
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # (row number, import type, phone, {column: (old, new)}) per changed row
+        self.changes = []
+        # Phones of new members whose referrer_phone matched nobody
+        self.unmatched_referrers = []
+
+    def get_queryset(self):
+        return Profile.objects.select_related('user')
+
+    def init_instance(self, row=None):
+        return Profile(user=User())
+
+    def before_import(self, dataset, **kwargs):
+        self.changes = []
+        self.unmatched_referrers = []
+        usernames = [username for username in dataset['username'] if username] if 'username' in dataset.headers else []
+        self._taken_usernames = set(
+            User.objects.filter(username__in=usernames).values_list('username', flat=True)
+        )
+
+    def import_field(self, field, instance, row, is_m2m=False, **kwargs):
+        # Moving an existing member would mean moving their whole downline
+        if field.attribute == 'referrer_phone' and instance.pk:
+            return
+        super().import_field(field, instance, row, is_m2m=is_m2m, **kwargs)
+
+    def import_instance(self, instance, row, **kwargs):
+        super().import_instance(instance, row, **kwargs)
+
+        errors = {}
+        if instance.member_type not in dict(Profile.MEMBER_TYPE_CHOICES):
+            errors['member_type'] = f'Must be one of: {", ".join(dict(Profile.MEMBER_TYPE_CHOICES))}.'
+        if instance.status not in dict(Profile.STATUS_CHOICES):
+            errors['status'] = f'Must be one of: {", ".join(dict(Profile.STATUS_CHOICES))}.'
+        if instance.pk is None:
+            username = instance.user.username
+            if not instance.phone:
+                errors['phone'] = 'A phone number is required.'
+            if not username:
+                errors['username'] = 'A username is required.'
+            elif username in self._taken_usernames:
+                errors['username'] = f'The username {username} is already taken.'
+            else:
+                self._taken_usernames.add(username)
+        if errors:
+            raise ValidationError(errors)
+
+    def before_save_instance(self, instance, row, **kwargs):
+        # bulk_update doesn't apply auto_now
+        instance.updated_at = timezone.now()
+        if instance.pk is None:
+            instance.user.set_unusable_password()
+
+    def after_import_row(self, row, row_result, **kwargs):
+        if row_result.import_type == RowResult.IMPORT_TYPE_NEW:
+            original = None
+        elif row_result.import_type == RowResult.IMPORT_TYPE_UPDATE:
+            original = row_result.original
+        else:
+            return
+
+        changes = {}
+        for field in self.get_import_fields():
+            old = self.export_field(field, original) if original is not None else ''
+            new = self.export_field(field, row_result.instance)
+            if old != new:
+                changes[field.column_name] = (old, new)
+        self.changes.append(
+            (kwargs.get('row_number'), row_result.import_type, row_result.instance.phone, changes)
+        )
+
+    def get_bulk_update_fields(self):
+        return [
+            name for name, field in self.fields.items()
+            if name not in self._meta.import_id_fields
+            and '__' not in field.attribute
+            and name != 'referrer_phone'
+        ] + ['updated_at']
+
+    def bulk_create(self, using_transactions, dry_run, raise_errors, batch_size=None, result=None):
+        if self.create_instances and (using_transactions or not dry_run):
+            try:
+                with transaction.atomic():
+                    self.create_members(self.create_instances, batch_size or IMPORT_BATCH_SIZE)
+            except Exception as e:
+                self.handle_import_error(result, e, raise_errors)
+        self.create_instances.clear()
+
+    def bulk_update(self, using_transactions, dry_run, raise_errors, batch_size=None, result=None):
+        if self.update_instances and (using_transactions or not dry_run):
+            try:
+                with transaction.atomic():
+                    self.update_members(self.update_instances, batch_size or IMPORT_BATCH_SIZE)
+            except Exception as e:
+                self.handle_import_error(result, e, raise_errors)
+        self.update_instances.clear()
+
+    def create_members(self, profiles, batch_size):
+        """Insert a batch of new members, then link and index them"""
+        users = [profile.user for profile in profiles]
+        User.objects.bulk_create(users, batch_size=batch_size)
+        # MySQL doesn't return primary keys from bulk inserts, so read them back
+        user_ids = dict(
+            User.objects.filter(
+                username__in=[user.username for user in users]
+            ).values_list('username', 'id')
+        )
+        for profile in profiles:
+            profile.user.pk = profile.user_id = user_ids[profile.user.username]
+
+        Profile.objects.bulk_create(profiles, batch_size=batch_size)
+        profile_ids = dict(
+            Profile.objects.filter(
+                phone__in=[profile.phone for profile in profiles]
+            ).values_list('phone', 'id')
+        )
+        for profile in profiles:
+            profile.pk = profile_ids[profile.phone]
+
+        # One lookup for every referrer in the batch, new members included
+        referrers = dict(
+            Profile.objects.filter(
+                phone__in={profile.referrer_phone for profile in profiles if profile.referrer_phone}
+            ).values_list('phone', 'id')
+        )
+        referrer_of = {
+            profile.pk: referrers[profile.referrer_phone]
+            for profile in profiles
+            if referrers.get(profile.referrer_phone, profile.pk) != profile.pk
+        }
+        linked = set(bulk_add_referrals(referrer_of, batch_size=batch_size))
+        self.unmatched_referrers.extend(
+            profile.phone for profile in profiles
+            if profile.referrer_phone and profile.pk not in linked
+        )
+
+        reindex_profiles(batch_size=batch_size, profile_ids=profile_ids.values())
+        forget_referrers(*(profile.phone for profile in profiles))
+        transaction.on_commit(invalidate_dashboard_stats)
+
+    def update_members(self, profiles, batch_size):
+        """Write a batch of changed members and refresh what depends on them"""
+        User.objects.bulk_update(
+            [profile.user for profile in profiles], list(USER_FIELDS), batch_size=batch_size
+        )
+        Profile.objects.bulk_update(profiles, self.get_bulk_update_fields(), batch_size=batch_size)
+
+        # bulk_update skips the signals that keep these in step
+        profile_ids = [profile.pk for profile in profiles]
+        recompute_referral_counters(
+            Referral.objects.filter(
+                referred_id__in=profile_ids
+            ).values_list('referrer_id', flat=True)
+        )
+        reindex_profiles(batch_size=batch_size, profile_ids=profile_ids)
+        forget_referrers(*(profile.phone for profile in profiles))
+        transaction.on_commit(partial(invalidate_upline_snapshots, profile_ids))
+        transaction.on_commit(invalidate_dashboard_stats)
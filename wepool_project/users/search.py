@@ -0,0 +1,124 @@
+# users/search.py
+from django.db import connection
+from django.db.models import (
+    Case, F, FloatField, Func, IntegerField, OuterRef, Q, Subquery, Value, When
+)
+from django.db.models.expressions import RawSQL
+from .models import Profile, ProfileSearch
+
+# Shorter terms can't use the trigram/ngram indexes and fall back to LIKE
+SEARCH_MIN_LENGTH = 3
+AUTOCOMPLETE_LIMIT = 10
+
+def normalize_term(term):
+    return ' '.join(term.lower().split())
+
+def _phrase(term):
+    """Quote a term as a single phrase for FTS5 and MySQL boolean mode"""
+    return '"' + term.replace('"', '') + '"'
+
+class MatchAgainst(Func):
+    """MySQL full-text relevance of a column for a boolean-mode query"""
+    template = 'MATCH (%(expressions)s IN BOOLEAN MODE)'
+    arg_joiner = ') AGAINST ('
+    output_field = FloatField()
+
+class FTS5Rank(Func):
+    """Negated bm25() of the SQLite FTS5 row for a profile, so higher is better"""
+    template = (
+        '(SELECT -bm25(users_profilesearch_fts) FROM users_profilesearch_fts '
+        'WHERE users_profilesearch_fts MATCH %(expressions)s)'
+    )
+    arg_joiner = ' AND users_profilesearch_fts.rowid = '
+    output_field = FloatField()
+
+def search_documents(term):
+    """ProfileSearch rows containing term, annotated with a backend-specific rank"""
+    term = normalize_term(term)
+    documents = ProfileSearch.objects.all()
+
+    if len(term) < SEARCH_MIN_LENGTH:
+        return documents.filter(document__contains=term).annotate(
+            rank=Value(0.0, output_field=FloatField())
+        )
+
+    if connection.vendor == 'postgresql':
+        # LIKE on the lowercased document is served by the pg_trgm GIN index
+        return documents.filter(document__contains=term).annotate(
+            rank=Func(F('document'), Value(term), function='SIMILARITY', output_field=FloatField())
+        )
+
+    if connection.vendor == 'mysql':
+        return documents.annotate(
+            rank=MatchAgainst(F('document'), Value(_phrase(term)))
+        ).filter(rank__gt=0)
+
+    if connection.vendor == 'sqlite':
+        phrase = _phrase(term)
+        return documents.filter(
+            profile_id__in=RawSQL(
+                'SELECT rowid FROM users_profilesearch_fts WHERE users_profilesearch_fts MATCH %s',
+                [phrase]
+            )
+        ).annotate(rank=FTS5Rank(Value(phrase), F('profile_id')))
+
+    return documents.filter(document__contains=term).annotate(
+        rank=Value(0.0, output_field=FloatField())
+    )
+
+def search_profiles(profiles, term):
+    """Narrow a Profile queryset to the profiles matching term"""
+    return profiles.filter(id__in=search_documents(term).values('profile_id'))
+
+def annotate_search_rank(profiles, term):
+    """Add each profile's search rank for term as search_rank"""
+    ranks = search_documents(term).filter(profile_id=OuterRef('pk')).values('rank')
+    return profiles.annotate(search_rank=Subquery(ranks[:1]))
+
+def autocomplete(term, limit=AUTOCOMPLETE_LIMIT):
+    """Best matches for a partially typed term, word-prefix matches first"""
+    term = normalize_term(term)
+    if not term:
+        return []
+
+    documents = search_documents(term).annotate(
+        prefix=Case(
+            When(Q(document__startswith=term) | Q(document__contains=' ' + term), then=1),
+            default=0,
+            output_field=IntegerField()
+        )
+    ).select_related('profile__user').order_by('-prefix', '-rank', 'profile_id')[:limit]
+
+    return [document.profile for document in documents]
+
+def reindex_profiles(batch_size=1000, profile_ids=None):
+    """Rewrite the search documents of all profiles (or profile_ids), returning the count"""
+    # MySQL's upsert can't name the conflicting column, but the primary key
+    # is the only unique one there anyway
+    unique_fields = ['profile'] if connection.features.supports_update_conflicts_with_target else None
+    profiles = Profile.objects.select_related('user').only(
+        'id', 'phone', 'user__first_name', 'user__last_name', 'user__email', 'user__username'
+    ).order_by('id')
+    if profile_ids is not None:
+        profiles = profiles.filter(id__in=list(profile_ids))
+
+    indexed = 0
+    last_id = 0
+    while True:
+        batch = list(profiles.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            return indexed
+        ProfileSearch.objects.bulk_create(
+            [
+                ProfileSearch(
+                    profile_id=profile.id,
+                    document=ProfileSearch.build_document(profile.user, profile.phone)
+                )
+                for profile in batch
+            ],
+            update_conflicts=True,
+            unique_fields=unique_fields,
+            update_fields=['document']
+        )
+        indexed += len(batch)
+        last_id = batch[-1].id
@@ -1,3 +1,182 @@
-from django.test import TestCase
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models.signals import post_save
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from core.models import Referral
+from .models import Profile
+from .referrers import lookup_referrer
 
-# Create your tests here.
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'users-tests'}}
+
+def make_member(phone, first_name='Member', **fields):
+    user = User.objects.create(username=f'member_{phone}', first_name=first_name, last_name=phone)
+    profile = Profile.objects.get(user=user)
+    profile.phone = phone
+    profile.member_type = fields.pop('member_type', 'paying')
+    for field, value in fields.items():
+        setattr(profile, field, value)
+    profile.save()
+    return profile
+
+@override_settings(CACHES=LOCMEM)
+class ReferrerLookupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_lookups_are_cached(self):
+        member = make_member('27110000001', first_name='Thabo')
+        self.assertEqual(lookup_referrer(member.phone)['name'], 'Thabo 27110000001')
+        with self.assertNumQueries(0):
+            self.assertTrue(lookup_referrer(member.phone)['exists'])
+
+    def test_cached_miss_is_forgotten_when_the_phone_is_taken(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertFalse(lookup_referrer('27110000001')['exists'])
+            make_member('27110000001')
+        self.assertTrue(lookup_referrer('27110000001')['exists'])
+
+    def test_changes_and_deletion_are_forgotten(self):
+        member = make_member('27110000001')
+        lookup_referrer(member.phone)
+        with self.captureOnCommitCallbacks(execute=True):
+            member.member_type = 'sponsored'
+            member.save()
+        self.assertEqual(lookup_referrer(member.phone)['member_type'], 'sponsored')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            member.user.first_name = 'Lerato'
+            member.user.save()
+        self.assertEqual(lookup_referrer(member.phone)['name'], 'Lerato 27110000001')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            member.user.delete()
+        self.assertFalse(lookup_referrer(member.phone)['exists'])
+
+    def test_check_referrer_is_not_publicly_cacheable(self):
+        response = self.client.get(reverse('check_referrer'), {'phone': '27110000001'})
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotIn('public', response['Cache-Control'])
+
+@override_settings(CACHES=LOCMEM)
+class RegistrationReferralTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def register(self, phone, referrer_phone):
+        return self.client.post(reverse('register'), {
+            'username': f'new_{phone}',
+            'email': f'new_{phone}@example.com',
+            'first_name': 'New',
+            'last_name': 'Member',
+            'password1': 'a-Long-passw0rd',
+            'password2': 'a-Long-passw0rd',
+            'phone': phone,
+            'referrer_phone': referrer_phone,
+            'member_type': 'paying',
+            'agreed_to_terms': 'on',
+        })
+
+    def test_stale_cached_miss_does_not_drop_the_referral(self):
+        referrer = make_member('27119999999')
+        self.assertFalse(lookup_referrer('27110000001')['exists'])
+        # Takes the phone without the signals that would forget the cached miss
+        Profile.objects.filter(id=referrer.id).update(phone='27110000001')
+        self.assertFalse(lookup_referrer('27110000001')['exists'])
+
+        self.assertEqual(self.register('27110000002', '27110000001').status_code, 302)
+        self.assertTrue(Referral.objects.filter(referrer=referrer, referred__phone='27110000002').exists())
+
+    def test_stale_cached_hit_registers_without_referral(self):
+        referrer = make_member('27110000001')
+        lookup_referrer(referrer.phone)
+        # Gives the phone up without the signals that would forget the cached hit
+        Profile.objects.filter(id=referrer.id).update(phone='27119999999')
+        self.assertTrue(lookup_referrer('27110000001')['exists'])
+
+        self.assertEqual(self.register('27110000002', '27110000001').status_code, 302)
+        self.assertTrue(User.objects.filter(username='new_27110000002').exists())
+        self.assertFalse(Referral.objects.exists())
+
+class ReferralTreeTests(TestCase):
+    def test_tree_is_one_json_response(self):
+        root = make_member('27110000001')
+        child = make_member('27110000002')
+        Referral.objects.create(referrer=root, referred=child)
+        self.client.force_login(root.user)
+
+        response = self.client.get(reverse('referral_tree_data'), {'depth': 2})
+        self.assertFalse(response.streaming)
+        tree = response.json()
+        self.assertEqual(tree['id'], root.id)
+        self.assertEqual([node['id'] for node in tree['children']], [child.id])
+        self.assertEqual(tree['child_count'], 1)
+
+def profile_writes(captured):
+    table = connection.ops.quote_name(Profile._meta.db_table)
+    return [query['sql'] for query in captured if query['sql'].startswith(f'UPDATE {table}')]
+
+class DirtyFieldsTests(TestCase):
+    def setUp(self):
+        self.member = make_member('27110000001')
+
+    def test_clean_save_is_skipped_with_its_signals(self):
+        profile = Profile.objects.get(id=self.member.id)
+        receiver = mock.Mock()
+        post_save.connect(receiver, sender=Profile)
+        self.addCleanup(post_save.disconnect, receiver, sender=Profile)
+
+        with self.assertNumQueries(0):
+            profile.save()
+        receiver.assert_not_called()
+
+    def test_save_writes_changed_fields_and_auto_now(self):
+        profile = Profile.objects.get(id=self.member.id)
+        profile.status = 'yellow'
+        with CaptureQueriesContext(connection) as captured:
+            profile.save()
+
+        [update] = profile_writes(captured)
+        quote = connection.ops.quote_name
+        self.assertIn(quote('status'), update)
+        self.assertIn(quote('updated_at'), update)
+        self.assertNotIn(quote('phone'), update)
+        self.assertGreater(Profile.objects.get(id=profile.id).updated_at, self.member.updated_at)
+
+    def test_save_leaves_the_counters_alone(self):
+        stale = Profile.objects.get(id=self.member.id)
+        Referral.objects.create(referrer=self.member, referred=make_member('27110000002'))
+
+        stale.status = 'yellow'
+        with CaptureQueriesContext(connection) as captured:
+            stale.save()
+        self.assertNotIn('referral_count', profile_writes(captured)[0])
+        self.assertEqual(Profile.objects.get(id=self.member.id).referral_count, 1)
+
+    def test_login_does_not_write_the_profile(self):
+        user = self.member.user
+        user.set_password('a-Long-passw0rd')
+        user.save()
+
+        with CaptureQueriesContext(connection) as captured:
+            self.assertTrue(self.client.login(username=user.username, password='a-Long-passw0rd'))
+        self.assertEqual(profile_writes(captured), [])
+
+    def test_user_save_writes_a_loaded_profile_only_when_dirty(self):
+        user = User.objects.select_related('profile').get(id=self.member.user_id)
+        with CaptureQueriesContext(connection) as captured:
+            user.save()
+        self.assertEqual(profile_writes(captured), [])
+
+        user.profile.status = 'yellow'
+        user.save()
+        self.assertEqual(Profile.objects.get(id=self.member.id).status, 'yellow')
+
+class CheckQualificationsCommandTests(TestCase):
+    def test_batch_size_must_be_positive(self):
+        with self.assertRaisesMessage(CommandError, '--batch-size must be at least 1'):
+            call_command('check_qualifications', '--batch-size', '0')
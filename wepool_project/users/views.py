@@ -3,15 +3,27 @@ from django.shortcuts import render, redirect
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.core.mail import send_mail
 from django.urls import reverse
 from django.contrib.sites.shortcuts import get_current_site
 from django.http import JsonResponse
 from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.conf import settings
+from django.db import transaction
 from .forms import UserRegistrationForm, ProfileForm, ProfileUpdateForm
 from .models import Profile
+from .referrers import lock_referrer, lookup_referrer
+from core.mail import queue_admin_notification, queue_email
 from core.models import Referral
-from core.utils import build_referral_matrix
+from core.snapshots import get_matrix_snapshot
+from core.utils import (
+    build_referral_tree,
+    decode_tree_cursor,
+    MAX_TREE_DEPTH,
+    MAX_TREE_FANOUT,
+    TREE_DEPTH,
+    TREE_FANOUT
+)
 
 def register(request):
     if request.method == 'POST':
@@ -19,50 +31,47 @@ def register(request):
         profile_form = ProfileForm(request.POST)
 
         if user_form.is_valid() and profile_form.is_valid():
-            # Create user
-            user = user_form.save(commit=False)
-            user.is_active = False  # Require email verification
-            user.save()
-
-            # Update profile
-            profile = user.profile
-            profile_data = profile_form.cleaned_data
-            for field, value in profile_data.items():
-                setattr(profile, field, value)
-
-            # Set terms agreement timestamp
-            if profile_data.get('agreed_to_terms'):
-                profile.terms_agreed_date = timezone.now()
-
-            profile.save()
-
-            # Create referral if referrer exists
-            if profile.referrer_phone:
-                try:
-                    referrer_profile = Profile.objects.get(phone=profile.referrer_phone)
-                    Referral.objects.create(referrer=referrer_profile, referred=profile)
-                except Profile.DoesNotExist:
-                    pass
-
-            # Send verification email
+            with transaction.atomic():
+                # Create user
+                user = user_form.save(commit=False)
+                user.is_active = False  # Require email verification
+                user.save()
+
+                # Update profile
+                profile = user.profile
+                profile_data = profile_form.cleaned_data
+                for field, value in profile_data.items():
+                    setattr(profile, field, value)
+
+                # Set terms agreement timestamp
+                if profile_data.get('agreed_to_terms'):
+                    profile.terms_agreed_date = timezone.now()
+
+                profile.save()
+
+                # Create referral if referrer exists; the cached lookup
+                # behind the form's hint may be stale, so ask the database
+                referrer_id = lock_referrer(profile.referrer_phone, referred_id=profile.id)
+                if referrer_id:
+                    Referral.objects.create(referrer_id=referrer_id, referred=profile)
+
+            # Queue verification email for the send_queued_email worker
             current_site = get_current_site(request)
             verification_url = f"http://{current_site.domain}{reverse('verify_email', args=[str(profile.email_verification_token)])}"
 
-            send_mail(
+            queue_email(
                 'Verify your WePool Tribe account',
                 f'Welcome to WePool Tribe! Please click the following link to verify your email: {verification_url}',
-                'noreply@wepooltribe.com',
                 [user.email],
-                fail_silently=False,
+                from_email='noreply@wepooltribe.com'
             )
 
-            # Send admin notification
-            send_mail(
+            # Notify admins (sent individually or collapsed into the digest)
+            queue_admin_notification(
                 'New User Registration - WePool Tribe',
                 f'A new user has registered: {user.get_full_name()} ({user.email})\nMember Type: {profile.get_member_type_display_ui()}\nPhone: {profile.phone}',
-                'noreply@wepooltribe.com',
                 ['admin@wepooltribe.com'],
-                fail_silently=True,
+                from_email='noreply@wepooltribe.com'
             )
 
             messages.success(request, 'Registration successful! Please check your email to verify your account.')
@@ -81,8 +90,8 @@ def verify_email(request, token):
         profile = Profile.objects.get(email_verification_token=token)
         profile.verified_email = True
         profile.user.is_active = True
-        profile.user.save()
-        profile.save()
+        profile.user.save(update_fields=['is_active'])
+        profile.save(update_fields=['verified_email'])
 
         # Check Yellow qualification
         profile.check_yellow_qualification()
@@ -96,13 +105,12 @@ def verify_email(request, token):
 @login_required
 def user_dashboard(request):
     profile = request.user.profile
-    matrix = build_referral_matrix(profile)
-    direct_referrals = Referral.objects.filter(referrer=profile).select_related('referred__user')
+    snapshot = get_matrix_snapshot(profile.id)
 
     return render(request, 'users/dashboard.html', {
         'profile': profile,
-        'matrix': matrix,
-        'direct_referrals': direct_referrals
+        'matrix': snapshot['levels'],
+        'direct_referrals': snapshot['levels']['level_1']
     })
 
 @login_required
@@ -134,7 +142,7 @@ def update_techconnect_status(request):
         profile.registered_tacconnector = registered  # Updated field name
         if tacconnector_link:
             profile.tacconnector_link = tacconnector_link  # Updated field name
-        profile.save()
+        profile.save(update_fields=['registered_tacconnector', 'tacconnector_link'])
 
         # Check if now qualifies for yellow status
         qualified = profile.check_yellow_qualification()
@@ -151,35 +159,40 @@ def update_techconnect_status(request):
 def referral_tree_data(request):
     """Get referral tree data for visualization"""
     profile = request.user.profile
-
-    def build_tree_node(profile):
-        referrals = Referral.objects.filter(referrer=profile).select_related('referred__user')
-        return {
-            'name': profile.user.get_full_name(),
-            'phone': profile.phone,
-            'status': profile.status,
-            'member_type': profile.member_type,
-            'children': [build_tree_node(ref.referred) for ref in referrals[:10]]
-        }
-
-    tree_data = build_tree_node(profile)
+    depth = _bounded_int(request.GET.get('depth'), TREE_DEPTH, MAX_TREE_DEPTH)
+    fanout = _bounded_int(request.GET.get('fanout'), TREE_FANOUT, MAX_TREE_FANOUT)
+
+    # A cursor expands one node of the viewer's tree from a child offset
+    root, offset = profile, 0
+    cursor = request.GET.get('cursor')
+    if cursor:
+        try:
+            node_id, offset = decode_tree_cursor(profile, cursor)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        if node_id != profile.id:
+            root = Profile.objects.select_related('user').get(id=node_id)
+
+    tree_data = build_referral_tree(root, depth=depth, fanout=fanout, offset=offset, viewer=profile)
     return JsonResponse(tree_data)
 
+def _bounded_int(value, default, maximum):
+    """Parse a positive integer query parameter, clamped to maximum"""
+    try:
+        return max(1, min(int(value), maximum))
+    except (TypeError, ValueError):
+        return default
+
 def check_referrer_exists(request):
     """AJAX endpoint to check if referrer phone exists"""
-    phone = request.GET.get('phone', '')
-
-    if phone:
-        exists = Profile.objects.filter(phone=phone).exists()
-        if exists:
-            referrer = Profile.objects.get(phone=phone)
-            return JsonResponse({
-                'exists': True,
-                'name': referrer.user.get_full_name(),
-                'member_type': referrer.member_type
-            })
-
-    return JsonResponse({'exists': False})
+    referrer = lookup_referrer(request.GET.get('phone', ''))
+    response = JsonResponse({
+        key: value for key, value in referrer.items() if key in ('exists', 'name', 'member_type')
+    })
+    # Browsers can reuse the answer while the referrer field is being
+    # typed; shared caches must not keep who is a member
+    patch_cache_control(response, private=True, max_age=settings.REFERRER_LOOKUP_CLIENT_TTL)
+    return response
 
 # users/views.py - Update the verify_email function (continued)
 def verify_email(request, token):
@@ -189,8 +202,8 @@ def verify_email(request, token):
         # Activate the user account
         profile.verified_email = True
         profile.user.is_active = True
-        profile.user.save()
-        profile.save()
+        profile.user.save(update_fields=['is_active'])
+        profile.save(update_fields=['verified_email'])
 
         # Check Yellow qualification
         profile.check_yellow_qualification()
@@ -41,6 +41,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.instrumentation.QueryInstrumentationMiddleware',
 ]
 
 ROOT_URLCONF = 'wepool_project.urls'
@@ -106,8 +107,20 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'public_html', 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'public_html', 'media')
 
+# Files produced by background jobs (exports); kept out of public_html
+JOB_RESULTS_ROOT = os.environ.get('JOB_RESULTS_ROOT', os.path.join(BASE_DIR, 'job_results'))
+
+# run_jobs workers refresh a running job's heartbeat this often (seconds);
+# keep it well under run_jobs --stale-minutes
+JOB_HEARTBEAT_SECONDS = int(os.environ.get('JOB_HEARTBEAT_SECONDS', '60'))
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Partial indexes and constraints are PostgreSQL/SQLite only; MySQL skips
+# Profile's partial indexes (W037) and QueueClaim's open-claim constraint
+# (W036), which dashboard.queues.claim_batch's row locks stand in for
+SILENCED_SYSTEM_CHECKS = ['models.W036', 'models.W037']
+
 # Crispy Forms
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK = "bootstrap5"
@@ -121,6 +134,65 @@ EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = 'admin@wepooltribe.com'
 
+# Outgoing mail is queued and sent by `manage.py send_queued_email`; with
+# the digest on, admin notifications wait for `send_queued_email --digest`
+EMAIL_ADMIN_DIGEST = os.environ.get('EMAIL_ADMIN_DIGEST', 'False') == 'True'
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get('EMAIL_OUTBOX_MAX_ATTEMPTS', '5'))
+
+# Cache backend: 'db' (a table shared by every process; create it with
+# `manage.py createcachetable`), 'file' (shared by the processes on one
+# host), 'redis' (needs the redis package and a server) or 'locmem' (per
+# process, so invalidations never reach other workers or commands)
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'db')
+_CACHE_BACKENDS = {
+    'db': ('django.core.cache.backends.db.DatabaseCache', 'wepool_cache'),
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'wepool'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', os.path.join(BASE_DIR, 'cache')),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://127.0.0.1:6379/1'),
+}
+CACHES = {
+    'default': {
+        'BACKEND': _CACHE_BACKENDS[CACHE_BACKEND][0],
+        'LOCATION': os.environ.get('CACHE_LOCATION', _CACHE_BACKENDS[CACHE_BACKEND][1]),
+        'TIMEOUT': int(os.environ.get('CACHE_TIMEOUT', '300')),
+        'KEY_PREFIX': 'wepool',
+    }
+}
+# core.cache.get_or_set serves an expired value for up to STALE_GRACE
+# seconds while one request recomputes it under a LOCK_TIMEOUT lock
+CACHE_STALE_GRACE = int(os.environ.get('CACHE_STALE_GRACE', '30'))
+CACHE_LOCK_TIMEOUT = int(os.environ.get('CACHE_LOCK_TIMEOUT', '10'))
+
+# Per-view response caches (seconds)
+REFERRAL_DATA_CACHE_TTL = int(os.environ.get('REFERRAL_DATA_CACHE_TTL', '300'))
+
+# Referrer lookups (users.referrers) are cached server-side, where signals
+# invalidate them, and for a shorter max-age in browsers (never in proxies)
+REFERRER_LOOKUP_CACHE_TTL = int(os.environ.get('REFERRER_LOOKUP_CACHE_TTL', '300'))
+REFERRER_LOOKUP_CLIENT_TTL = int(os.environ.get('REFERRER_LOOKUP_CLIENT_TTL', '60'))
+
+# Dashboard statistics: cache lifetime in seconds, or live counters kept
+# up to date from signals (reseeded from the database every LIVE_RESEED)
+DASHBOARD_STATS_CACHE_TTL = int(os.environ.get('DASHBOARD_STATS_CACHE_TTL', '60'))
+DASHBOARD_STATS_LIVE_COUNTERS = os.environ.get('DASHBOARD_STATS_LIVE_COUNTERS', 'False') == 'True'
+DASHBOARD_STATS_LIVE_RESEED = int(os.environ.get('DASHBOARD_STATS_LIVE_RESEED', '3600'))
+
+# Cached referral matrix snapshots are retired by signals when the tree
+# changes; the TTL only bounds how long an unused snapshot is kept
+MATRIX_SNAPSHOT_TTL = int(os.environ.get('MATRIX_SNAPSHOT_TTL', '900'))
+
+# Dashboard work queues: how long an admin's claim on a member lasts before
+# others can take it, and the window (hours) throughput is measured over
+QUEUE_LEASE_SECONDS = int(os.environ.get('QUEUE_LEASE_SECONDS', '900'))
+QUEUE_THROUGHPUT_HOURS = int(os.environ.get('QUEUE_THROUGHPUT_HOURS', '24'))
+
+# Per-request query/latency instrumentation (core.instrumentation): the
+# rolling window of samples each process keeps per view, and how often one
+# SQL shape may repeat in a request before it is logged as a likely N+1
+REQUEST_INSTRUMENTATION = os.environ.get('REQUEST_INSTRUMENTATION', 'True') == 'True'
+REQUEST_TIMINGS_WINDOW = int(os.environ.get('REQUEST_TIMINGS_WINDOW', '200'))
+REQUEST_REPEATED_QUERY_THRESHOLD = int(os.environ.get('REQUEST_REPEATED_QUERY_THRESHOLD', '5'))
+
 # Authentication
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'user_dashboard'
@@ -135,6 +207,10 @@ LOGGING = {
             'format': '{levelname} {asctime} {module} {message}',
             'style': '{',
         },
+        'message': {
+            'format': '{message}',
+            'style': '{',
+        },
     },
     'handlers': {
         'file': {
@@ -143,6 +219,20 @@ LOGGING = {
             'filename': os.path.join(BASE_DIR, 'logs', 'django.log'),
             'formatter': 'verbose',
         },
+        'requests': {
+            'level': 'INFO',
+            'class': 'logging.FileHandler',
+            'filename': os.path.join(BASE_DIR, 'logs', 'requests.log'),
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        # One JSON line per request, plus warnings for repeated queries
+        'core.instrumentation': {
+            'handlers': ['requests'],
+            'level': os.environ.get('REQUEST_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
     },
     'root': {
         'handlers': ['file'],